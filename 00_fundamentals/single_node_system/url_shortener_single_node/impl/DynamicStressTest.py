@@ -1,11 +1,10 @@
-import concurrent.futures
+import argparse
 import json
 import os
-import statistics
-import time
 from datetime import datetime
 
-import requests
+from loadgen import AsyncLoadEngine
+from loadgen.capacity import CapacitySearch
 
 # --- Configuration ---
 BASE_URL = "http://localhost:8080"
@@ -21,46 +20,43 @@ STEP_DURATION = 10    # Seconds to run each step
 MAX_P95_MS = 800      # Mark as "Throttled" if P95 > 800ms
 MAX_ERROR_RATE = 0.05 # Stop test if > 5% requests fail
 
+# Capacity search (default mode): highest arrival rate within the SLO
+SEARCH_START_RPS = 100
+SEARCH_MAX_RPS = 200000
+SEARCH_RESOLUTION = 0.05   # Stop bisecting when the bracket is within 5%
+SEARCH_CONFIRMATIONS = 3   # Reruns of the found rate before it counts
+SLO_METRIC = "p99_corrected"
+SLO_MS = MAX_P95_MS
+
 class DynamicStressTester:
     def __init__(self):
         self.timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         self.results = []
         self.breakpoint_found = False
+        self.capacity = None
+        self.engine = AsyncLoadEngine(self.perform_cycle, BASE_URL, timeout=3)
         os.makedirs(RESULTS_DIR, exist_ok=True)
 
-    def perform_cycle(self):
-        try:
-            start = time.time()
-            # Minimal payload for maximum RPS discovery
-            r = requests.post(f"{BASE_URL}/shorten", json={"long_url": "https://test.com"}, timeout=3)
-            lat = (time.time() - start) * 1000
-            return (lat, r.status_code == 200)
-        except Exception:
-            return (0, False)
+    async def perform_cycle(self, client):
+        # Minimal payload for maximum RPS discovery
+        r = await client.post_json("/shorten", {"long_url": "https://test.com"})
+        return r.status == 200
 
     def run_step(self, user_count):
-        latencies = []
-        success_count = 0
-        total_count = 0
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=user_count) as executor:
-            end_time = time.time() + STEP_DURATION
-            while time.time() < end_time:
-                futures = [executor.submit(self.perform_cycle) for _ in range(user_count)]
-                for f in concurrent.futures.as_completed(futures):
-                    lat, success = f.result()
-                    latencies.append(lat)
-                    if success: success_count += 1
-                    total_count += 1
-
-        error_rate = (total_count - success_count) / total_count if total_count > 0 else 1
+        m = self.engine.run_stage(user_count, STEP_DURATION)
+
+        error_rate = m["error_rate"] / 100 if m["total"] > 0 else 1
         metrics = {
             "users": user_count,
-            "rps": total_count / STEP_DURATION,
-            "avg": statistics.mean(latencies) if latencies else 0,
-            "p95": statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else 0,
-            "error_rate": error_rate
+            # A watchdog may have ended the step early
+            "rps": m["total"] / (m["aborted"]["at_s"] if "aborted" in m else STEP_DURATION),
+            "avg": m["avg"],
+            "p95": m["p95"],
+            "error_rate": error_rate,
+            "histogram": m["histogram"]
         }
+        if "aborted" in m:
+            metrics["aborted"] = m["aborted"]
         return metrics
 
     def execute(self):
@@ -74,6 +70,8 @@ class DynamicStressTester:
                 self.results.append(metrics)
 
                 print(f"   RPS: {metrics['rps']:.2f} | P95: {metrics['p95']:.2f}ms | Errors: {metrics['error_rate']*100:.1f}%")
+                if "aborted" in metrics:
+                    print(f"   ⛔ Stage aborted at {metrics['aborted']['at_s']:.1f}s: {metrics['aborted']['reason']}")
 
                 # BREAKPOINT CHECK: Hard Failure
                 if metrics['error_rate'] > MAX_ERROR_RATE:
@@ -99,11 +97,43 @@ class DynamicStressTester:
         finally:
             self.save_final_report()
 
+    def search(self):
+        print(f"🚀 Starting Capacity Search on {BASE_URL} (SLO: {SLO_METRIC} <= {SLO_MS}ms, "
+              f"errors <= {MAX_ERROR_RATE*100:.0f}%)")
+        search = CapacitySearch(self.engine, SLO_MS, MAX_ERROR_RATE, SLO_METRIC,
+                                start_rps=SEARCH_START_RPS, max_rps=SEARCH_MAX_RPS,
+                                probe_duration=STEP_DURATION, resolution=SEARCH_RESOLUTION,
+                                confirmations=SEARCH_CONFIRMATIONS)
+        try:
+            self.capacity = search.run()
+            capacity = self.capacity["capacity_rps"]
+            if capacity is None:
+                print(f"💥 Not even {SEARCH_START_RPS} RPS met the SLO.")
+            else:
+                high = self.capacity["bracket_rps"][1]
+                print(f"🎯 CAPACITY: {capacity:.0f} RPS (bracket {capacity:.0f}-{high:.0f} RPS; fails by {high:.0f})")
+                if "confirmation_throughput" in self.capacity:
+                    t = self.capacity["confirmation_throughput"]
+                    print(f"   Achieved at the {capacity:.0f} RPS target: {t['mean']:.0f} RPS "
+                          f"(95% CI of the mean {t['ci95'][0]:.0f}-{t['ci95'][1]:.0f}, {t['runs']} runs)")
+        except KeyboardInterrupt:
+            print("\n🛑 Manual Stop.")
+            self.capacity = {"capacity_rps": None, "interrupted": True, "probes": search.probes}
+        finally:
+            self.results = search.probes
+            self.save_final_report()
+
     def save_final_report(self):
         filename = os.path.join(RESULTS_DIR, f"stress_test_{self.timestamp}.json")
         with open(filename, "w", encoding="utf-8") as f:
-            json.dump(self.results, f, indent=2)
+            json.dump(self.capacity if self.capacity is not None else self.results, f, indent=2)
         print(f"✅ Stress report saved: {filename}")
 
 if __name__ == "__main__":
-    DynamicStressTester().execute()
+    parser = argparse.ArgumentParser(description="Find the URL shortener's capacity")
+    parser.add_argument("--linear", action="store_true",
+                        help=f"Old mode: add {STEP_SIZE} users per step until errors or saturation")
+    if parser.parse_args().linear:
+        DynamicStressTester().execute()
+    else:
+        DynamicStressTester().search()
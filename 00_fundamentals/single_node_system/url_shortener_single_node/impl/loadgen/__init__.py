@@ -0,0 +1,18 @@
+"""
+asyncio load generator for the URL shortener.
+
+Drives the same scenarios as the stress_test*.py scripts with coroutines instead
+of one OS thread per virtual user. Run from `impl/`:
+
+    python -m loadgen --scenario shorten_resolve
+
+Several machines can share one run: start `python -m loadgen --agent PORT` on
+each and point a coordinator at them with `--agents host:port,...`.
+"""
+from .distributed import Agent, Coordinator
+from .engine import AsyncLoadEngine, StageStats, check_health
+from .histogram import LatencyHistogram
+from .http import ConnectionPool, HttpClient, Response
+from .report import LoadTestReporter
+from .scenarios import SCENARIOS
+from .scheduler import Rate
@@ -0,0 +1,464 @@
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from .abtest import ORDERS, ROUND_DURATION, ROUNDS, ABTest, verdict_line
+from .corpus import PIPELINE_DEPTH, SEED_CONNECTIONS, CorpusStore, bulk_seed
+from .dedup import POOL_SIZE
+from .distributed import Agent, Coordinator, parse_address
+from .endpoints import endpoint_summary
+from .engine import BASE_URL, AsyncLoadEngine, check_health
+from .keys import CORPUS_SIZE, DISTRIBUTIONS
+from .openmetrics import MetricsExporter
+from .payloads import SIZES, run_payload_stage, size_label
+from .profiles import Profile, run_profile
+from .report import LoadTestReporter
+from .scenarios import SCENARIOS, get_scenario
+from .scheduler import Rate, describe
+from .soak import (BUCKET_SECONDS, CHECKPOINT_EVERY, MAX_ERROR_SLOPE, MAX_P99_SLOPE_MS, SoakMonitor,
+                   run_soak)
+from .timeseries import TimeSeriesWriter
+from .trace import REPLAY_CONCURRENCY, Replay, TraceWriter, convert_access_log, read_trace
+from .watchdog import Watchdog
+
+# Scenarios: (concurrent_users, duration_seconds) or (Rate(target_rps), duration_seconds)
+STAGES = [
+    (10, 5),            # Warmup
+    (50, 10),           # Baseline
+    (500, 10),          # Heavy
+    (2000, 10),         # Stress
+    (10000, 10),        # Saturation
+    (20000, 10),        # Breakpoint Attempt
+    (Rate(1000), 10),   # Open model: fixed arrival rate, independent of latency
+    (Rate(5000), 10),
+]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m loadgen", description="asyncio load test for the URL shortener")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="shorten_resolve")
+    parser.add_argument("--mix", default=None, metavar="OP=WEIGHT,...",
+                        help="Weighted operation mix instead of --scenario, e.g. resolve=95,shorten=5 "
+                             "(operations: shorten, resolve, stats, health)")
+    parser.add_argument("--keys", choices=DISTRIBUTIONS, default=None,
+                        help="Resolve-only hot-key workload over a seeded corpus, instead of --scenario")
+    parser.add_argument("--corpus-size", type=int, default=None,
+                        help=f"Short codes --keys reads from (default: all seeded entries of --corpus, else {CORPUS_SIZE} seeded in memory)")
+    parser.add_argument("--corpus", default=None, metavar="PATH",
+                        help="Corpus store file: written by --seed, memory-mapped by --keys")
+    parser.add_argument("--seed", type=int, default=None, metavar="N",
+                        help="Only seed N corpus URLs into --corpus through /shorten, then exit (resumes a partial file)")
+    parser.add_argument("--namespace", default="corpus", help="Path segment that makes --seed's URLs unique")
+    parser.add_argument("--seed-connections", type=int, default=SEED_CONNECTIONS, help="Connections --seed writes over")
+    parser.add_argument("--pipeline-depth", type=int, default=PIPELINE_DEPTH,
+                        help="Most requests --seed pipelines on one connection")
+    parser.add_argument("--duplicates", type=float, default=None, metavar="RATIO",
+                        help="/shorten-only workload where this fraction of requests repeat an already shortened "
+                             "URL, checking the code and reporting the duplicate and unique paths apart")
+    parser.add_argument("--dup-pool", type=int, default=POOL_SIZE,
+                        help="Long URLs per process that --duplicates repeats")
+    parser.add_argument("--skew", type=float, default=1.0, help="Zipf exponent for --keys zipf (0 = uniform)")
+    parser.add_argument("--latest-n", type=int, default=1000,
+                        help="How many of the newest codes --keys latest reads from")
+    parser.add_argument("--profile", default=None, metavar="SPEC",
+                        help="Run one continuous load profile instead of STAGES, reported per --interval window, "
+                             "e.g. users:linear,from=10,to=500,over=60 or rps:spike,base=200,peak=2000,at=30,for=10 "
+                             "(shapes: linear, step, spike, soak)")
+    parser.add_argument("--soak", action="store_true",
+                        help="Run --profile as a soak: bounded memory, per-bucket trends, drift alerts and "
+                             "periodic checkpoints to soak_checkpoint_v5_*.json")
+    parser.add_argument("--soak-bucket", type=float, default=BUCKET_SECONDS,
+                        help="Seconds per soak summary bucket (the unit trends are fitted over)")
+    parser.add_argument("--checkpoint-every", type=float, default=CHECKPOINT_EVERY,
+                        help="Seconds between soak checkpoints")
+    parser.add_argument("--max-p99-slope", type=float, default=MAX_P99_SLOPE_MS,
+                        help="Alert when a soak's P99 rises faster than this many ms per hour")
+    parser.add_argument("--max-error-slope", type=float, default=MAX_ERROR_SLOPE,
+                        help="Alert when a soak's error rate rises faster than this many percentage points per hour")
+    parser.add_argument("--payload-sweep", action="store_true",
+                        help="Instead of STAGES, offer --sweep-rps once per long_url size in --sweep-sizes "
+                             "and report RPS, bytes/s and latency per size")
+    parser.add_argument("--sweep-sizes", default="/".join(str(s) for s in SIZES), metavar="B/B/...",
+                        help="long_url lengths in bytes the sweep steps through")
+    parser.add_argument("--sweep-rps", type=float, default=200, help="Arrival rate offered at every sweep size")
+    parser.add_argument("--sweep-duration", type=float, default=10, help="Seconds per sweep size")
+    parser.add_argument("--ab", default=None, metavar="URL_A,URL_B",
+                        help="Instead of STAGES, compare two servers: interleave identical rounds between them "
+                             "and report the P50/P99/throughput difference with 95%% confidence intervals")
+    parser.add_argument("--ab-rounds", type=int, default=ROUNDS, help="Paired rounds an --ab run takes")
+    parser.add_argument("--ab-round-duration", type=float, default=ROUND_DURATION,
+                        help="Seconds of load per target per --ab round")
+    parser.add_argument("--ab-order", choices=ORDERS, default="alternate",
+                        help="Per-round target order: ABBA alternation or random")
+    parser.add_argument("--ab-rps", type=float, default=500,
+                        help="Arrival rate offered to each --ab target (open model)")
+    parser.add_argument("--ab-users", type=int, default=None,
+                        help="Run --ab rounds with this many closed-model users instead of --ab-rps")
+    parser.add_argument("--record-trace", action="store_true",
+                        help="Record every request the run sends to trace_v5_*.bin, for --replay")
+    parser.add_argument("--replay", default=None, metavar="TRACE",
+                        help="Instead of STAGES, send the requests of a recorded or converted trace "
+                             "at their original offsets")
+    parser.add_argument("--replay-speed", type=float, default=1.0,
+                        help="Replay time compression: 1 = as recorded, 2 = twice as fast, "
+                             "0 = back to back as fast as --replay-concurrency allows")
+    parser.add_argument("--replay-concurrency", type=int, default=REPLAY_CONCURRENCY,
+                        help="Requests in flight during a --replay-speed 0 replay")
+    parser.add_argument("--convert-log", nargs=2, default=None, metavar=("ACCESS_LOG", "TRACE"),
+                        help="Only convert a common/combined-format access log into a trace for --replay, then exit")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--timeout", type=float, default=5.0, help="Per-request timeout in seconds")
+    parser.add_argument("--hdr-digits", type=int, default=3, choices=range(1, 6),
+                        help="Significant digits kept by the latency histograms")
+    parser.add_argument("--workers", type=int, default=1,
+                        help=f"Generator processes per stage (this machine has {os.cpu_count()} cores)")
+    parser.add_argument("--pool", choices=["per-user", "shared"], default="per-user",
+                        help="One connection pool per virtual user, or one pool shared by the stage")
+    parser.add_argument("--pool-size", type=int, default=None,
+                        help="Connections per pool (default: 1 for per-user pools, one per user for a shared pool)")
+    parser.add_argument("--new-connections", action="store_true",
+                        help="Disable keep-alive: open a fresh TCP connection for every request")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="Seconds per time-series snapshot streamed to timeseries_v5_*.jsonl")
+    parser.add_argument("--metrics-port", type=int, default=None, metavar="PORT",
+                        help="Serve live OpenMetrics/Prometheus metrics at http://127.0.0.1:PORT/metrics during the run")
+    parser.add_argument("--cooldown", type=float, default=2.0, help="Seconds to rest between stages")
+    parser.add_argument("--no-watchdog", action="store_true",
+                        help="Always run stages to the end, however broken the target looks")
+    parser.add_argument("--no-self-monitor", action="store_true",
+                        help="Do not sample the generator's own CPU and loop lag, nor flag client-bound stages")
+    parser.add_argument("--abort-error-rate", type=float, default=50.0,
+                        help="Abort a stage when its rolling error rate exceeds this percentage")
+    parser.add_argument("--abort-timeout-rate", type=float, default=25.0,
+                        help="Abort a stage when this percentage of its rolling results timed out")
+    parser.add_argument("--abort-p99-ms", type=float, default=None,
+                        help="Abort a stage when its rolling P99 exceeds this (off by default)")
+    parser.add_argument("--agents", default=None,
+                        help="Comma-separated host:port list of load agents to coordinate instead of generating locally")
+    parser.add_argument("--agent", type=int, default=None, metavar="PORT",
+                        help="Run as a load agent on this control port and wait for a coordinator")
+    parser.add_argument("--bind", default="127.0.0.1", help="Address an agent's control port listens on")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.seed is not None:
+        return seed(args)
+    if args.convert_log:
+        return convert_log(args)
+    if args.keys:
+        spec = f"hot:{args.keys},skew={args.skew:g},latest={args.latest_n}"
+        if args.corpus_size:
+            spec += f",keys={args.corpus_size}"
+        if args.corpus:
+            spec += f",corpus={args.corpus}"
+        try:
+            args.scenario = str(get_scenario(spec))
+        except (OSError, ValueError) as e:
+            print(f"❌ Invalid --keys: {e}")
+            return 2
+    elif args.duplicates is not None:
+        try:
+            args.scenario = str(get_scenario(f"dup:ratio={args.duplicates:g},pool={args.dup_pool}"))
+        except ValueError as e:
+            print(f"❌ Invalid --duplicates: {e}")
+            return 2
+    elif args.mix:
+        try:
+            args.scenario = str(get_scenario(args.mix))
+        except ValueError as e:
+            print(f"❌ Invalid --mix: {e}")
+            return 2
+    stages = STAGES
+    if args.profile:
+        try:
+            profile = Profile.from_spec(args.profile)
+        except ValueError as e:
+            print(f"❌ Invalid --profile: {e}")
+            return 2
+        stages = [(profile, profile.duration)]
+    elif args.soak:
+        print("❌ --soak needs a --profile to hold, e.g. users:soak,level=200,for=21600")
+        return 2
+    sweep_sizes = []
+    if args.payload_sweep:
+        if args.profile:
+            print("❌ --payload-sweep runs its own stages; drop --profile")
+            return 2
+        try:
+            sweep_sizes = [int(size) for size in args.sweep_sizes.split("/")]
+        except ValueError:
+            print(f"❌ Invalid --sweep-sizes: {args.sweep_sizes!r}")
+            return 2
+        args.scenario = f"payload:size={sweep_sizes[0]}"
+        stages = [(Rate(args.sweep_rps), args.sweep_duration) for _ in sweep_sizes]
+    if args.replay:
+        if args.profile or args.payload_sweep or args.agents:
+            print("❌ --replay runs the trace as its only stage, on this machine; drop --profile, "
+                  "--payload-sweep and --agents")
+            return 2
+        try:
+            replay = Replay.load(args.replay, args.replay_speed)
+        except (OSError, ValueError) as e:
+            print(f"❌ Invalid --replay: {e}")
+            return 2
+        if not replay.entries:
+            print(f"❌ {args.replay} holds no requests")
+            return 2
+        stages = [(replay, replay.duration)]
+    if args.record_trace and args.agents:
+        print("❌ --record-trace records this machine's requests; it cannot be combined with --agents")
+        return 2
+    if args.ab:
+        return ab_test(args)
+    if args.agent is not None:
+        print(f"🛰️  Load agent listening on {args.bind}:{args.agent} ({args.workers} worker(s))")
+        try:
+            Agent(args.agent, args.bind, args.workers).serve_forever()
+        except KeyboardInterrupt:
+            print("\n🛑 Agent stopped.")
+        return 0
+
+    if not check_health(args.base_url)[0]:
+        print(f"❌ Server not found at {args.base_url}. Please start it first.")
+        return 1
+
+    agents = parse_agents(args)
+    engine = build_engine(args, args.base_url, agents)
+    reporter = LoadTestReporter(args.base_url, [(str(load), d) if isinstance(load, (Profile, Replay)) else (load, d)
+                                                for load, d in stages], args.scenario)
+    record_config(reporter, args, agents)
+    if sweep_sizes:
+        reporter.run_data["config"]["payload_sizes"] = sweep_sizes
+    engine.timeseries = TimeSeriesWriter(reporter.timeseries_path, args.interval)
+    try:
+        engine.timeseries = serve_metrics(args, engine.timeseries)
+    except OSError as e:
+        engine.timeseries.close()
+        print(f"❌ Cannot serve metrics on port {args.metrics_port}: {e}")
+        return 1
+    if args.record_trace:
+        engine.trace = TraceWriter(os.path.join(os.path.dirname(reporter.timeseries_path),
+                                                f"trace_v5_{reporter.timestamp}.bin"))
+        reporter.run_data["trace_file"] = os.path.basename(engine.trace.path)
+        print(f"🎞️  Recording requests to {engine.trace.path}")
+    if args.replay:
+        if args.replay_speed == 0:
+            engine.max_in_flight = args.replay_concurrency
+        reporter.run_data["config"]["replay"] = {"trace": args.replay, "requests": len(replay),
+                                                 "speed": args.replay_speed}
+    print(f"🚀 Starting asyncio Load Test ({args.scenario}) on {args.base_url}"
+          + (f" via {len(agents)} agents" if agents else ""))
+
+    monitor = None
+    if args.soak:
+        monitor = SoakMonitor(os.path.join(os.path.dirname(reporter.timeseries_path),
+                                           f"soak_checkpoint_v5_{reporter.timestamp}.json"),
+                              args.interval, engine.timeseries, profile, args.soak_bucket, args.checkpoint_every,
+                              args.max_p99_slope, args.max_error_slope, args.hdr_digits)
+        print(f"🧪 Soak: {args.soak_bucket:g}s buckets, checkpoint every {args.checkpoint_every:g}s to "
+              f"{monitor.checkpoint_path}")
+    try:
+        engine.prepare()
+        for i, (users, duration) in enumerate(stages):
+            print(f"\n--- Stage: {describe(users)} "
+                  + (f"({duration:g}s)" if duration is not None else f"({len(users)} requests)")
+                  + (f" · {size_label(sweep_sizes[i])} URLs" if sweep_sizes else "") + " ---")
+            windows = soak = None
+            if sweep_sizes:
+                metrics = run_payload_stage(engine, sweep_sizes[i], users, duration)
+                print(f"  -> Payload: {metrics['payload']['body_bytes']} B bodies | "
+                      f"{metrics['payload']['bytes_per_sec'] / 1e6:.2f} MB/s accepted | "
+                      f"{metrics['payload']['rejected_rps']:.2f} RPS rejected")
+            elif monitor is not None:
+                metrics = run_soak(engine, users, duration, monitor)
+                windows, soak = list(monitor.buckets), monitor.summary()
+                users = str(users)
+            elif isinstance(users, Profile):
+                windows, metrics = run_profile(engine, users, args.interval)
+                for w in windows:
+                    target = w.get("target_users", w.get("target_rps"))
+                    print(f"  [{w['t']:7.1f}s] target {target:>9.0f} | RPS: {w['rps']:9.2f} | P99: {w['p99']:8.2f}ms | "
+                          f"Errors: {w['errors']} | In flight: {w['in_flight']}")
+                users = str(users)
+            else:
+                metrics = engine.run_stage(users, duration)
+                if isinstance(users, Replay):
+                    users, duration = str(users), metrics["finished_at"]
+            print(f"  -> RPS: {metrics['rps']:.2f} | P99: {metrics['p99']:.2f}ms | Errors: {metrics['error_rate']:.2f}%")
+            if "target_rps" in metrics:
+                print(f"  -> Offered: {metrics['offered_rps']:.2f} of {metrics['target_rps']} RPS target | Dropped: {metrics['dropped_count']}")
+            if "aborted" in metrics:
+                print(f"  ⛔ Aborted at {metrics['aborted']['at_s']:.1f}s: {metrics['aborted']['reason']}")
+            if not metrics.get("valid", True):
+                print(f"  ⚠️ Invalid, generator-bound: {'; '.join(metrics['generator']['reasons'])}")
+            for name, op in metrics.get("operations", {}).items():
+                print(f"     {name:<10} {op['share']:5.1f}% | RPS: {op['rps']:.2f} | P99: {op['p99']:.2f}ms | Errors: {op['error_rate']:.2f}%")
+            for name, e in metrics.get("endpoints", {}).items():
+                print(f"     {endpoint_summary(name, e)}")
+            reporter.add_stage_result(users, duration, metrics, windows, soak)
+
+            healthy, latency = check_health(args.base_url)
+            reporter.add_health_check(users, healthy, latency)
+            print(f"  💓 Health Check: {'UP' if healthy else 'DOWN'} ({latency:.2f}ms)")
+            time.sleep(args.cooldown)
+    except KeyboardInterrupt:
+        print("\n🛑 Test stopped by user.")
+        if monitor is not None and not reporter.run_data["results"]:
+            # Keep what the soak measured before the interrupt; the checkpoint has it too
+            reporter.add_stage_result(str(profile), round(monitor.elapsed, 1), monitor.metrics(),
+                                      list(monitor.buckets), monitor.summary())
+    finally:
+        engine.timeseries.close()
+        if engine.trace is not None:
+            engine.trace.close()
+            try:
+                # Read back (worker parts included), so a trace --replay cannot load is known now
+                recorded = len(read_trace(engine.trace.path)[1])
+                print(f"🎞️  Trace saved to: {engine.trace.path} ({recorded} requests)")
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Trace {engine.trace.path} does not read back: {e}")
+        print("\nGenerating Reports...")
+        reporter.save_json()
+        reporter.generate_markdown_report()
+        reporter.generate_html_dashboard()
+    return 0
+
+
+def parse_agents(args):
+    return [a.strip() for a in args.agents.split(",") if a.strip()] if args.agents else []
+
+
+def build_engine(args, base_url, agents):
+    """An AsyncLoadEngine, or a Coordinator over `agents`, set up from the command line."""
+    if agents:
+        engine = Coordinator(agents, args.scenario, base_url, args.timeout,
+                             significant_digits=args.hdr_digits, pool=args.pool.replace("-", "_"),
+                             pool_size=args.pool_size, keep_alive=not args.new_connections)
+    else:
+        engine = AsyncLoadEngine(args.scenario, base_url, args.timeout,
+                                 significant_digits=args.hdr_digits, workers=args.workers,
+                                 pool=args.pool.replace("-", "_"), pool_size=args.pool_size,
+                                 keep_alive=not args.new_connections)
+    engine.watchdog = None if args.no_watchdog else Watchdog(
+        args.abort_error_rate / 100, args.abort_timeout_rate / 100, args.abort_p99_ms)
+    engine.self_monitor = not args.no_self_monitor
+    return engine
+
+
+def serve_metrics(args, timeseries):
+    """`timeseries`, wrapped in a MetricsExporter when --metrics-port asks for one."""
+    if args.metrics_port is None:
+        return timeseries
+    exporter = MetricsExporter(args.metrics_port, tee=timeseries)
+    print(f"📡 Live metrics at http://{exporter.address}/metrics")
+    return exporter
+
+
+def record_config(reporter, args, agents):
+    reporter.run_data["config"].update({
+        "workers": args.workers,
+        "pool": args.pool,
+        "pool_size": args.pool_size,
+        "keep_alive": not args.new_connections,
+        "agents": ["%s:%d" % parse_address(a) for a in agents],
+    })
+
+
+def ab_test(args):
+    urls = [u.strip() for u in args.ab.split(",") if u.strip()]
+    if len(urls) != 2:
+        print(f"❌ --ab needs exactly two base URLs, got {args.ab!r}")
+        return 2
+    urls = dict(zip("AB", urls))
+    for target, url in urls.items():
+        if not check_health(url)[0]:
+            print(f"❌ Server {target} not found at {url}. Please start it first.")
+            return 1
+    load = args.ab_users if args.ab_users else Rate(args.ab_rps)
+    agents = parse_agents(args)
+    engines = {target: build_engine(args, url, agents) for target, url in urls.items()}
+    reporter = LoadTestReporter(f"A {urls['A']} vs B {urls['B']}", [(load, args.ab_round_duration)], args.scenario)
+    record_config(reporter, args, agents)
+    timeseries = TimeSeriesWriter(reporter.timeseries_path, args.interval)
+    try:
+        timeseries = serve_metrics(args, timeseries)
+    except OSError as e:
+        timeseries.close()
+        print(f"❌ Cannot serve metrics on port {args.metrics_port}: {e}")
+        return 1
+    for engine in engines.values():
+        engine.timeseries = timeseries
+    try:
+        test = ABTest(engines, load, args.ab_rounds, args.ab_round_duration, args.ab_order,
+                      cooldown=args.cooldown, urls=urls)
+    except ValueError as e:
+        print(f"❌ Invalid A/B test: {e}")
+        return 2
+
+    def on_run(index, target, metrics):
+        metrics["ab"] = {"target": target, "round": index + 1}
+        reporter.add_stage_result(load, args.ab_round_duration, metrics)
+
+    print(f"🆚 A/B test ({args.scenario}, {describe(load)}): A {urls['A']} vs B {urls['B']}, "
+          f"{args.ab_rounds} rounds of {args.ab_round_duration:g}s, {args.ab_order} order")
+    try:
+        for engine in engines.values():
+            engine.prepare()
+        test.run(on_run)
+    except KeyboardInterrupt:
+        print("\n🛑 Test stopped by user.")
+    finally:
+        timeseries.close()
+        result = test.result()
+        reporter.run_data["ab"] = result
+        for metric, v in result["comparison"].items():
+            print(f"  -> {verdict_line(metric, v)}")
+        print("\nGenerating Reports...")
+        reporter.save_json()
+        reporter.generate_markdown_report()
+        reporter.generate_html_dashboard()
+    return 0
+
+
+def convert_log(args):
+    log_path, trace_path = args.convert_log
+    try:
+        requests, skipped = convert_access_log(log_path, trace_path)
+    except OSError as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"🎞️  Converted {requests} requests from {log_path} into {trace_path}"
+          + (f" ({skipped} unparsed lines skipped)" if skipped else ""))
+    return 0 if requests else 1
+
+
+def seed(args):
+    if not args.corpus:
+        print("❌ --seed needs --corpus PATH to write the store to.")
+        return 2
+    if not check_health(args.base_url)[0]:
+        print(f"❌ Server not found at {args.base_url}. Please start it first.")
+        return 1
+    try:
+        store = CorpusStore.create(args.corpus, args.seed, args.namespace)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 2
+    print(f"🌱 Seeding {args.seed} URLs into {args.corpus} ({args.seed_connections} connections, "
+          f"pipeline depth {args.pipeline_depth})")
+    try:
+        asyncio.run(bulk_seed(args.base_url, store, args.seed_connections, args.pipeline_depth, args.timeout))
+    except KeyboardInterrupt:
+        print("\n🛑 Seeding stopped; run the same command again to resume.")
+        return 1
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
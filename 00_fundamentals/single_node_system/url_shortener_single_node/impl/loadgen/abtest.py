@@ -0,0 +1,151 @@
+"""
+Interleaved A/B comparison of two servers under one workload.
+
+Two runs of the harness at different times differ by whatever else the
+machine was doing, which swamps most changes to UrlService or the H2 config.
+An ABTest instead runs the same stage against both targets in short rounds,
+back to back, so drift hits both alike:
+
+    alternate  A B, then B A, ... (ABBA: a trend favours neither side)
+    random     each round's order drawn at random
+
+Per round it takes the difference B - A of P50, P99 and throughput; the
+verdict for each is the 95% confidence interval of the mean paired
+difference (Student-t over rounds). Per target, the rounds' histograms are
+merged for whole-run percentiles.
+
+    python -m loadgen --ab http://localhost:8080,http://localhost:8081 --ab-rounds 10
+"""
+import random
+import time
+
+from .capacity import confidence_interval
+from .histogram import LatencyHistogram
+
+ORDERS = ("alternate", "random")
+ROUNDS = 10
+ROUND_DURATION = 10
+# Metrics compared, and whether a higher value is better
+COMPARED = {"p50": False, "p99": False, "rps": True}
+
+
+def verdict(diffs, higher_is_better):
+    """Paired differences B - A over rounds -> mean, 95% CI and which side is better, if either."""
+    mean, low, high = confidence_interval(diffs)
+    if len(diffs) < 2 or low <= 0 <= high:
+        better = None
+    else:
+        better = "B" if (low > 0) == higher_is_better else "A"
+    return {"mean_diff": mean, "ci95": [low, high], "better": better}
+
+
+class ABTest:
+    """
+    Runs `load` for `round_duration` seconds on each of two engines per round.
+    `engines` is {"A": engine, "B": engine}, one AsyncLoadEngine or
+    Coordinator per base URL, otherwise configured identically.
+    """
+
+    def __init__(self, engines, load, rounds=ROUNDS, round_duration=ROUND_DURATION, order="alternate",
+                 warmup=True, cooldown=1.0, urls=None, rng=random):
+        if order not in ORDERS:
+            raise ValueError(f"Unknown A/B order {order!r}, expected one of {ORDERS}")
+        if rounds < 2:
+            raise ValueError("An A/B test needs at least 2 rounds for a confidence interval")
+        self.engines = engines
+        self.load = load
+        self.rounds = rounds
+        self.round_duration = round_duration
+        self.order = order
+        self.warmup = warmup
+        self.cooldown = cooldown
+        self.urls = urls or {}
+        self.rng = rng
+        # (round, target, metrics) as they complete
+        self.runs = []
+
+    def _order(self, index):
+        if self.order == "random":
+            return self.rng.sample(["A", "B"], 2)
+        return ["A", "B"] if index % 2 == 0 else ["B", "A"]
+
+    def run(self, on_run=None):
+        """Run every round; `on_run(round, target, metrics)` after each stage. Returns the result dict."""
+        if self.warmup:
+            for target in ("A", "B"):
+                print(f"   [warmup  ] {target}")
+                self.engines[target].run_stage(self.load, self.round_duration)
+                time.sleep(self.cooldown)
+        for index in range(self.rounds):
+            for target in self._order(index):
+                metrics = self.engines[target].run_stage(self.load, self.round_duration)
+                self.runs.append((index, target, metrics))
+                print(f"   [round {index + 1:>2}] {target} | RPS: {metrics['rps']:.2f} | "
+                      f"P50: {metrics['p50']:.2f}ms | P99: {metrics['p99']:.2f}ms | Errors: {metrics['error_rate']:.2f}%")
+                if on_run is not None:
+                    on_run(index, target, metrics)
+                time.sleep(self.cooldown)
+        return self.result()
+
+    def result(self):
+        by_round = {}
+        for index, target, metrics in self.runs:
+            by_round.setdefault(index, {})[target] = metrics
+        pairs = [r for r in by_round.values() if len(r) == 2]
+        targets = {}
+        for target in ("A", "B"):
+            runs = [m for _, t, m in self.runs if t == target]
+            if not runs:
+                continue
+            merged = LatencyHistogram.from_dict(runs[0]["histogram"])
+            for m in runs[1:]:
+                merged.merge(LatencyHistogram.from_dict(m["histogram"]))
+            summary = merged.summary_ms()
+            summary["rps"] = sum(m["rps"] for m in runs) / len(runs)
+            summary["error_rate"] = sum(m["error_rate"] for m in runs) / len(runs)
+            summary["rounds"] = len(runs)
+            targets[target] = summary
+        comparison = {}
+        for metric, higher_is_better in COMPARED.items():
+            diffs = [r["B"][metric] - r["A"][metric] for r in pairs]
+            if not diffs:
+                continue
+            v = verdict(diffs, higher_is_better)
+            base = sum(r["A"][metric] for r in pairs) / len(pairs)
+            v["relative_pct"] = v["mean_diff"] / base * 100 if base else None
+            comparison[metric] = v
+        return {
+            "urls": self.urls,
+            "load": str(self.load),
+            "order": self.order,
+            "round_duration": self.round_duration,
+            "paired_rounds": len(pairs),
+            "targets": targets,
+            "comparison": comparison,
+        }
+
+
+def verdict_line(metric, v):
+    """'p99: B - A = -3.10ms (-12.4%), 95% CI [-4.20, -2.00] -> B better'."""
+    unit = "" if metric == "rps" else "ms"
+    relative = f" ({v['relative_pct']:+.1f}%)" if v["relative_pct"] is not None else ""
+    outcome = f"{v['better']} better" if v["better"] else "no significant difference"
+    return (f"{metric}: B - A = {v['mean_diff']:+.2f}{unit}{relative}, "
+            f"95% CI [{v['ci95'][0]:+.2f}, {v['ci95'][1]:+.2f}] -> {outcome}")
+
+
+def ab_table_md(ab):
+    """Markdown lines for an ABTest result: per-target percentiles, then the verdicts."""
+    lines = [
+        f"**Load:** {ab['load']} for {ab['round_duration']:g}s per run, {ab['paired_rounds']} paired rounds "
+        f"({ab['order']} order)",
+        "",
+        "| Target | URL | RPS | P50 (ms) | P99 (ms) | P99.9 (ms) | Error Rate % |",
+        "|---|---|---|---|---|---|---|",
+    ]
+    for target, t in ab["targets"].items():
+        lines.append(f"| {target} | `{ab['urls'].get(target, '')}` | {t['rps']:.2f} | {t['p50']:.2f} | {t['p99']:.2f} | "
+                     f"{t['p999']:.2f} | {t['error_rate']:.2f} |")
+    lines.append("")
+    lines.extend(f"- {verdict_line(metric, v)}" for metric, v in ab["comparison"].items())
+    return lines
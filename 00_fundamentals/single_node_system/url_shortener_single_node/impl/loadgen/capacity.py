@@ -0,0 +1,145 @@
+"""
+Capacity search: the highest arrival rate a server sustains within an SLO.
+
+Adding a fixed number of users per step is slow on a big server and
+overshoots a small one, and a closed ramp measures concurrency, not the
+throughput a server can be offered. The search instead runs open-model
+probes (Rate stages):
+
+    1. exponential: double the rate from `start_rps` until a probe fails
+    2. bisection:   halve the [last pass, first fail] bracket until it is
+                    within `resolution` of its lower end
+    3. confirm:     rerun the best passing rate `confirmations` times; a
+                    failure there moves the upper bound down and bisection
+                    resumes, so one lucky probe cannot set the capacity
+
+A probe passes when its corrected latency percentile and error rate are within
+the SLO and the server completed (nearly) everything the generator actually
+sent: Poisson arrivals alone miss the target rate by several percent in a
+fair share of 10 s probes, which says nothing about the server. A probe
+the generator could not drive (see selfmon.py) fails too, so the capacity
+found is then a lower bound set by the client; its probe record says so.
+
+The capacity's uncertainty is its final bracket, [capacity, first failing
+rate); the confirmation runs only give the spread of the throughput measured
+at that one rate (`confirmation_throughput`), not an interval on capacity.
+"""
+import math
+import statistics
+import time
+
+from .scheduler import Rate
+
+# Two-sided 95% Student-t quantiles by degrees of freedom; normal beyond
+T_95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262, 10: 2.228}
+# A probe that completes less than this share of the requests it sent is saturated
+MIN_THROUGHPUT_RATIO = 0.95
+
+
+def confidence_interval(samples):
+    """(mean, low, high) 95% interval of the mean of `samples`."""
+    mean = statistics.fmean(samples)
+    if len(samples) < 2:
+        return mean, mean, mean
+    half = T_95.get(len(samples) - 1, 1.96) * statistics.stdev(samples) / math.sqrt(len(samples))
+    return mean, mean - half, mean + half
+
+
+class CapacitySearch:
+    """
+    Drives `engine.run_stage` with Rate probes; `run()` returns the result
+    dict, and `probes` logs every probe as it happens.
+    """
+
+    def __init__(self, engine, slo_ms, max_error_rate, slo_metric="p99_corrected", start_rps=100,
+                 max_rps=100_000, probe_duration=10, resolution=0.05, confirmations=3, cooldown=2.0):
+        self.engine = engine
+        self.slo_ms = slo_ms
+        self.max_error_rate = max_error_rate
+        self.slo_metric = slo_metric
+        self.start_rps = start_rps
+        self.max_rps = max_rps
+        self.probe_duration = probe_duration
+        self.resolution = resolution
+        self.confirmations = confirmations
+        self.cooldown = cooldown
+        self.probes = []
+
+    def probe(self, rps, phase):
+        m = self.engine.run_stage(Rate(rps), self.probe_duration)
+        reasons = []
+        if m["error_rate"] / 100 > self.max_error_rate:
+            reasons.append(f"errors {m['error_rate']:.1f}%")
+        if m[self.slo_metric] > self.slo_ms:
+            reasons.append(f"{self.slo_metric} {m[self.slo_metric]:.0f}ms")
+        if m["rps"] < m["offered_rps"] * MIN_THROUGHPUT_RATIO:
+            reasons.append(f"throughput {m['rps']:.0f} of {m['offered_rps']:.0f} rps offered")
+        if "aborted" in m:
+            reasons.append(f"aborted at {m['aborted']['at_s']:.1f}s: {m['aborted']['reason']}")
+        if not m.get("valid", True):
+            # Not the server's limit, but nothing above this rate can be measured either
+            reasons.append(f"generator-bound: {'; '.join(m['generator']['reasons'])}")
+        record = {
+            "phase": phase,
+            "target_rps": rps,
+            "offered_rps": m["offered_rps"],
+            "rps": m["rps"],
+            "p50": m["p50"],
+            "p99": m["p99"],
+            self.slo_metric: m[self.slo_metric],
+            "error_rate": m["error_rate"],
+            "passed": not reasons,
+            "reason": ", ".join(reasons),
+        }
+        self.probes.append(record)
+        verdict = "✅ pass" if record["passed"] else f"❌ fail ({record['reason']})"
+        print(f"   [{phase:<12}] {rps:>9.0f} rps -> {m['rps']:.0f} rps | "
+              f"{self.slo_metric}: {m[self.slo_metric]:.2f}ms | {verdict}")
+        time.sleep(self.cooldown)
+        return record
+
+    def run(self):
+        lo, hi = None, None
+        rps = self.start_rps
+        while rps <= self.max_rps:
+            if not self.probe(rps, "exponential")["passed"]:
+                hi = rps
+                break
+            lo = rps
+            rps *= 2
+        if lo is None:
+            return self._result(None, hi)
+        if hi is None:
+            print(f"   Reached max_rps ({self.max_rps}) without failing the SLO")
+            hi = lo
+
+        while True:
+            while hi - lo > lo * self.resolution:
+                mid = (lo + hi) / 2
+                if self.probe(mid, "bisection")["passed"]:
+                    lo = mid
+                else:
+                    hi = mid
+            confirmed = [self.probe(lo, "confirmation") for _ in range(self.confirmations)]
+            if all(p["passed"] for p in confirmed):
+                return self._result(lo, hi, confirmed)
+            if lo <= self.start_rps:
+                return self._result(None, lo, confirmed)
+            # The bracket's lower end was a fluke: it becomes the upper bound
+            hi = lo
+            lo = max((p["target_rps"] for p in self.probes if p["passed"] and p["target_rps"] < hi),
+                     default=self.start_rps)
+
+    def _result(self, capacity, upper, confirmed=()):
+        result = {
+            "slo": {self.slo_metric: self.slo_ms, "max_error_rate": self.max_error_rate},
+            "capacity_rps": capacity,
+            "bracket_rps": [capacity, upper],
+            "probes": self.probes,
+        }
+        samples = [p["rps"] for p in confirmed if p["passed"]]
+        if samples:
+            mean, low, high = confidence_interval(samples)
+            result["confirmation_throughput"] = {"rps": capacity, "mean": mean, "ci95": [low, high],
+                                                 "runs": len(samples)}
+        return result
@@ -0,0 +1,199 @@
+"""
+Bulk corpus seeding and the compact on-disk code store.
+
+Corpus entry i is the deterministic URL `corpus_url(namespace, i)`, so the
+store only has to keep the short code the server gave it: a fixed-width record
+per entry after a small header, memory-mapped so a reader finds code i at a
+known offset without parsing anything and 10M entries cost 80MB of page cache
+rather than 10M Python objects.
+
+    header  magic(8) size(u64) width(u16) namespace_len(u16) namespace  -> padded to 64 bytes
+    records size x width bytes, ASCII code, NUL-padded; all NUL = not seeded yet
+
+Seeding pipelines POST /shorten batches over many keep-alive connections and
+backs off (halving a connection's pipeline depth) on errors and 5xx/429, so
+it runs as fast as the server accepts writes and no faster. /shorten is
+idempotent per URL, which makes retried batches and resumed runs safe.
+
+    python -m loadgen --seed 10000000 --corpus corpus.bin
+"""
+import asyncio
+import itertools
+import json
+import mmap
+import os
+import struct
+import time
+
+from .http import REQUEST_ERRORS, ConnectionPool, HttpConnection
+
+MAGIC = b"LGCORP1\0"
+HEADER = struct.Struct("<8sQHH")
+DATA_ALIGN = 64
+# Codes from RandomShortCodeGenerator are 8 characters
+CODE_WIDTH = 8
+
+SEED_CONNECTIONS = 64
+PIPELINE_DEPTH = 32
+# Consecutive failed batches on one connection before seeding gives up
+MAX_FAILURES = 8
+PROGRESS_EVERY = 5.0
+
+
+def corpus_url(namespace, index):
+    return f"https://example.com/{namespace}/{index}"
+
+
+class CorpusStore:
+    """Fixed-width short codes, memory-mapped; code i belongs to corpus_url(namespace, i)."""
+
+    def __init__(self, mm, file=None):
+        magic, self.size, self.width, ns_len = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a corpus store (bad magic)")
+        self.namespace = mm[HEADER.size:HEADER.size + ns_len].decode()
+        self._offset = _data_offset(ns_len)
+        self._mm = mm
+        self._file = file
+
+    @classmethod
+    def open(cls, path, writable=False):
+        f = open(path, "r+b" if writable else "rb")
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        return cls(mm, f)
+
+    @classmethod
+    def create(cls, path, size, namespace="corpus", width=CODE_WIDTH):
+        """New store at `path`, or the existing one if it matches (to resume seeding)."""
+        if os.path.exists(path):
+            store = cls.open(path, writable=True)
+            if (store.size, store.namespace, store.width) != (size, namespace, width):
+                store.close()
+                raise ValueError(f"{path} holds a different corpus ({store.size} x {store.namespace!r}); "
+                                 "remove it or pick another path")
+            return store
+        ns = namespace.encode()
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, size, width, len(ns)) + ns)
+            f.truncate(_data_offset(len(ns)) + size * width)
+        return cls.open(path, writable=True)
+
+    @classmethod
+    def in_memory(cls, size, namespace="corpus", width=CODE_WIDTH):
+        """Anonymous mapping with the same layout; forked workers share its pages."""
+        ns = namespace.encode()
+        mm = mmap.mmap(-1, _data_offset(len(ns)) + size * width)
+        mm[:HEADER.size + len(ns)] = HEADER.pack(MAGIC, size, width, len(ns)) + ns
+        return cls(mm)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        start = self._offset + index * self.width
+        return self._mm[start:start + self.width].rstrip(b"\0").decode("ascii")
+
+    def url(self, index):
+        return corpus_url(self.namespace, index)
+
+    def put(self, index, code):
+        raw = code.encode("ascii")
+        if len(raw) > self.width:
+            raise ValueError(f"Short code {code!r} is longer than the store's {self.width}-byte records")
+        start = self._offset + index * self.width
+        self._mm[start:start + self.width] = raw.ljust(self.width, b"\0")
+
+    def missing(self):
+        """Indexes not seeded yet, in order."""
+        mm, offset, width = self._mm, self._offset, self.width
+        return (i for i in range(self.size) if mm[offset + i * width] == 0)
+
+    def seeded(self):
+        """
+        (seeded entries before the first missing one, missing entries between
+        seeded ones): an interrupted seed leaves a prefix, with holes where
+        batches were still retrying.
+        """
+        mm, offset, width = self._mm, self._offset, self.width
+        end = self.size
+        while end and mm[offset + (end - 1) * width] == 0:
+            end -= 1
+        holes = sum(1 for i in range(end) if mm[offset + i * width] == 0)
+        prefix = end if not holes else next(self.missing())
+        return prefix, holes
+
+    def close(self):
+        self._mm.close()
+        if self._file is not None:
+            self._file.close()
+
+
+def _data_offset(ns_len):
+    return -(-(HEADER.size + ns_len) // DATA_ALIGN) * DATA_ALIGN
+
+
+async def bulk_seed(base_url, store, connections=SEED_CONNECTIONS, depth=PIPELINE_DEPTH, timeout=5.0, verbose=True):
+    """Fill every missing entry of `store` through POST /shorten; returns how many were created."""
+    todo = store.missing()
+    pool = ConnectionPool(base_url, connections, timeout)
+    done = 0
+
+    async def lane():
+        nonlocal done
+        conn = HttpConnection(pool)
+        window, failures, batch = depth, 0, []
+        try:
+            while True:
+                batch = batch or list(itertools.islice(todo, window))
+                if not batch:
+                    return
+                try:
+                    responses = await conn.pipeline([
+                        ("POST", "/shorten", json.dumps({"long_url": store.url(i)}).encode()) for i in batch
+                    ])
+                except REQUEST_ERRORS:
+                    responses = None
+                retry = []
+                for i, resp in zip(batch, responses or ()):
+                    if resp.status == 200:
+                        store.put(i, resp.json()["short_url"].rsplit("/", 1)[-1])
+                    elif resp.status == 429 or resp.status >= 500:
+                        retry.append(i)
+                    else:
+                        raise RuntimeError(f"Seeding {store.url(i)} failed with HTTP {resp.status}")
+                if responses is not None:
+                    done += len(batch) - len(retry)
+                if responses is None or retry:
+                    # Backpressure: shallower pipeline, then wait before retrying
+                    failures += 1
+                    if failures > MAX_FAILURES:
+                        raise RuntimeError(f"Seeding gave up after {MAX_FAILURES} failed batches in a row")
+                    window = max(1, window // 2)
+                    batch = retry if responses is not None else batch
+                    await asyncio.sleep(min(2.0, 0.05 * 2 ** failures))
+                else:
+                    failures, batch = 0, []
+                    window = min(depth, window + 1)
+        finally:
+            conn.close()
+
+    async def progress(t0):
+        while True:
+            await asyncio.sleep(PROGRESS_EVERY)
+            elapsed = time.perf_counter() - t0
+            print(f"  🌱 {done} seeded ({done / elapsed:.0f}/s)")
+
+    t0 = time.perf_counter()
+    reporter = asyncio.get_running_loop().create_task(progress(t0)) if verbose else None
+    try:
+        await asyncio.gather(*(lane() for _ in range(connections)))
+    finally:
+        if reporter is not None:
+            reporter.cancel()
+        pool.close()
+    if verbose:
+        elapsed = time.perf_counter() - t0
+        print(f"  🌱 Seeded {done} keys in {elapsed:.1f}s ({done / elapsed if elapsed else 0:.0f}/s)")
+    return done
@@ -0,0 +1,99 @@
+"""
+Duplicate-URL workload for the /shorten deduplication path.
+
+UrlService.shorten hashes the normalized long URL and, when the hash is
+already stored, returns the existing code after one lookup; only a new URL
+goes on to ShortCodeGenerator and an INSERT. A scenario that always posts a
+fresh URL only ever measures the second path. `Duplicates` posts, with
+probability `ratio`, a long URL from a finite pool it has already shortened,
+and otherwise one the server has never seen:
+
+    duplicate  a pool URL again; the code returned must be the one it got first
+    unique     a new URL; its code must not already belong to another pool URL
+
+Each call is accounted under its path, so the two get their own throughput
+and latency. A code that breaks either rule fails as `dedup_mismatch`.
+
+    python -m loadgen --scenario dup:ratio=0.3,pool=1000
+"""
+import os
+import random
+
+from .errors import DedupMismatch
+
+DUPLICATE_RATIO = 0.3
+POOL_SIZE = 1000
+
+
+class Duplicates:
+    """
+    /shorten scenario with a controlled share of repeated long URLs.
+
+    The pool fills from the first unique calls, so until it has codes a
+    duplicate draw is posted as a unique one and the ratio settles once the
+    pool is warm. URLs carry a per-process token: forked workers and agents
+    never send each other's "unique" URLs, and every run starts cold.
+    """
+
+    def __init__(self, ratio=DUPLICATE_RATIO, pool=POOL_SIZE):
+        if not 0 <= ratio <= 1:
+            raise ValueError(f"Duplicate ratio must be between 0 and 1, got {ratio:g}")
+        if pool < 1:
+            raise ValueError(f"Duplicate pool needs at least one URL, got {pool}")
+        self.ratio = ratio
+        self.pool = pool
+        # (long_url, code) of the pool URLs shortened so far
+        self.shortened = []
+        self._owner = {}
+        self._issued = 0
+        self._token = None
+        self._pid = None
+
+    @classmethod
+    def from_spec(cls, spec):
+        """'ratio=0.3,pool=1000' -> Duplicates."""
+        kwargs = {}
+        for param in filter(None, spec.split(",")):
+            name, _, value = param.partition("=")
+            name = name.strip()
+            if name not in ("ratio", "pool"):
+                raise ValueError(f"Unknown duplicate-workload parameter {name!r}")
+            kwargs[name] = float(value) if name == "ratio" else int(value)
+        return cls(**kwargs)
+
+    def __str__(self):
+        return f"dup:ratio={self.ratio:g},pool={self.pool}"
+
+    def _new_url(self):
+        self._issued += 1
+        return f"https://example.com/dup/{self._token}/{self._issued}", self._issued <= self.pool
+
+    async def __call__(self, client):
+        if self._pid != os.getpid():
+            # Forked workers inherit this object: each starts its own pool under its own token
+            self._pid, self._token = os.getpid(), f"{os.getpid()}-{random.getrandbits(32):08x}"
+            self.shortened, self._owner, self._issued = [], {}, 0
+        duplicate = bool(self.shortened) and random.random() < self.ratio
+        if duplicate:
+            url, expected = random.choice(self.shortened)
+        else:
+            url, pooled = self._new_url()
+        path = "duplicate" if duplicate else "unique"
+        try:
+            resp = await client.post_json("/shorten", {"long_url": url})
+            if resp.status != 200:
+                return path, False
+            code = resp.json()["short_url"].split("/")[-1]
+            if duplicate and code != expected:
+                raise DedupMismatch(f"{url} was {expected}, now {code}")
+            if not duplicate:
+                owner = self._owner.get(code)
+                if owner is not None and owner != url:
+                    raise DedupMismatch(f"new URL {url} got {code}, already {owner}")
+                if pooled:
+                    self.shortened.append((url, code))
+                    self._owner[code] = url
+        except Exception as e:
+            e.operation = path
+            raise
+        return path, True
@@ -0,0 +1,284 @@
+"""
+Distributed load generation: one coordinator, several agents.
+
+An agent is the ordinary engine behind a control port:
+
+    python -m loadgen --agent 9101 [--bind 0.0.0.0] [--workers 4]
+
+The coordinator walks STAGES as usual, but every stage is split across the
+agents (users divided, or the arrival rate divided with staggered phases),
+started at one common instant and merged from the StageStats the agents send
+back, so the report reads like one very large generator:
+
+    python -m loadgen --agents 10.0.0.5:9101,10.0.0.6:9101
+
+Control protocol: one JSON object per line over TCP, one connection per stage.
+
+    -> {"cmd": "clock"}     <- {"status": "ok", "time": <agent wall clock>}
+    -> {"cmd": "prepare", "engine": {...}}
+                            <- {"status": "ok"} once the scenario is set up
+    -> {"cmd": "stage", "engine": {...}, "load": {...}, "duration": ...,
+        "phase": ..., "start_at": <agent wall clock>, "interval": ..., "watchdog": {...},
+        "self_monitor": true}
+                            <- {"status": "interval", "interval": [...]}   (0..n)
+                            <- {"status": "ok", "stats": StageStats.to_dict()}
+                               or {"status": "error", "error": <traceback>}
+"""
+import asyncio
+import itertools
+import json
+import socketserver
+import time
+import traceback
+
+from .engine import BASE_URL, AsyncLoadEngine, StageStats
+from .histogram import SIGNIFICANT_DIGITS
+from .profiles import Profile, target_rps
+from .scheduler import Rate
+from .watchdog import Watchdog
+from .workers import flush_intervals, merge_interval, split_load
+
+# How far ahead of "now" a stage is scheduled, so every agent (and its forked
+# workers) is ready before the common start time
+START_LEAD = 1.5
+# Slack beyond the stage duration before an agent that went quiet is given up on
+REPLY_GRACE = 60.0
+# Stage replies carry serialized histograms; asyncio's default 64KiB line limit is too small
+LINE_LIMIT = 1 << 24
+
+
+def parse_address(address, default_host="127.0.0.1"):
+    """'host:port' or ':port' or 'port' -> (host, port)."""
+    host, _, port = address.rpartition(":")
+    return host or default_host, int(port)
+
+
+def encode_load(load):
+    if isinstance(load, Profile):
+        return {"profile": str(load), "shares": load.shares}
+    if isinstance(load, Rate):
+        return {"rps": load.rps, "arrival": load.arrival}
+    return {"users": load}
+
+
+def decode_load(data):
+    if "profile" in data:
+        profile = Profile.from_spec(data["profile"])
+        for index, of in data["shares"]:
+            profile = profile.share(index, of)
+        return profile
+    if "rps" in data:
+        return Rate(data["rps"], data["arrival"])
+    return data["users"]
+
+
+# --- Agent ------------------------------------------------------------------
+
+
+class _IntervalForwarder:
+    """Stands in for a TimeSeriesWriter on an agent: intervals go to the coordinator."""
+
+    def __init__(self, send, interval):
+        self.interval = interval
+        self._send = send
+        self._seq = itertools.count()
+
+    def begin_stage(self, label):
+        pass
+
+    def write(self, window, in_flight, length):
+        self._send({"status": "interval", "interval": [next(self._seq), window.to_dict(), in_flight, length]})
+
+    def close(self):
+        pass
+
+
+class _ControlHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            for line in self.rfile:
+                msg = json.loads(line)
+                if msg["cmd"] == "clock":
+                    self._send({"status": "ok", "time": time.time()})
+                elif msg["cmd"] == "prepare":
+                    self._send(self.server.agent.prepare(msg))
+                elif msg["cmd"] == "stage":
+                    self._send(self.server.agent.run_stage(msg, self._send))
+                else:
+                    self._send({"status": "error", "error": f"Unknown command {msg['cmd']!r}"})
+        except ConnectionError:
+            # Coordinator went away (interrupted run); wait for the next one
+            pass
+
+    def _send(self, msg):
+        self.wfile.write(json.dumps(msg).encode() + b"\n")
+        self.wfile.flush()
+
+
+class Agent:
+    """
+    Runs the stages a Coordinator hands it, one at a time, with `workers`
+    local processes per stage.
+    """
+
+    def __init__(self, port, host="127.0.0.1", workers=1):
+        self.host = host
+        self.port = port
+        self.workers = workers
+
+    def serve_forever(self):
+        socketserver.TCPServer.allow_reuse_address = True
+        with socketserver.TCPServer((self.host, self.port), _ControlHandler) as server:
+            server.agent = self
+            server.serve_forever()
+
+    def prepare(self, msg):
+        try:
+            AsyncLoadEngine(**msg["engine"]).prepare()
+            return {"status": "ok"}
+        except Exception:
+            return {"status": "error", "error": traceback.format_exc()}
+
+    def run_stage(self, msg, send):
+        try:
+            engine = AsyncLoadEngine(**msg["engine"], workers=self.workers)
+            if msg.get("interval"):
+                engine.timeseries = _IntervalForwarder(send, msg["interval"])
+            engine.watchdog = Watchdog(**msg["watchdog"]) if msg.get("watchdog") else None
+            engine.self_monitor = msg.get("self_monitor", True)
+            load, duration, phase = decode_load(msg["load"]), msg["duration"], msg["phase"]
+            print(f"  -> Agent stage: {load} for {duration}s")
+            if self.workers > 1:
+                from .workers import run_in_workers
+                stats = run_in_workers(engine, load, duration, self.workers, phase, msg["start_at"])
+            else:
+                time.sleep(max(0.0, msg["start_at"] - time.time()))
+                stats = asyncio.run(engine.collect_stage(load, duration, phase))
+            return {"status": "ok", "stats": stats.to_dict()}
+        except Exception:
+            return {"status": "error", "error": traceback.format_exc()}
+
+
+# --- Coordinator --------------------------------------------------------------
+
+
+class Coordinator:
+    """
+    Drop-in for AsyncLoadEngine.run_stage that drives remote agents.
+
+    Only named SCENARIOS and mix specs can run distributed: the scenario
+    travels to the agents by name. Each agent's own --workers decides its
+    process count. Every agent runs `watchdog` on its own share; the merged
+    stage reports the earliest abort. With `self_monitor` each agent judges its
+    own generator, and one client-bound agent invalidates the merged stage.
+    """
+
+    def __init__(self, agents, scenario="shorten_resolve", base_url=BASE_URL, timeout=5.0,
+                 significant_digits=SIGNIFICANT_DIGITS, pool="per_user", pool_size=None, keep_alive=True):
+        if not agents:
+            raise ValueError("Coordinator needs at least one agent")
+        self.agents = [parse_address(a) for a in agents]
+        self.engine_config = {
+            "scenario": scenario,
+            "base_url": base_url,
+            "timeout": timeout,
+            "significant_digits": significant_digits,
+            "pool": pool,
+            "pool_size": pool_size,
+            "keep_alive": keep_alive,
+        }
+        self.significant_digits = significant_digits
+        self.timeseries = None
+        self.watchdog = Watchdog()
+        self.self_monitor = True
+
+    def set_scenario(self, scenario):
+        """Run later stages with another named scenario or spec; agents build it from the name."""
+        self.engine_config["scenario"] = scenario
+
+    def prepare(self):
+        """Have every agent set up the scenario (e.g. seed a key corpus) before the first stage."""
+        asyncio.run(self._prepare_all())
+
+    async def _prepare_all(self):
+        async def prepare(addr):
+            reader, writer = await asyncio.open_connection(*addr, limit=LINE_LIMIT)
+            try:
+                await self._send(writer, {"cmd": "prepare", "engine": self.engine_config})
+                reply = json.loads(await reader.readline())
+            finally:
+                writer.close()
+            if reply["status"] != "ok":
+                raise RuntimeError(f"Load agent {addr[0]}:{addr[1]} failed to prepare:\n" + reply["error"])
+        await asyncio.gather(*(prepare(addr) for addr in self.agents))
+
+    def run_stage(self, load, duration):
+        if self.timeseries is not None:
+            self.timeseries.begin_stage(str(load))
+        return asyncio.run(self.collect_stage(load, duration)).metrics(duration)
+
+    async def collect_stage(self, load, duration):
+        shares = split_load(load, len(self.agents))
+        links = await asyncio.gather(*(self._connect(addr) for addr, _ in zip(self.agents, shares)))
+        merged = StageStats(self.significant_digits)
+        intervals = {}
+        try:
+            start_at = time.time() + START_LEAD
+            replies = await asyncio.gather(*(
+                asyncio.wait_for(self._run_share(link, share, phase, duration, start_at, intervals, len(shares)),
+                                 START_LEAD + duration + REPLY_GRACE)
+                for link, (share, phase) in zip(links, shares)
+            ))
+        finally:
+            for _, _, writer, _ in links:
+                writer.close()
+        if self.timeseries is not None:
+            flush_intervals(self, intervals)
+        for stats in replies:
+            merged.merge(StageStats.from_dict(stats))
+        if target_rps(load, duration) is not None:
+            merged.target_rps = target_rps(load, duration)
+        return merged
+
+    async def _connect(self, addr):
+        """(addr, reader, writer, clock offset) with the agent's clock offset from ours."""
+        try:
+            reader, writer = await asyncio.open_connection(*addr, limit=LINE_LIMIT)
+        except OSError as e:
+            raise RuntimeError(f"Load agent {addr[0]}:{addr[1]} unreachable: {e}") from e
+        t0 = time.time()
+        await self._send(writer, {"cmd": "clock"})
+        reply = json.loads(await reader.readline())
+        t1 = time.time()
+        # NTP-style: assume the reply was stamped halfway through the round trip
+        return addr, reader, writer, reply["time"] - (t0 + t1) / 2
+
+    async def _run_share(self, link, share, phase, duration, start_at, intervals, agents):
+        addr, reader, writer, offset = link
+        await self._send(writer, {
+            "cmd": "stage",
+            "engine": self.engine_config,
+            "load": encode_load(share),
+            "duration": duration,
+            "phase": phase,
+            "start_at": start_at + offset,
+            "interval": self.timeseries.interval if self.timeseries is not None else None,
+            "watchdog": self.watchdog.settings() if self.watchdog is not None else None,
+            "self_monitor": self.self_monitor,
+        })
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise RuntimeError(f"Load agent {addr[0]}:{addr[1]} closed the connection mid-stage")
+            msg = json.loads(line)
+            if msg["status"] == "interval":
+                merge_interval(self, intervals, msg["interval"], agents)
+            elif msg["status"] == "ok":
+                return msg["stats"]
+            else:
+                raise RuntimeError(f"Load agent {addr[0]}:{addr[1]} failed:\n" + msg["error"])
+
+    @staticmethod
+    async def _send(writer, msg):
+        writer.write(json.dumps(msg).encode() + b"\n")
+        await writer.drain()
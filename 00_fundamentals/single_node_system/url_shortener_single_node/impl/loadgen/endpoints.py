@@ -0,0 +1,187 @@
+"""
+Per-endpoint accounting with a phase breakdown of every request.
+
+A scenario's latency covers all of its requests: shorten_resolve times the
+/shorten write and the redirect together, so a slower insert and a slower
+lookup look the same. Every HTTP exchange is therefore also accounted under
+its endpoint, with its time split at the Timing stamps (see http.py) into
+
+    pool_wait  waiting for a pooled connection
+    connect    TCP connect (0 on a reused keep-alive socket)
+    send       writing the request
+    ttfb       request written -> response head read: RTT plus server processing
+    body       response head -> last body byte
+
+so a tail that grows in pool_wait/connect is the connection layer, one that
+grows in ttfb is the server.
+"""
+import json
+from collections import Counter
+
+from .histogram import SIGNIFICANT_DIGITS, LatencyHistogram
+from .http import PHASES
+
+PHASE_COLORS = {
+    "pool_wait": "#9e9e9e",
+    "connect": "#ff9800",
+    "send": "#ffcd56",
+    "ttfb": "#36a2eb",
+    "body": "#4caf50",
+}
+
+
+def endpoint_name(method, path):
+    """Route of a UrlController request, named like scenarios.OPERATIONS."""
+    if path == "/shorten":
+        return "shorten"
+    if path == "/health":
+        return "health"
+    if path.startswith("/stats/"):
+        return "stats"
+    if method == "GET":
+        return "resolve"
+    # Paths carry codes; keep the name set bounded
+    return f"{method} other"
+
+
+class EndpointStats:
+    """Requests to one endpoint: outcome counts, latency and one histogram per phase."""
+
+    def __init__(self, significant_digits=SIGNIFICANT_DIGITS):
+        self.latencies = LatencyHistogram(significant_digits=significant_digits)
+        self.phases = {name: LatencyHistogram(significant_digits=significant_digits) for name in PHASES}
+        self.success = 0
+        self.errors = 0
+        self.statuses = Counter()
+
+    def record(self, status, timing):
+        """`status` None for a request that raised; HTTP 4xx/5xx count as errors too."""
+        if status is None or status >= 400:
+            self.errors += 1
+            if status is not None:
+                self.statuses[status] += 1
+            return
+        self.success += 1
+        self.statuses[status] += 1
+        self.latencies.record((timing.done - timing.start) * 1_000_000)
+        for name, seconds in zip(PHASES, timing.phases()):
+            self.phases[name].record(seconds * 1_000_000)
+
+    def merge(self, other):
+        self.latencies.merge(other.latencies)
+        for name, hist in other.phases.items():
+            self.phases[name].merge(hist)
+        self.success += other.success
+        self.errors += other.errors
+        self.statuses.update(other.statuses)
+        return self
+
+    def to_dict(self):
+        return {
+            "latencies": self.latencies.to_dict(),
+            "phases": {name: hist.to_dict() for name, hist in self.phases.items()},
+            "success": self.success,
+            "errors": self.errors,
+            # JSON object keys are strings
+            "statuses": {str(status): n for status, n in self.statuses.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.latencies = LatencyHistogram.from_dict(data["latencies"])
+        stats.phases = {name: LatencyHistogram.from_dict(hist) for name, hist in data["phases"].items()}
+        stats.success = data["success"]
+        stats.errors = data["errors"]
+        stats.statuses = Counter({int(status): n for status, n in data["statuses"].items()})
+        return stats
+
+    def metrics(self, duration):
+        total = self.success + self.errors
+        metrics = {
+            "success_count": self.success,
+            "error_count": self.errors,
+            "rps": self.success / duration,
+            "error_rate": (self.errors / total) * 100 if total else 0,
+            "statuses": {str(status): n for status, n in sorted(self.statuses.items())},
+        }
+        metrics.update(self.latencies.summary_ms())
+        metrics["phases"] = {name: hist.summary_ms() for name, hist in self.phases.items()}
+        return metrics
+
+
+# --- Reporting ----------------------------------------------------------------
+
+
+def endpoint_summary(name, e):
+    """One console line: an endpoint's P99 and the P99 of the phases that usually explain it."""
+    phases = e["phases"]
+    return (f"{name:<10} P99: {e['p99']:.2f}ms | pool wait {phases['pool_wait']['p99']:.2f} | "
+            f"connect {phases['connect']['p99']:.2f} | ttfb {phases['ttfb']['p99']:.2f} | "
+            f"body {phases['body']['p99']:.2f} (phase P99s, ms)")
+
+
+def endpoint_table_md(metrics):
+    """Markdown table of a stage's endpoints, phase P99s alongside; [] without any."""
+    endpoints = metrics.get("endpoints")
+    if not endpoints:
+        return []
+    lines = [
+        "| Endpoint | RPS | Avg (ms) | P50 (ms) | P99 (ms) | Errors | " + " | ".join(f"{p} P99" for p in PHASES) + " |",
+        "|---" * (6 + len(PHASES)) + "|",
+    ]
+    for name, e in endpoints.items():
+        lines.append(
+            f"| {name} | {e['rps']:.2f} | {e['avg']:.2f} | {e['p50']:.2f} | {e['p99']:.2f} | {e['error_rate']:.2f}% | "
+            + " | ".join(f"{e['phases'][p]['p99']:.2f}" for p in PHASES) + " |"
+        )
+    return lines
+
+
+def render_endpoints_html(results, label=lambda r: str(r["users"])):
+    """
+    (card_html, chart_script): where each endpoint's time goes, per stage, as
+    stacked average phases, plus a P99 table (percentiles do not add up).
+    """
+    bars = [(f"{label(r)} · {name}", e) for r in results for name, e in r["metrics"].get("endpoints", {}).items()]
+    if not bars:
+        return "", ""
+    datasets = ",\n".join(
+        f"{{ label: '{phase}', data: {json.dumps([round(e['phases'][phase]['avg'], 3) for _, e in bars])}, "
+        f"backgroundColor: '{PHASE_COLORS[phase]}' }}"
+        for phase in PHASES
+    )
+    rows = "".join(
+        f"<tr><td>{name}</td><td>{e['p99']:.2f}</td>"
+        + "".join(f"<td>{e['phases'][p]['p99']:.2f}</td>" for p in PHASES) + "</tr>"
+        for name, e in bars
+    )
+    card = f"""
+                <div class="card">
+                    <div class="card-header">🔬 Request Phases per Endpoint</div>
+                    <div class="card-body">
+                        <canvas id="phaseChart"></canvas>
+                        <table class="table table-sm">
+                            <thead><tr><th>Stage · Endpoint</th><th>P99 (ms)</th>{"".join(f"<th>{p} P99</th>" for p in PHASES)}</tr></thead>
+                            <tbody>{rows}</tbody>
+                        </table>
+                    </div>
+                </div>
+    """
+    script = f"""
+                new Chart(document.getElementById('phaseChart'), {{
+                    type: 'bar',
+                    data: {{
+                        labels: {json.dumps([name for name, _ in bars])},
+                        datasets: [
+                            {datasets}
+                        ]
+                    }},
+                    options: {{
+                        indexAxis: 'y',
+                        plugins: {{ title: {{ display: true, text: 'Average time per phase (ms)' }} }},
+                        scales: {{ x: {{ stacked: true }}, y: {{ stacked: true }} }}
+                    }}
+                }});
+    """
+    return card, script
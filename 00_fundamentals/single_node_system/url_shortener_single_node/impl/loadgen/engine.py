@@ -0,0 +1,619 @@
+"""
+asyncio load engine.
+
+Replaces `ThreadPoolExecutor(max_workers=users)` + blocking `requests` with one
+event loop. A stage's load is either:
+    int   -> closed model: that many virtual users, each looping over its
+             scenario on its own keep-alive connection until the deadline
+    Rate  -> open model: requests issued on an arrival clock (see scheduler.py)
+             no matter how many are still in flight
+    Profile -> either, with the user count or arrival rate following a shape
+             over time within the one stage (see profiles.py)
+    Replay  -> open model: the requests of a recorded trace, each at its own
+             offset (see trace.py)
+"""
+import asyncio
+import resource
+import time
+from collections import Counter
+
+from .endpoints import EndpointStats, endpoint_name
+from .errors import ErrorSamples, classify, status_category
+from .histogram import SIGNIFICANT_DIGITS, LatencyHistogram
+from .http import ConnectionPool, HttpClient
+from .profiles import CONTROL_INTERVAL, Profile, target_rps
+from .scenarios import get_scenario
+from .scheduler import Rate, arrival_offsets
+from .selfmon import GeneratorMonitor, merge_summaries
+from .timeseries import INTERVAL
+from .trace import Replay
+from .watchdog import Watchdog
+
+BASE_URL = "http://localhost:8080"
+# Open stages stop issuing (and count the request as dropped) beyond this many
+# outstanding requests, so a dead server cannot exhaust client sockets.
+MAX_IN_FLIGHT = 50000
+# "per_user": every virtual user has its own pool (default: one keep-alive socket)
+# "shared":   all users of a stage borrow from one pool (default: one per user)
+POOL_STRATEGIES = ("per_user", "shared")
+
+
+def raise_fd_limit():
+    # Every virtual user holds a socket; the default soft limit (often 1024)
+    # would turn a 20k-user stage into a wall of EMFILE errors.
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+class StageStats:
+    """
+    Per-stage counters and latency histograms. Errors are counted in
+    `error_log` by category (see errors.py), with `error_samples` exemplars.
+
+    `latencies` are measured from when the request was actually sent.
+    `corrected` are measured from when the schedule intended it to be sent;
+    only open stages have a schedule, closed ones are corrected in `metrics`.
+    Stats from several worker processes `merge` into one.
+
+    Scenarios that name their operations (see scenarios.Mix) are also
+    accounted per operation, in a nested StageStats each. Independently of
+    the scenario, every HTTP request is accounted per endpoint with its phase
+    timings (see endpoints.py).
+    """
+
+    def __init__(self, significant_digits=SIGNIFICANT_DIGITS, target_rps=None):
+        self.latencies = LatencyHistogram(significant_digits=significant_digits)
+        self.corrected = LatencyHistogram(significant_digits=significant_digits)
+        self.success = 0
+        self.errors = 0
+        self.error_ms = 0.0   # summed latency of failed requests, which the histograms leave out
+        self.issued = 0
+        self.dropped = 0
+        self.connections_opened = 0
+        self.target_rps = target_rps
+        self.error_log = Counter()
+        self.error_samples = ErrorSamples()
+        self.operations = {}
+        self.endpoints = {}
+        self.abort = None   # {"reason", "at_s"} when a watchdog cut the stage short
+        self.finished_at = None   # seconds into the stage a finite load (a Replay) ran out
+        self.generator = None   # GeneratorMonitor.summary(): was the client the bottleneck?
+
+    def operation(self, name):
+        op = self.operations.get(name)
+        if op is None:
+            op = self.operations[name] = StageStats(self.latencies.significant_digits)
+        return op
+
+    def endpoint(self, name):
+        endpoint = self.endpoints.get(name)
+        if endpoint is None:
+            endpoint = self.endpoints[name] = EndpointStats(self.latencies.significant_digits)
+        return endpoint
+
+    def record(self, ok, latency_ms, corrected_ms=None):
+        if ok:
+            self.latencies.record_ms(latency_ms)
+            if corrected_ms is not None:
+                self.corrected.record_ms(corrected_ms)
+            self.success += 1
+        else:
+            self.errors += 1
+            self.error_ms += latency_ms
+
+    def merge(self, other):
+        self.latencies.merge(other.latencies)
+        self.corrected.merge(other.corrected)
+        self.success += other.success
+        self.errors += other.errors
+        self.error_ms += other.error_ms
+        self.issued += other.issued
+        self.dropped += other.dropped
+        self.connections_opened += other.connections_opened
+        if other.target_rps is not None:
+            self.target_rps = (self.target_rps or 0) + other.target_rps
+        self.error_log.update(other.error_log)
+        self.error_samples.merge(other.error_samples)
+        for name, op in other.operations.items():
+            self.operation(name).merge(op)
+        for name, endpoint in other.endpoints.items():
+            self.endpoint(name).merge(endpoint)
+        if other.abort is not None and (self.abort is None or other.abort["at_s"] < self.abort["at_s"]):
+            self.abort = other.abort
+        if other.finished_at is not None:
+            self.finished_at = max(self.finished_at or 0.0, other.finished_at)
+        self.generator = merge_summaries(self.generator, other.generator)
+        return self
+
+    def to_dict(self):
+        return {
+            "latencies": self.latencies.to_dict(),
+            "corrected": self.corrected.to_dict(),
+            "success": self.success,
+            "errors": self.errors,
+            "error_ms": self.error_ms,
+            "issued": self.issued,
+            "dropped": self.dropped,
+            "connections_opened": self.connections_opened,
+            "target_rps": self.target_rps,
+            "error_log": dict(self.error_log),
+            "error_samples": self.error_samples.to_dict(),
+            "operations": {name: op.to_dict() for name, op in self.operations.items()},
+            "endpoints": {name: e.to_dict() for name, e in self.endpoints.items()},
+            "abort": self.abort,
+            "finished_at": self.finished_at,
+            "generator": self.generator,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(target_rps=data["target_rps"])
+        stats.latencies = LatencyHistogram.from_dict(data["latencies"])
+        stats.corrected = LatencyHistogram.from_dict(data["corrected"])
+        stats.success = data["success"]
+        stats.errors = data["errors"]
+        stats.error_ms = data.get("error_ms", 0.0)
+        stats.issued = data["issued"]
+        stats.dropped = data["dropped"]
+        stats.connections_opened = data["connections_opened"]
+        stats.error_log = Counter(data["error_log"])
+        if "error_samples" in data:
+            stats.error_samples = ErrorSamples.from_dict(data["error_samples"])
+        stats.operations = {name: cls.from_dict(op) for name, op in data.get("operations", {}).items()}
+        stats.endpoints = {name: EndpointStats.from_dict(e) for name, e in data.get("endpoints", {}).items()}
+        stats.abort = data.get("abort")
+        stats.finished_at = data.get("finished_at")
+        stats.generator = data.get("generator")
+        return stats
+
+    def metrics(self, duration):
+        """Same shape `LoadTestReporter.add_stage_result` takes."""
+        if self.finished_at is not None:
+            # A replay lasts as long as its trace, whatever duration it was given
+            duration = max(self.finished_at, 1e-3)
+        if self.abort is not None:
+            # Rates are over the time the stage actually ran
+            duration = max(min(duration, self.abort["at_s"]), 1e-3)
+        latencies = self.latencies
+        metrics = {
+            "success_count": self.success,
+            "error_count": self.errors,
+            "total": self.success + self.errors,
+            "rps": 0,
+            "error_rate": 0
+        }
+
+        if latencies.total:
+            metrics["rps"] = self.success / duration
+        metrics.update(latencies.summary_ms())
+
+        # Coordinated omission: report what a user arriving on schedule saw
+        if self.corrected.total:
+            metrics["co_correction"] = "intended_send_time"
+            corrected = self.corrected
+        else:
+            # A closed-loop user's expected interval is the typical response time
+            metrics["co_correction"] = "expected_interval"
+            metrics["expected_interval_ms"] = metrics["p50"]
+            corrected = latencies.corrected_for_omission(latencies.value_at_percentile(50))
+        for key, value in corrected.summary_ms().items():
+            metrics[f"{key}_corrected"] = value
+
+        if metrics["total"] > 0:
+            metrics["error_rate"] = (self.errors / metrics["total"]) * 100
+            # Every completed request, failed ones included: what occupied the in-flight slots
+            metrics["completed_rps"] = metrics["total"] / duration
+            metrics["avg_all"] = (latencies.sum_us / 1000 + self.error_ms) / metrics["total"]
+        metrics["error_log"] = dict(self.error_log.most_common())
+        if self.error_samples.samples:
+            metrics["error_samples"] = self.error_samples.samples
+        metrics["connections_opened"] = self.connections_opened
+
+        if self.target_rps is not None:
+            metrics["target_rps"] = self.target_rps
+            metrics["offered_rps"] = self.issued / duration
+            metrics["dropped_count"] = self.dropped
+        if self.finished_at is not None:
+            metrics["finished_at"] = round(self.finished_at, 3)
+        if self.abort is not None:
+            metrics["aborted"] = dict(self.abort)
+        if self.generator is not None:
+            metrics["generator"] = self.generator
+            metrics["valid"] = self.generator["valid"]
+        if self.operations:
+            metrics["operations"] = {
+                name: op.operation_metrics(duration, metrics["total"]) for name, op in sorted(self.operations.items())
+            }
+        if self.endpoints:
+            metrics["endpoints"] = {name: e.metrics(duration) for name, e in sorted(self.endpoints.items())}
+
+        # Full distributions, so any percentile can be recomputed from the result file
+        metrics["histogram"] = latencies.to_dict()
+        metrics["histogram_corrected"] = corrected.to_dict()
+        return metrics
+
+    def operation_metrics(self, duration, stage_total):
+        """Throughput, latency and share of the stage's requests for one operation of a mix."""
+        total = self.success + self.errors
+        metrics = {
+            "success_count": self.success,
+            "error_count": self.errors,
+            "rps": self.success / duration,
+            "share": (total / stage_total) * 100 if stage_total else 0,
+            "error_rate": (self.errors / total) * 100 if total else 0,
+        }
+        metrics.update(self.latencies.summary_ms())
+        metrics["error_log"] = dict(self.error_log.most_common())
+        return metrics
+
+
+class AsyncLoadEngine:
+    """
+    Runs stages of one scenario against `base_url`.
+
+    With `workers > 1` each stage is split across that many forked processes
+    (users divided, or the arrival rate divided with staggered phases) and
+    their StageStats merged, so the metrics look like a single-process run.
+    Side effects a scenario has on its own objects (e.g. a script's reporter)
+    stay in the worker process; only what StageStats records is merged.
+
+    Connections come from ConnectionPools laid out by `pool` (see
+    POOL_STRATEGIES) with `pool_size` sockets each; open stages always share one
+    pool. keep_alive=False forces a new TCP connection for every request.
+
+    Set `timeseries` to a TimeSeriesWriter to stream per-interval snapshots
+    while stages run. `watchdog` (see watchdog.py; None to disable) checks
+    every interval and aborts a stage whose target is clearly broken: pending
+    requests are cancelled and the stage's metrics carry the abort.
+
+    With `self_monitor` (on by default) every stage also samples the
+    generator's own CPU, loop lag, backlog and send skew (see selfmon.py) and
+    is marked invalid when the client rather than the server was the limit.
+
+    Set `trace` to a TraceWriter (see trace.py) to record every request sent.
+    """
+
+    def __init__(self, scenario="shorten_resolve", base_url=BASE_URL, timeout=5.0,
+                 max_in_flight=MAX_IN_FLIGHT, significant_digits=SIGNIFICANT_DIGITS, workers=1,
+                 pool="per_user", pool_size=None, keep_alive=True):
+        if pool not in POOL_STRATEGIES:
+            raise ValueError(f"Unknown pool strategy {pool!r}, expected one of {POOL_STRATEGIES}")
+        self.scenario = get_scenario(scenario) if isinstance(scenario, str) else scenario
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.significant_digits = significant_digits
+        self.workers = workers
+        self.pool = pool
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.timeseries = None
+        self.trace = None
+        self.watchdog = Watchdog()
+        self.self_monitor = True
+        # Where closed intervals go; workers replace it to ship them to the parent
+        self.interval_sink = None
+        self._window = None
+        self._window_start = 0.0
+        self._in_flight = 0
+        self._stage_start = 0.0
+        self._stage_tasks = set()
+        self._abort = None
+        self._monitor = None
+        self._target_users = 0
+        raise_fd_limit()
+
+    def _new_pool(self, default_size):
+        return ConnectionPool(self.base_url, self.pool_size or default_size, self.timeout, self.keep_alive)
+
+    def set_scenario(self, scenario):
+        """Run later stages with another scenario (a name, spec or coroutine function)."""
+        self.scenario = get_scenario(scenario) if isinstance(scenario, str) else scenario
+
+    def prepare(self):
+        """Run the scenario's one-off setup (e.g. seeding a key corpus) outside any stage."""
+        prepare = getattr(self.scenario, "prepare", None)
+        if prepare is not None:
+            asyncio.run(prepare(self.base_url, self.timeout))
+
+    def run_stage(self, load, duration):
+        if self.timeseries is not None:
+            self.timeseries.begin_stage(str(load))
+        if self.workers > 1:
+            from .workers import run_in_workers
+            stats = run_in_workers(self, load, duration, self.workers)
+        else:
+            stats = asyncio.run(self.collect_stage(load, duration))
+        return stats.metrics(duration)
+
+    async def run_stage_async(self, load, duration):
+        return (await self.collect_stage(load, duration)).metrics(duration)
+
+    async def collect_stage(self, load, duration, phase=0.0):
+        """Run one stage in this process and return its raw StageStats."""
+        sink = self.interval_sink or (self.timeseries.write if self.timeseries is not None else None)
+        loop = asyncio.get_running_loop()
+        self._in_flight = 0
+        self._stage_start = loop.time()
+        self._stage_tasks = set()
+        self._abort = None
+        ticker = None
+        if sink is not None or self.watchdog is not None:
+            if self.watchdog is not None:
+                self.watchdog.reset()
+            self._window = self._new_window(load)
+            length = load.duration if isinstance(load, Replay) else duration
+            end = None if length is None else self._stage_start + min(length, duration)
+            ticker = loop.create_task(self._tick(sink, load, end))
+        self._monitor = GeneratorMonitor(lambda: self._in_flight) if self.self_monitor else None
+        if self._monitor is not None:
+            self._monitor.start()
+        try:
+            if isinstance(load, (Rate, Replay)) or (isinstance(load, Profile) and load.kind == "rps"):
+                stats = await self._run_open(load, duration, phase)
+            elif isinstance(load, Profile):
+                stats = await self._run_closed_profile(load, duration)
+            else:
+                stats = await self._run_closed(load, duration)
+            stats.abort = self._abort
+            if isinstance(load, Replay):
+                stats.finished_at = loop.time() - self._stage_start
+            if self._monitor is not None:
+                self._monitor.stop()
+                stats.generator = self._monitor.summary(stats.dropped)
+            return stats
+        finally:
+            if self.trace is not None:
+                self.trace.flush()
+            if self._monitor is not None:
+                self._monitor.stop()
+                self._monitor = None
+            if ticker is not None:
+                ticker.cancel()
+                if sink is not None:
+                    # The last, usually partial, interval
+                    sink(self._window, self._in_flight, loop.time() - self._window_start)
+            self._window = None
+
+    def _new_window(self, load):
+        self._window_start = now = asyncio.get_running_loop().time()
+        if isinstance(load, Profile):
+            # The rate the profile asks for as this window opens
+            rps = load.level(now - self._stage_start) if load.kind == "rps" else None
+        else:
+            rps = load.rps if isinstance(load, (Rate, Replay)) else None
+        return StageStats(self.significant_digits, target_rps=rps)
+
+    async def _tick(self, sink, load, end=None):
+        """Close a window every interval of a stage scheduled to end (loop time) at `end`."""
+        interval = self.timeseries.interval if self.timeseries is not None else INTERVAL
+        loop = asyncio.get_running_loop()
+        while True:
+            close_at = self._window_start + interval
+            if end is not None and self._window_start < end < close_at + interval / 2:
+                # The stage ends in this window or just after it: stretch the window over the
+                # rest of the stage and its drain, which collect_stage closes. Closed on time,
+                # the drain would be a sliver of a window with a rate spike.
+                close_at += interval
+            await asyncio.sleep(max(0.0, close_at - loop.time()))
+            window, length = self._window, loop.time() - self._window_start
+            self._window = self._new_window(load)
+            if sink is not None:
+                sink(window, self._in_flight, length)
+            if self.watchdog is not None and self._abort is None:
+                reason = self.watchdog.check(window, self._in_flight)
+                if reason is not None:
+                    self._abort_stage(reason)
+
+    def _abort_stage(self, reason):
+        """Stop issuing and shed everything still pending."""
+        self._abort = {"reason": reason, "at_s": round(asyncio.get_running_loop().time() - self._stage_start, 3)}
+        for task in list(self._stage_tasks):
+            task.cancel()
+
+    async def _run_closed(self, users, duration):
+        loop = asyncio.get_running_loop()
+        stats = StageStats(self.significant_digits)
+        deadline = loop.time() + duration
+        on_timing = self._timing_recorder(stats)
+        if self.pool == "shared":
+            pools = [self._new_pool(users)]
+            clients = [HttpClient(pool=pools[0], on_timing=on_timing) for _ in range(users)]
+        else:
+            pools = [self._new_pool(1) for _ in range(users)]
+            clients = [HttpClient(pool=p, on_timing=on_timing) for p in pools]
+        self._stage_tasks = {loop.create_task(self._virtual_user(c, deadline, stats)) for c in clients}
+        try:
+            await asyncio.wait(self._stage_tasks)
+            for task in self._stage_tasks:
+                if not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for p in pools:
+                p.close()
+            stats.connections_opened = sum(p.connects for p in pools)
+        return stats
+
+    async def _run_closed_profile(self, profile, duration):
+        """Closed model whose user count follows `profile`: users are added, or retire after their current request."""
+        loop = asyncio.get_running_loop()
+        stats = StageStats(self.significant_digits)
+        start = loop.time()
+        deadline = start + duration
+        on_timing = self._timing_recorder(stats)
+        shared = self._new_pool(max(profile.peak, 1)) if self.pool == "shared" else None
+        users = {}   # index -> (task, pool)
+        self._target_users = 0
+
+        def reap(index):
+            task, pool = users.pop(index)
+            if pool is not shared:
+                pool.close()
+                stats.connections_opened += pool.connects
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+
+        try:
+            while self._abort is None and loop.time() < deadline:
+                self._target_users = target = profile.level(loop.time() - start)
+                for index in [i for i, (task, _) in users.items() if task.done()]:
+                    reap(index)
+                for index in range(target):
+                    if index not in users:
+                        pool = shared or self._new_pool(1)
+                        client = HttpClient(pool=pool, on_timing=on_timing)
+                        task = loop.create_task(self._profile_user(index, client, deadline, stats))
+                        users[index] = (task, pool)
+                        self._stage_tasks.add(task)
+                        task.add_done_callback(self._stage_tasks.discard)
+                await asyncio.sleep(min(CONTROL_INTERVAL, max(0.0, deadline - loop.time())))
+            if users:
+                await asyncio.wait([task for task, _ in users.values()])
+            for index in list(users):
+                reap(index)
+        finally:
+            for task, pool in users.values():
+                task.cancel()
+                pool.close()
+            if shared is not None:
+                shared.close()
+                stats.connections_opened += shared.connects
+        return stats
+
+    async def _profile_user(self, index, client, deadline, stats):
+        loop = asyncio.get_running_loop()
+        while loop.time() < deadline and index < self._target_users:
+            await self._execute(client, stats)
+
+    async def _run_open(self, load, duration, phase=0.0):
+        loop = asyncio.get_running_loop()
+        stats = StageStats(self.significant_digits, target_rps=target_rps(load, duration))
+        # Every arrival is a new "user"; they all borrow from one pool
+        pool = self._new_pool(self.max_in_flight)
+        on_timing = self._timing_recorder(stats)
+        in_flight = self._stage_tasks
+        start = loop.time()
+        if isinstance(load, Replay):
+            # Each arrival brings its own request
+            arrivals = load.arrivals(duration)
+        else:
+            offsets = load.arrival_offsets(duration, phase) if isinstance(load, Profile) else \
+                arrival_offsets(load, duration, phase)
+            arrivals = ((offset, None) for offset in offsets)
+        for offset, scenario in arrivals:
+            if self._abort is not None:
+                break
+            if offset is None:
+                # No schedule (a replay at speed 0): send as soon as there is room
+                intended = None
+                while len(in_flight) >= self.max_in_flight and self._abort is None:
+                    await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            else:
+                intended = start + offset
+                delay = intended - loop.time()
+                if delay > 0.0005:
+                    await asyncio.sleep(delay)
+                elif stats.issued % 64 == 0:
+                    # Behind schedule: catch up in a burst, but let responses land
+                    await asyncio.sleep(0)
+            if self._abort is not None:
+                break
+            if len(in_flight) >= self.max_in_flight:
+                stats.dropped += 1
+                if self._window is not None:
+                    self._window.dropped += 1
+                continue
+            # A client per arrival, so its last_response is this request's own
+            client = HttpClient(pool=pool, on_timing=on_timing)
+            task = loop.create_task(self._execute(client, stats, intended, scenario))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+            stats.issued += 1
+            if self._window is not None:
+                self._window.issued += 1
+
+        if in_flight:
+            await asyncio.wait(in_flight)
+        pool.close()
+        stats.connections_opened = pool.connects
+        return stats
+
+    def _timing_recorder(self, stats):
+        trace = self.trace
+
+        def record(method, path, body, status, timing):
+            name = endpoint_name(method, path)
+            stats.endpoint(name).record(status, timing)
+            # The current interval too, so time series and the exporter see endpoints
+            window = self._window
+            if window is not None:
+                window.endpoint(name).record(status, timing)
+            if trace is not None:
+                trace.record(method, path, body, status, timing)
+        return record
+
+    async def _virtual_user(self, client, deadline, stats):
+        loop = asyncio.get_running_loop()
+        while loop.time() < deadline:
+            await self._execute(client, stats)
+
+    async def _execute(self, client, stats, intended=None, scenario=None):
+        loop = asyncio.get_running_loop()
+        self._in_flight += 1
+        t0 = loop.time()
+        if intended is not None and self._monitor is not None:
+            self._monitor.record_skew(t0 - intended)
+        error = op = None
+        client.last_response = None
+        client.intended = intended
+        try:
+            ok = await (scenario or self.scenario)(client)
+            if type(ok) is tuple:
+                op, ok = ok
+            if ok is False:
+                # Blame the response the scenario rejected
+                source = client.last_response
+                error = status_category(source.status if source is not None else None)
+        except Exception as e:
+            source = e
+            error = classify(e)
+            op = getattr(e, "operation", None)
+            ok = False
+        except asyncio.CancelledError:
+            # Shed by a watchdog abort: not a result
+            self._in_flight -= 1
+            raise
+        t1 = loop.time()
+        self._in_flight -= 1
+        latency = (t1 - t0) * 1000
+        corrected = None if intended is None else (t1 - intended) * 1000
+        # Read once: the ticker may have swapped the window while the scenario awaited
+        window = self._window
+        if error is not None:
+            stats.error_samples.offer(error, source)
+        for target in (stats, window) if window is not None else (stats,):
+            for t in (target, target.operation(op)) if op is not None else (target,):
+                if error is not None:
+                    t.error_log[error] += 1
+                if ok is not None:
+                    t.record(ok, latency, corrected)
+
+
+def check_health(base_url=BASE_URL, timeout=2.0):
+    """(healthy, latency_ms) of one GET /health on a fresh connection."""
+    async def probe():
+        client = HttpClient(base_url, timeout)
+        t0 = time.perf_counter()
+        try:
+            resp = await client.get("/health")
+            return resp.status == 200, (time.perf_counter() - t0) * 1000
+        except Exception:
+            return False, 0
+        finally:
+            client.close()
+    return asyncio.run(probe())
@@ -0,0 +1,124 @@
+"""
+Bounded error taxonomy.
+
+Keying error counts by `str(exc)` makes one key per port and address under a
+connection storm; keying by exception type cannot tell a refused connect from
+a reset or a read timeout. Every failed request is instead counted under one
+of a fixed set of categories:
+
+    connect_refused   nothing listening (ECONNREFUSED)
+    connect_timeout   timed out before the TCP connection was up
+    connect_error     any other failure to connect (EMFILE, EADDRNOTAVAIL, ...)
+    read_timeout      connected, timed out waiting for the response
+    reset             the server reset or closed the connection mid-exchange
+    protocol          the response was not valid HTTP/1.1
+    bad_body          a 2xx/3xx whose body the scenario could not use (bad JSON, missing field)
+    http_<code>       the response status failed the scenario's check, e.g. http_503
+    dedup_mismatch    /shorten broke deduplication: a repeated URL got a new code (see dedup.py)
+    other             anything else
+
+Counting stays on StageStats.error_log (a Counter on the event loop: no
+locks), merged across workers and agents like every other counter. A few raw
+messages per category are kept as exemplars, reservoir-sampled so formatting
+`str(exc)` is paid for only by the samples actually kept.
+"""
+import asyncio
+import random
+
+from .http import HttpProtocolError, Response
+
+EXEMPLARS_PER_CATEGORY = 5
+EXEMPLAR_LENGTH = 200
+TIMEOUT_CATEGORIES = ("connect_timeout", "read_timeout")
+
+
+class DedupMismatch(Exception):
+    """A 200 from /shorten whose code contradicts one returned earlier."""
+
+
+def classify(exc):
+    """Category of an exception a scenario raised; see the module docstring."""
+    if isinstance(exc, DedupMismatch):
+        return "dedup_mismatch"
+    connecting = getattr(exc, "phase", None) == "connect"
+    if isinstance(exc, asyncio.TimeoutError):
+        return "connect_timeout" if connecting else "read_timeout"
+    if isinstance(exc, ConnectionRefusedError):
+        return "connect_refused"
+    if isinstance(exc, (HttpProtocolError, asyncio.LimitOverrunError)):
+        return "protocol"
+    if isinstance(exc, OSError):
+        if connecting:
+            return "connect_error"
+        if isinstance(exc, ConnectionError):
+            return "reset"
+        return "other"
+    if isinstance(exc, asyncio.IncompleteReadError):
+        return "reset"
+    if isinstance(exc, (ValueError, KeyError, IndexError)):
+        # JSONDecodeError and UnicodeDecodeError are ValueErrors
+        return "bad_body"
+    return "other"
+
+
+def status_category(status):
+    return f"http_{status}" if status is not None else "other"
+
+
+def describe(source):
+    """Exemplar text of an exception or a rejected Response, truncated."""
+    if source is None:
+        return "scenario reported failure before any response"
+    if isinstance(source, Response):
+        text = f"HTTP {source.status}: {source.body[:EXEMPLAR_LENGTH]!r}"
+    else:
+        # asyncio timeouts carry no message
+        text = f"{type(source).__name__}: {source}" if str(source) else type(source).__name__
+    return text[:EXEMPLAR_LENGTH]
+
+
+class ErrorSamples:
+    """Up to EXEMPLARS_PER_CATEGORY raw messages per category, each a uniform sample of its errors."""
+
+    def __init__(self, size=EXEMPLARS_PER_CATEGORY):
+        self.size = size
+        self.samples = {}
+        self.seen = {}
+
+    def offer(self, category, source):
+        """Count one error of `category`; keep `describe(source)` if it is sampled."""
+        seen = self.seen.get(category, 0) + 1
+        self.seen[category] = seen
+        kept = self.samples.setdefault(category, [])
+        if len(kept) < self.size:
+            kept.append(describe(source))
+        else:
+            slot = random.randrange(seen)
+            if slot < self.size:
+                kept[slot] = describe(source)
+
+    def merge(self, other):
+        for category, theirs in other.samples.items():
+            mine = self.samples.get(category, [])
+            n_mine, n_theirs = self.seen.get(category, 0), other.seen[category]
+            pool = mine + theirs
+            if len(pool) > self.size:
+                # Weight each side by how many errors its samples stand for
+                weights = [n_mine / len(mine)] * len(mine) + [n_theirs / len(theirs)] * len(theirs)
+                picked = set()
+                while len(picked) < self.size:
+                    picked.add(random.choices(range(len(pool)), weights)[0])
+                pool = [pool[i] for i in sorted(picked)]
+            self.samples[category] = pool
+            self.seen[category] = n_mine + n_theirs
+        return self
+
+    def to_dict(self):
+        return {"samples": self.samples, "seen": self.seen}
+
+    @classmethod
+    def from_dict(cls, data):
+        samples = cls()
+        samples.samples = {k: list(v) for k, v in data["samples"].items()}
+        samples.seen = dict(data["seen"])
+        return samples
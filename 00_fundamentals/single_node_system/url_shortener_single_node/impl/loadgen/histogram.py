@@ -0,0 +1,254 @@
+"""
+HdrHistogram-style latency histogram.
+
+Keeping every latency in a list and calling `statistics.quantiles` costs one
+float per request and a full sort per stage. This histogram uses the HdrHistogram
+bucket layout instead: values are integer microseconds, bucketed on a log2 scale
+with linear sub-buckets sized so every value is kept to `significant_digits`
+decimal digits of precision. Memory is fixed by the configured range
+(~17k counters for 1us..60s at 3 digits), `record` is O(1), and two histograms
+with the same configuration merge by adding counts.
+"""
+import base64
+import math
+import zlib
+
+LOWEST_US = 1
+HIGHEST_US = 60_000_000     # 60s
+SIGNIFICANT_DIGITS = 3
+
+# Percentiles every stage reports; the serialized counts can produce any other.
+REPORTED_PERCENTILES = (50, 90, 95, 99, 99.9, 99.99)
+
+
+def percentile_key(p):
+    """50 -> 'p50', 99.9 -> 'p999', 99.99 -> 'p9999' (metric dict keys)."""
+    return "p" + f"{p:g}".replace(".", "")
+
+
+class LatencyHistogram:
+    def __init__(self, lowest=LOWEST_US, highest=HIGHEST_US, significant_digits=SIGNIFICANT_DIGITS):
+        if not 1 <= significant_digits <= 5:
+            raise ValueError("significant_digits must be between 1 and 5")
+        if lowest < 1 or highest < 2 * lowest:
+            raise ValueError("need 1 <= lowest and highest >= 2 * lowest")
+        self.lowest = lowest
+        self.highest = highest
+        self.significant_digits = significant_digits
+
+        largest_single_unit = 2 * 10 ** significant_digits
+        self._unit_magnitude = int(math.floor(math.log2(lowest)))
+        sub_bucket_count_magnitude = int(math.ceil(math.log2(largest_single_unit)))
+        self._sub_half_magnitude = max(sub_bucket_count_magnitude, 1) - 1
+        self._sub_count = 1 << (self._sub_half_magnitude + 1)
+        self._sub_half = self._sub_count >> 1
+        self._sub_mask = (self._sub_count - 1) << self._unit_magnitude
+
+        smallest_untrackable = self._sub_count << self._unit_magnitude
+        bucket_count = 1
+        while smallest_untrackable <= highest:
+            smallest_untrackable <<= 1
+            bucket_count += 1
+        self.counts = [0] * ((bucket_count + 1) * self._sub_half)
+
+        self.total = 0
+        self.sum_us = 0
+        self.min_us = None
+        self.max_us = 0
+
+    # --- Layout -------------------------------------------------------------
+
+    def _index(self, value):
+        bucket = (value | self._sub_mask).bit_length() - self._unit_magnitude - (self._sub_half_magnitude + 1)
+        sub_bucket = value >> (bucket + self._unit_magnitude)
+        return ((bucket + 1) << self._sub_half_magnitude) + sub_bucket - self._sub_half
+
+    def _value_at(self, index):
+        bucket = (index >> self._sub_half_magnitude) - 1
+        sub_bucket = (index & (self._sub_half - 1)) + self._sub_half
+        if bucket < 0:
+            sub_bucket -= self._sub_half
+            bucket = 0
+        return sub_bucket << (bucket + self._unit_magnitude)
+
+    def _highest_equivalent(self, index):
+        """Largest value that lands in the same counter as index."""
+        bucket = max((index >> self._sub_half_magnitude) - 1, 0)
+        return self._value_at(index) + (1 << (bucket + self._unit_magnitude)) - 1
+
+    def _compatible(self, other):
+        return (self.lowest, self.highest, self.significant_digits) == (
+            other.lowest, other.highest, other.significant_digits)
+
+    # --- Recording ----------------------------------------------------------
+
+    def record(self, value_us, count=1):
+        value_us = min(max(int(value_us), self.lowest), self.highest)
+        self.counts[self._index(value_us)] += count
+        self.total += count
+        self.sum_us += value_us * count
+        if self.min_us is None or value_us < self.min_us:
+            self.min_us = value_us
+        if value_us > self.max_us:
+            self.max_us = value_us
+
+    def record_ms(self, latency_ms):
+        self.record(latency_ms * 1000)
+
+    def merge(self, other):
+        if not self._compatible(other):
+            raise ValueError("Cannot merge histograms with different ranges or precision")
+        counts = self.counts
+        for i, c in enumerate(other.counts):
+            if c:
+                counts[i] += c
+        self.total += other.total
+        self.sum_us += other.sum_us
+        if other.min_us is not None and (self.min_us is None or other.min_us < self.min_us):
+            self.min_us = other.min_us
+        self.max_us = max(self.max_us, other.max_us)
+        return self
+
+    def corrected_for_omission(self, expected_interval_us):
+        """
+        HdrHistogram's copyCorrectedForCoordinatedOmission.
+
+        A closed-loop user stuck on one slow response did not send the requests
+        it would otherwise have sent every `expected_interval_us` meanwhile;
+        back-fill them with the latency each would have seen.
+        """
+        corrected = LatencyHistogram(self.lowest, self.highest, self.significant_digits)
+        for i, c in enumerate(self.counts):
+            if not c:
+                continue
+            value = self._value_at(i)
+            corrected.record(value, c)
+            if expected_interval_us <= 0:
+                continue
+            missing = value - expected_interval_us
+            while missing >= expected_interval_us:
+                corrected.record(missing, c)
+                missing -= expected_interval_us
+        return corrected
+
+    # --- Queries ------------------------------------------------------------
+
+    def value_at_percentile(self, percentile):
+        """Latency in microseconds at `percentile` (0-100)."""
+        if not self.total:
+            return 0
+        target = max(1, math.ceil(percentile / 100 * self.total))
+        running = 0
+        for i, c in enumerate(self.counts):
+            running += c
+            if running >= target:
+                return min(self._highest_equivalent(i), self.max_us)
+        return self.max_us
+
+    def counts_at_or_below(self, bounds_us):
+        """Cumulative count of values <= each of the ascending `bounds_us` (Prometheus-style buckets)."""
+        out = [0] * len(bounds_us)
+        b = running = 0
+        for i, c in enumerate(self.counts):
+            if not c:
+                continue
+            value = self._highest_equivalent(i)
+            while b < len(bounds_us) and value > bounds_us[b]:
+                out[b] = running
+                b += 1
+            if b == len(bounds_us):
+                break
+            running += c
+        for i in range(b, len(bounds_us)):
+            out[i] = running
+        return out
+
+    def mean_us(self):
+        return self.sum_us / self.total if self.total else 0
+
+    def summary_ms(self):
+        """avg plus REPORTED_PERCENTILES in ms, keyed like the metrics dict."""
+        out = {"avg": self.mean_us() / 1000}
+        if not self.total:
+            out.update({percentile_key(p): 0 for p in REPORTED_PERCENTILES})
+            return out
+        # One pass over the counters for all percentiles
+        targets = sorted((max(1, math.ceil(p / 100 * self.total)), p) for p in REPORTED_PERCENTILES)
+        running, t = 0, 0
+        for i, c in enumerate(self.counts):
+            if not c:
+                continue
+            running += c
+            while t < len(targets) and running >= targets[t][0]:
+                out[percentile_key(targets[t][1])] = min(self._highest_equivalent(i), self.max_us) / 1000
+                t += 1
+            if t == len(targets):
+                break
+        return out
+
+    # --- Serialization --------------------------------------------------------
+
+    def to_dict(self):
+        """
+        Compact JSON-friendly form: counters as zig-zag varints where a negative
+        number is a run of empty counters, zlib-compressed and base64-encoded.
+        """
+        out = bytearray()
+        zeros = 0
+        last = max((i for i, c in enumerate(self.counts) if c), default=-1)
+        for c in self.counts[:last + 1]:
+            if c == 0:
+                zeros += 1
+                continue
+            if zeros:
+                _put_varint(out, -zeros)
+                zeros = 0
+            _put_varint(out, c)
+        return {
+            "lowest_us": self.lowest,
+            "highest_us": self.highest,
+            "significant_digits": self.significant_digits,
+            "total": self.total,
+            "sum_us": self.sum_us,
+            "min_us": self.min_us or 0,
+            "max_us": self.max_us,
+            "counts": base64.b64encode(zlib.compress(bytes(out), 9)).decode("ascii"),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        hist = cls(data["lowest_us"], data["highest_us"], data["significant_digits"])
+        raw = zlib.decompress(base64.b64decode(data["counts"]))
+        i = pos = 0
+        while pos < len(raw):
+            value, pos = _get_varint(raw, pos)
+            if value < 0:
+                i -= value
+            else:
+                hist.counts[i] = value
+                i += 1
+        hist.total = data["total"]
+        hist.sum_us = data["sum_us"]
+        hist.min_us = data["min_us"] if hist.total else None
+        hist.max_us = data["max_us"]
+        return hist
+
+
+def _put_varint(out, value):
+    value = (value << 1) ^ (value >> 63)   # zig-zag
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _get_varint(raw, pos):
+    value = shift = 0
+    while True:
+        byte = raw[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            break
+        shift += 7
+    return (value >> 1) ^ -(value & 1), pos
@@ -0,0 +1,303 @@
+"""
+Minimal asyncio HTTP/1.1 client for the load engine.
+
+`requests` blocks one OS thread per in-flight call and, through the module-level
+`requests.post`, opens a new TCP connection every time. Here a virtual user is
+a coroutine borrowing keep-alive sockets from a ConnectionPool, which lets tens
+of thousands of users share one process and measures the server rather than
+connection setup. Only what the shortener API needs is supported: JSON bodies,
+Content-Length or chunked responses, and no redirect following.
+"""
+import asyncio
+import json
+from time import monotonic
+from urllib.parse import urlsplit
+
+# Everything a single request may raise on a network or protocol failure.
+REQUEST_ERRORS = (
+    OSError,
+    asyncio.TimeoutError,
+    asyncio.IncompleteReadError,
+    asyncio.LimitOverrunError,
+)
+
+
+# Consecutive Timing stamps delimit these (see endpoints.py)
+PHASES = ("pool_wait", "connect", "send", "ttfb", "body")
+
+
+class HttpProtocolError(ConnectionError):
+    """The server sent something that is not a valid HTTP/1.1 response."""
+
+
+class Timing:
+    """
+    Monotonic timestamps of one request. `first_byte` is stamped once the
+    response head is read, which for the API's small heads is when it arrived.
+    `intended` is when a schedule meant it to start (`start` without one).
+    """
+    __slots__ = ("intended", "start", "acquired", "connected", "sent", "first_byte", "done")
+
+    def __init__(self, start, intended=None):
+        self.intended = start if intended is None else intended
+        self.start = start
+        self.acquired = self.connected = self.sent = self.first_byte = self.done = start
+
+    def phases(self):
+        """Seconds spent in each of PHASES."""
+        return (self.acquired - self.start, self.connected - self.acquired, self.sent - self.connected,
+                self.first_byte - self.sent, self.done - self.first_byte)
+
+
+class Response:
+    __slots__ = ("status", "headers", "body")
+
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class HttpConnection:
+    """
+    One socket to the pool's host, reopened transparently on failure.
+
+    A failed request's exception gets `phase` "connect" or "request": whether
+    it happened before the TCP connection was up (see errors.py).
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._reader = None
+        self._writer = None
+        self._connecting = False
+
+    @property
+    def is_open(self):
+        return self._writer is not None
+
+    async def request(self, method, path, body=None, timing=None):
+        try:
+            return await asyncio.wait_for(self._request(method, path, body, timing), self.pool.timeout)
+        except Exception as e:
+            e.phase = "connect" if self._connecting else "request"
+            self.close()
+            raise
+        except BaseException:
+            self.close()
+            raise
+
+    async def _request(self, method, path, body, timing):
+        reused = self._writer is not None
+        if not reused:
+            await self._connect()
+            if timing is not None:
+                timing.connected = monotonic()
+        try:
+            return await self._exchange(method, path, body, timing)
+        except (asyncio.IncompleteReadError, ConnectionResetError, BrokenPipeError) as e:
+            # An idle keep-alive socket the server already closed fails before a
+            # single byte comes back; that is not a server error, so retry once.
+            partial = getattr(e, "partial", b"")
+            if not reused or partial:
+                raise
+            self.close()
+            await self._connect()
+            if timing is not None:
+                timing.connected = monotonic()
+            return await self._exchange(method, path, body, timing)
+
+    async def pipeline(self, batch):
+        """
+        HTTP/1.1 pipelining: write every (method, path, body) in `batch`, then
+        read the responses in order. One round trip per batch instead of per
+        request; `pool.timeout` covers the whole batch.
+        """
+        try:
+            return await asyncio.wait_for(self._pipeline(batch), self.pool.timeout)
+        except BaseException:
+            self.close()
+            raise
+
+    async def _pipeline(self, batch):
+        if self._writer is None:
+            await self._connect()
+        self._writer.write(b"".join(self._encode(method, path, body) for method, path, body in batch))
+        await self._writer.drain()
+        responses = [await self._read_response()]
+        while len(responses) < len(batch):
+            if self._writer is None:
+                # Server closed after the last response; the rest were never answered
+                raise HttpProtocolError(f"Connection closed after {len(responses)} of {len(batch)} pipelined requests")
+            responses.append(await self._read_response())
+        return responses
+
+    async def _connect(self):
+        self._connecting = True
+        self._reader, self._writer = await asyncio.open_connection(self.pool.host, self.pool.port)
+        self._connecting = False
+        self.pool.connects += 1
+
+    def _encode(self, method, path, body):
+        head = [f"{method} {path} HTTP/1.1".encode(), b"Host: " + self.pool.host_header]
+        if not self.pool.keep_alive:
+            head.append(b"Connection: close")
+        if body is not None:
+            head.append(b"Content-Type: application/json")
+            head.append(b"Content-Length: " + str(len(body)).encode())
+        return b"\r\n".join(head) + b"\r\n\r\n" + (body or b"")
+
+    async def _exchange(self, method, path, body, timing=None):
+        self._writer.write(self._encode(method, path, body))
+        await self._writer.drain()
+        if timing is not None:
+            timing.sent = monotonic()
+        return await self._read_response(timing)
+
+    async def _read_response(self, timing=None):
+        status, headers = await self._read_head()
+        if timing is not None:
+            timing.first_byte = monotonic()
+        body = await self._read_body(status, headers)
+        if not self.pool.keep_alive or headers.get("connection", "").lower() == "close":
+            self.close()
+        return Response(status, headers, body)
+
+    async def _read_head(self):
+        raw = await self._reader.readuntil(b"\r\n\r\n")
+        lines = raw.decode("latin-1").split("\r\n")
+        try:
+            status = int(lines[0].split(" ", 2)[1])
+        except (IndexError, ValueError):
+            raise HttpProtocolError(f"Bad status line: {lines[0][:80]!r}")
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        return status, headers
+
+    async def _read_body(self, status, headers):
+        if status in (204, 304) or 100 <= status < 200:
+            return b""
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self._reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if size == 0:
+                    await self._reader.readuntil(b"\r\n")
+                    return b"".join(chunks)
+                chunks.append((await self._reader.readexactly(size + 2))[:-2])
+        if "content-length" in headers:
+            return await self._reader.readexactly(int(headers["content-length"]))
+        # No framing: the body runs to EOF and the socket cannot be reused.
+        body = await self._reader.read()
+        self.close()
+        return body
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+        self._connecting = False
+
+
+class ConnectionPool:
+    """
+    Up to `size` connections to `base_url`; callers beyond that wait for one.
+
+    keep_alive=False sends `Connection: close` and drops the socket after every
+    response, so each request pays for a fresh TCP connect (the old
+    `requests.post` behaviour), which is useful for comparing against
+    steady-state keep-alive throughput.
+    """
+
+    def __init__(self, base_url, size=1, timeout=5.0, keep_alive=True):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.host_header = f"{self.host}:{self.port}".encode()
+        self.size = size
+        self.timeout = timeout
+        self.keep_alive = keep_alive
+        self.connects = 0
+        self._idle = []     # LIFO so the most recently used (warm) socket goes next
+        self._slots = asyncio.Semaphore(size)
+
+    async def acquire(self):
+        await self._slots.acquire()
+        return self._idle.pop() if self._idle else HttpConnection(self)
+
+    def release(self, conn):
+        if conn.is_open:
+            self._idle.append(conn)
+        self._slots.release()
+
+    def close(self):
+        for conn in self._idle:
+            conn.close()
+        self._idle.clear()
+
+
+class HttpClient:
+    """
+    What a scenario talks to: GET / POST-JSON through a ConnectionPool.
+
+    Without a `pool` the client owns a private single-connection pool, i.e. one
+    keep-alive socket per virtual user.
+
+    With `on_timing` set, every request ends with a call
+    `on_timing(method, path, body, status, timing)`: status None if it
+    raised, and a Timing of its phases. Setting `intended` stamps the next
+    request's Timing with that scheduled start. `last_response` is the latest
+    response received, which tells the engine what a scenario that returned
+    False rejected.
+    """
+
+    def __init__(self, base_url=None, timeout=5.0, pool=None, on_timing=None):
+        self._owns_pool = pool is None
+        self.pool = pool if pool is not None else ConnectionPool(base_url, 1, timeout)
+        self.on_timing = on_timing
+        self.intended = None
+        self.last_response = None
+
+    async def get(self, path):
+        return await self.request("GET", path)
+
+    async def post_json(self, path, payload):
+        return await self.request("POST", path, json.dumps(payload).encode())
+
+    async def request(self, method, path, body=None):
+        if self.on_timing is not None:
+            return await self._timed_request(method, path, body)
+        conn = await self.pool.acquire()
+        try:
+            self.last_response = await conn.request(method, path, body)
+            return self.last_response
+        finally:
+            self.pool.release(conn)
+
+    async def _timed_request(self, method, path, body):
+        timing = Timing(monotonic(), self.intended)
+        self.intended = None
+        conn = await self.pool.acquire()
+        timing.acquired = timing.connected = monotonic()
+        try:
+            resp = await conn.request(method, path, body, timing)
+            timing.done = monotonic()
+        except Exception:
+            # Cancellation (a watchdog shedding the request) is not a result
+            self.on_timing(method, path, body, None, timing)
+            raise
+        finally:
+            self.pool.release(conn)
+        self.on_timing(method, path, body, resp.status, timing)
+        self.last_response = resp
+        return resp
+
+    def close(self):
+        if self._owns_pool:
+            self.pool.close()
@@ -0,0 +1,138 @@
+"""
+Hot-key read workloads over a pre-seeded corpus of short codes.
+
+Resolving a code created a moment ago always hits a cold, unique key. Here the
+corpus is seeded once (deterministic URLs, so every process and agent that
+seeds it gets the same codes back from the idempotent /shorten), or read from
+a store written by `--seed` (see corpus.py), and reads pick codes by
+popularity rank:
+
+    zipf     rank k drawn with weight 1 / k**skew (skew 0 = uniform)
+    uniform  every code equally likely
+    latest   uniformly among the `latest` most recently created codes
+
+Results are accounted per popularity bucket (top_10 = ranks 1-10, top_100 =
+ranks 11-100, ..., the last one capped at the ranks there are), which shows how latency moves with key popularity: the
+curve a cache in front of resolve flattens.
+"""
+import bisect
+import itertools
+import random
+from array import array
+
+from .corpus import CorpusStore, bulk_seed
+
+DISTRIBUTIONS = ("zipf", "uniform", "latest")
+CORPUS_SIZE = 100_000
+
+
+def popularity_bucket(rank, ranks=None):
+    """
+    0-based rank -> 'top_10' for ranks 0-9, 'top_100' for 10-99, ...; out of
+    `ranks` in all, the last bucket is 'top_<ranks>' (a 20k-key corpus has no top_100000).
+    """
+    top = 10 ** len(str(rank))
+    return f"top_{min(top, ranks)}" if ranks is not None else f"top_{top}"
+
+
+class KeyChooser:
+    """Draws corpus indexes by popularity; `pick()` -> (index, 0-based rank)."""
+
+    def __init__(self, size, distribution="zipf", skew=1.0, latest=1000, rng=random):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown key distribution {distribution!r}, expected one of {DISTRIBUTIONS}")
+        if size < 1:
+            raise ValueError("Key corpus must not be empty")
+        self.size = size
+        self.distribution = distribution
+        self.skew = skew
+        self.latest = min(latest, size)
+        # How many ranks pick() can return
+        self.ranks = self.latest if distribution == "latest" else size
+        self._rng = rng
+        self._cum_weights = None
+        if distribution == "zipf":
+            # One float per key, searched by bisection: O(log n) per draw
+            self._cum_weights = array("d", itertools.accumulate((k ** -skew for k in range(1, size + 1))))
+
+    def pick(self):
+        if self.distribution == "zipf":
+            rank = min(bisect.bisect_left(self._cum_weights, self._rng.random() * self._cum_weights[-1]), self.size - 1)
+            return rank, rank
+        if self.distribution == "uniform":
+            index = self._rng.randrange(self.size)
+            return index, index
+        rank = self._rng.randrange(self.latest)
+        return self.size - 1 - rank, rank
+
+
+class HotKeys:
+    """
+    Resolve-only scenario over a seeded corpus, accounted per popularity bucket.
+
+    With `corpus` (a CorpusStore path) the codes are memory-mapped from it and
+    `keys` defaults to, and is capped at, its seeded entries; otherwise
+    `prepare`, which the engine runs once outside any stage, seeds `keys`
+    codes into memory.
+
+    An interrupted `--seed` leaves a store seeded up to some index, which is
+    read as a smaller corpus. Unseeded slots inside that prefix (batches that
+    were still retrying) would read back as '' and be sent as GET /, so such a
+    store is refused until `--seed` fills it.
+    """
+
+    def __init__(self, distribution="zipf", keys=None, skew=1.0, latest=1000, namespace="corpus", corpus=None):
+        self.corpus = corpus
+        self.codes = None
+        if corpus is not None:
+            self.codes = CorpusStore.open(corpus)
+            namespace = self.codes.namespace
+            seeded, holes = self.codes.seeded()
+            if seeded == 0 or holes:
+                size = len(self.codes)
+                self.codes.close()
+                what = f"{holes} entries between seeded ones are missing" if holes else "no entry is seeded"
+                raise ValueError(f"Corpus {corpus}: {what}; rerun --seed {size} --corpus {corpus} to fill it")
+            keys = min(keys or seeded, seeded)
+        self.chooser = KeyChooser(keys or CORPUS_SIZE, distribution, skew, latest)
+        self.namespace = namespace
+
+    @classmethod
+    def from_spec(cls, spec):
+        """'zipf,keys=100000,skew=1.1' / 'latest,latest=500' -> HotKeys."""
+        distribution, *params = spec.split(",")
+        kwargs = {}
+        for param in params:
+            name, _, value = param.partition("=")
+            name = name.strip()
+            if name not in ("keys", "skew", "latest", "namespace", "corpus"):
+                raise ValueError(f"Unknown hot-key parameter {name!r}")
+            kwargs[name] = value if name in ("namespace", "corpus") else (float(value) if name == "skew" else int(value))
+        return cls(distribution.strip(), **kwargs)
+
+    def __str__(self):
+        c = self.chooser
+        detail = {"zipf": f",skew={c.skew:g}", "latest": f",latest={c.latest}"}.get(c.distribution, "")
+        if self.corpus is not None:
+            detail += f",corpus={self.corpus}"
+        elif self.namespace != "corpus":
+            detail += f",namespace={self.namespace}"
+        return f"hot:{c.distribution},keys={c.size}{detail}"
+
+    async def prepare(self, base_url, timeout=5.0):
+        if self.codes is not None:
+            return
+        print(f"  🌱 Seeding {self.chooser.size} keys for {self}...")
+        codes = CorpusStore.in_memory(self.chooser.size, self.namespace)
+        await bulk_seed(base_url, codes, timeout=timeout)
+        self.codes = codes
+
+    async def __call__(self, client):
+        index, rank = self.chooser.pick()
+        bucket = popularity_bucket(rank, self.chooser.ranks)
+        try:
+            resp = await client.get(f"/{self.codes[index]}")
+        except Exception as e:
+            e.operation = bucket
+            raise
+        return bucket, resp.status == 302
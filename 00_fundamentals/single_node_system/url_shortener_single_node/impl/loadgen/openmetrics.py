@@ -0,0 +1,268 @@
+"""
+Live OpenMetrics / Prometheus endpoint while a run is going.
+
+Result files only appear once a run ends, which for a six-hour soak or a
+breakpoint search is too late to notice it went wrong. A MetricsExporter
+serves GET /metrics on a local port from a background thread, so a
+Prometheus (or anything that reads its text format) can scrape the run:
+
+    loadgen_stage_info{stage}                    stage running now
+    loadgen_target_rps, loadgen_target_users     what the stage or profile asks for
+    loadgen_offered_rps, loadgen_achieved_rps    requests sent / succeeded per second, last interval
+    loadgen_in_flight                            requests outstanding at the last interval
+    loadgen_requests_total{outcome}              counters since the exporter started
+    loadgen_operation_requests_total{operation,outcome}
+    loadgen_endpoint_requests_total{endpoint,outcome}
+    loadgen_dropped_total                        open-model arrivals shed at the in-flight cap
+    loadgen_errors_total{category}               by errors.py category
+    loadgen_request_latency_seconds              histogram, all requests
+    loadgen_operation_latency_seconds{operation} histogram per operation of a mix
+    loadgen_endpoint_latency_seconds{endpoint}   histogram per endpoint (see endpoints.py), any scenario
+
+It adds nothing per request. The exporter stands in the engine's
+`timeseries` chain and only gets the per-interval windows the engine closes
+anyway; on the event-loop thread it queues each one (a closed window is never
+written again), and the scrape thread folds the queue into counters and
+buckets when asked. Values therefore move once per interval. The last-interval
+gauges skip a window shorter than half an interval (an aborted stage's
+remainder): over a sliver of time its rates are noise.
+
+    python -m loadgen --metrics-port 9464
+"""
+import math
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT = 9464
+# Latency bucket bounds in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Windows queued without a scrape before the event loop folds them itself
+MAX_PENDING = 600
+OPENMETRICS_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+PROMETHEUS_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _number(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "NaN"
+    return f"{value:.6g}" if isinstance(value, float) else str(value)
+
+
+class LatencyBuckets:
+    """Cumulative Prometheus histogram folded from LatencyHistograms."""
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum_s = 0.0
+
+    def add(self, histogram):
+        if not histogram.total:
+            return
+        for i, n in enumerate(histogram.counts_at_or_below([b * 1_000_000 for b in BUCKETS])):
+            self.buckets[i] += n
+        self.count += histogram.total
+        self.sum_s += histogram.sum_us / 1_000_000
+
+
+class MetricsExporter:
+    """
+    Stands in for the run's TimeSeriesWriter (`tee`), passing everything on
+    to it, and serves what it saw at http://`bind`:`port`/metrics.
+    """
+
+    def __init__(self, port=METRICS_PORT, bind="127.0.0.1", tee=None):
+        self.tee = tee
+        self.stage = None
+        self.stages = 0
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        # Folded state, only touched under _state_lock
+        self._last = {}
+        self._requests = Counter()
+        self._op_requests = Counter()
+        self._errors = Counter()
+        self._dropped = 0
+        self._latency = LatencyBuckets()
+        self._op_latency = {}
+        self._endpoint_requests = Counter()
+        self._endpoint_latency = {}
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                openmetrics = "application/openmetrics-text" in self.headers.get("Accept", "")
+                body = exporter.render(openmetrics).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", OPENMETRICS_TYPE if openmetrics else PROMETHEUS_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((bind, port), Handler)
+        self._server.daemon_threads = True
+        self.address = "%s:%d" % self._server.server_address[:2]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-exporter", daemon=True)
+        self._thread.start()
+
+    # --- TimeSeriesWriter interface (event-loop thread) ---------------------
+
+    @property
+    def interval(self):
+        return self.tee.interval if self.tee is not None else 1.0
+
+    def begin_stage(self, label):
+        with self._pending_lock:
+            self._pending.append(("stage", label))
+        if self.tee is not None:
+            self.tee.begin_stage(label)
+
+    def write(self, window, in_flight, length):
+        self._observe(window, in_flight, length)
+        if self.tee is not None:
+            self.tee.write(window, in_flight, length)
+
+    def write_row(self, row, window=None):
+        if window is not None:
+            self._observe(window, row["in_flight"], row["interval_s"], row.get("target_users"))
+        if self.tee is not None:
+            self.tee.write_row(row, window)
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self.tee is not None:
+            self.tee.close()
+
+    def _observe(self, window, in_flight, length, target_users=None):
+        with self._pending_lock:
+            self._pending.append(("window", (window, in_flight, length, target_users)))
+            overflow = len(self._pending) > MAX_PENDING
+        if overflow:
+            # Nobody is scraping; keep memory bounded
+            self._fold()
+
+    # --- Scrape thread ------------------------------------------------------
+
+    def _fold(self):
+        with self._state_lock:
+            # Swapped under the state lock too, so two folds cannot apply batches out of order
+            with self._pending_lock:
+                pending, self._pending = self._pending, []
+            for kind, item in pending:
+                if kind == "stage":
+                    self.stage = item
+                    self.stages += 1
+                    continue
+                window, in_flight, length, target_users = item
+                completed = window.success + window.errors
+                if length >= self.interval / 2:
+                    self._last = {
+                        "in_flight": in_flight,
+                        "achieved_rps": window.success / length,
+                        # A closed stage sends a request whenever one completes
+                        "offered_rps": (window.issued if window.target_rps is not None else completed) / length,
+                        "target_rps": window.target_rps,
+                        "target_users": target_users,
+                    }
+                self._requests["success"] += window.success
+                self._requests["error"] += window.errors
+                self._dropped += window.dropped
+                self._errors.update(window.error_log)
+                self._latency.add(window.latencies)
+                for name, op in window.operations.items():
+                    self._op_requests[(name, "success")] += op.success
+                    self._op_requests[(name, "error")] += op.errors
+                    buckets = self._op_latency.get(name)
+                    if buckets is None:
+                        buckets = self._op_latency[name] = LatencyBuckets()
+                    buckets.add(op.latencies)
+                for name, endpoint in window.endpoints.items():
+                    self._endpoint_requests[(name, "success")] += endpoint.success
+                    self._endpoint_requests[(name, "error")] += endpoint.errors
+                    buckets = self._endpoint_latency.get(name)
+                    if buckets is None:
+                        buckets = self._endpoint_latency[name] = LatencyBuckets()
+                    buckets.add(endpoint.latencies)
+
+    def render(self, openmetrics=True):
+        """The exposition text, in OpenMetrics or (without `openmetrics`) Prometheus 0.0.4 format."""
+        self._fold()
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            # OpenMetrics names counter and info families without their sample suffix;
+            # the Prometheus format names them after the sample, and has no info type
+            declared = name
+            if not openmetrics and kind in ("counter", "info"):
+                declared, kind = name + ("_total" if kind == "counter" else "_info"), "counter" if kind == "counter" else "gauge"
+            lines.append(f"# HELP {declared} {help_text}")
+            lines.append(f"# TYPE {declared} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+                lines.append(f"{name}{suffix}{{{label_text}}} {_number(value)}" if label_text
+                             else f"{name}{suffix} {_number(value)}")
+
+        def histogram(name, help_text, series):
+            samples = []
+            for labels, h in series:
+                for bound, n in zip(BUCKETS, h.buckets):
+                    samples.append(("_bucket", dict(labels, le=f"{bound:g}"), n))
+                samples.append(("_bucket", dict(labels, le="+Inf"), h.count))
+                samples.append(("_count", labels, h.count))
+                samples.append(("_sum", labels, float(h.sum_s)))
+            family(name, "histogram", help_text, samples)
+
+        with self._state_lock:
+            last = self._last
+            if self.stage is not None:
+                family("loadgen_stage", "info", "Stage the load generator is running",
+                       [("_info", {"stage": self.stage}, 1)])
+            family("loadgen_stages_started", "counter", "Stages begun since the run started",
+                   [("_total", {}, self.stages)])
+            for key, help_text in (
+                ("target_rps", "Arrival rate the current open stage or rps profile aims for"),
+                ("target_users", "Virtual users the current users profile asks for"),
+                ("offered_rps", "Requests sent per second over the last interval"),
+                ("achieved_rps", "Requests succeeded per second over the last interval"),
+                ("in_flight", "Requests outstanding at the end of the last interval"),
+            ):
+                if last.get(key) is not None:
+                    family(f"loadgen_{key}", "gauge", help_text, [("", {}, float(last[key]))])
+            family("loadgen_requests", "counter", "Requests completed, by outcome",
+                   [("_total", {"outcome": outcome}, self._requests[outcome]) for outcome in ("success", "error")])
+            if self._op_requests:
+                family("loadgen_operation_requests", "counter", "Requests completed per operation, by outcome",
+                       [("_total", {"operation": op, "outcome": outcome}, n)
+                        for (op, outcome), n in sorted(self._op_requests.items())])
+            if self._endpoint_requests:
+                family("loadgen_endpoint_requests", "counter", "HTTP requests completed per endpoint, by outcome",
+                       [("_total", {"endpoint": name, "outcome": outcome}, n)
+                        for (name, outcome), n in sorted(self._endpoint_requests.items())])
+            family("loadgen_dropped", "counter", "Open-model arrivals dropped at the in-flight cap",
+                   [("_total", {}, self._dropped)])
+            family("loadgen_errors", "counter", "Failed requests by error category",
+                   [("_total", {"category": category}, n) for category, n in sorted(self._errors.items())])
+            histogram("loadgen_request_latency_seconds", "Latency of successful requests",
+                      [({}, self._latency)])
+            if self._op_latency:
+                histogram("loadgen_operation_latency_seconds", "Latency of successful requests per operation",
+                          [({"operation": name}, h) for name, h in sorted(self._op_latency.items())])
+            if self._endpoint_latency:
+                histogram("loadgen_endpoint_latency_seconds", "Latency of successful HTTP requests per endpoint",
+                          [({"endpoint": name}, h) for name, h in sorted(self._endpoint_latency.items())])
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
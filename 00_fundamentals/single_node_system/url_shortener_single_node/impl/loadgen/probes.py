@@ -0,0 +1,293 @@
+"""
+Security probes as an isolated, rate-controlled lane beside a load stage.
+
+Turning a share of load requests into attack payloads makes a stage's real
+offered load depend on luck, takes slots from the load and leaves those
+requests out of every latency figure. A ProbeLane instead sends hostile
+/shorten requests at its own fixed rate, on its own connections, from a
+process of its own, and accounts them apart from the stage: per payload
+family, how many were
+
+    blocked   answered 4xx: rejected by validation (the wanted outcome)
+    leaked    answered 5xx: the payload reached something that broke
+    accepted  answered 2xx: stored as if it were a URL
+    errors    no answer: timeout, reset, ...
+
+with the latency of the answered ones. The stage's own traffic stays clean,
+so comparing a stage with and without a lane shows whether hostile payloads
+slow down legitimate requests: run as an ABTest (see abtest.py) with a
+ProbedEngine as B, which puts a lane beside each of its stages.
+
+Payloads come from `build_corpus`: seed payloads per family, each also run
+through every mutator (encodings, case, embedding in a valid URL, ...), plus
+raw bodies that are not a JSON object with a string `long_url` at all.
+
+The lane is a forked process, like load workers (see workers.py), so it
+shares no GIL with the engine's event loop: a slower stage next to it is the
+server's doing, not the generator's. It is started before the stage and is
+not a thread, so `workers > 1` forks a single-threaded parent. Its stats come
+back over a queue when it stops, and accumulate over every start/stop.
+"""
+import asyncio
+import multiprocessing
+import queue
+import random
+from collections import Counter
+from time import monotonic
+from urllib.parse import quote
+
+from .errors import classify
+from .histogram import LatencyHistogram
+from .http import ConnectionPool, HttpClient
+
+PROBE_RPS = 20
+PROBE_CONNECTIONS = 4
+CORPUS_SIZE = 500
+# Probes waiting on a slow server beyond this are dropped, not queued
+MAX_PROBES_IN_FLIGHT = 200
+# Time the lane's process gets to come up before the stage starts without it
+STARTUP_TIMEOUT = 5.0
+
+SEEDS = {
+    "sqli": ["' OR '1'='1", "'; DROP TABLE url_entity; --", "1' UNION SELECT NULL,NULL--", "\" OR \"\"=\"",
+             "admin'--", "1; SELECT pg_sleep(5)"],
+    "xss": ["<script>alert('XSS')</script>", "<img src=x onerror=alert(1)>", "javascript:alert(1)",
+            "\"><svg/onload=alert(1)>"],
+    "template": ["{{7*7}}", "${7*7}", "#{7*7}", "<%= 7*7 %>", "${jndi:ldap://127.0.0.1/a}"],
+    "traversal": ["../../etc/passwd", "..%2f..%2fetc%2fpasswd", "file:///etc/passwd", "/..;/..;/actuator"],
+    "ssrf": ["http://127.0.0.1:8080/health", "http://169.254.169.254/latest/meta-data/", "http://[::1]/",
+             "http://0x7f000001/", "gopher://127.0.0.1:6379/_INFO"],
+    "header": ["https://example.com/\r\nSet-Cookie: x=1", "https://example.com/%0d%0aLocation: http://evil"],
+    "oversize": ["A" * 10000, "https://example.com/" + "a" * 2100, "https://example.com/?" + "q=1&" * 4000],
+    "encoding": ["https://example.com/\x00", "https://exa\u200bmple.com/", "https://例え.jp/パス",
+                 "https://example.com/\ud800"],
+}
+
+MUTATORS = {
+    "raw": lambda p: p,
+    "url_encoded": lambda p: quote(p, safe="", errors="surrogatepass"),
+    "double_encoded": lambda p: quote(quote(p, safe="", errors="surrogatepass"), safe=""),
+    "case_flipped": lambda p: p.swapcase(),
+    "in_path": lambda p: "https://example.com/" + p,
+    "in_query": lambda p: "https://example.com/?next=" + p,
+    "padded": lambda p: "  \t" + p + " \n",
+    "repeated": lambda p: p * 8,
+}
+
+# Bodies that are not {"long_url": "<string>"}
+MALFORMED_BODIES = [
+    b'{"long_url": ',
+    b'{"long_url": 12345}',
+    b'{"long_url": null}',
+    b'{"long_url": ["https://example.com"]}',
+    b'{"url": "https://example.com"}',
+    b"[]",
+    b"",
+    b"\xff\xfe\x00\x01",
+    b'{"a":' * 2000 + b"1" + b"}" * 2000,
+    b'{"long_url": "https://example.com", "long_url": "http://127.0.0.1"}',
+]
+
+
+def _json_string(text):
+    # Lone surrogates cannot be encoded; send them escaped, as a client library would
+    return '"' + "".join(c if c.isprintable() and c not in '"\\' else f"\\u{ord(c):04x}" for c in text) + '"'
+
+
+def build_corpus(size=CORPUS_SIZE, seed=0):
+    """
+    [(family, body bytes), ...]: every seed under every mutator plus the
+    malformed bodies, shuffled and cut to `size` (deterministically by `seed`).
+    """
+    corpus = [(family, ('{"long_url": ' + _json_string(mutate(payload)) + "}").encode())
+              for family, payloads in SEEDS.items()
+              for payload in payloads
+              for mutate in MUTATORS.values()]
+    corpus += [("malformed", body) for body in MALFORMED_BODIES]
+    random.Random(seed).shuffle(corpus)
+    return corpus[:size]
+
+
+class ProbeStats:
+    """Outcomes of one payload family's probes."""
+
+    def __init__(self):
+        self.latencies = LatencyHistogram()
+        self.statuses = Counter()
+        self.errors = Counter()
+
+    def record(self, status, seconds):
+        self.statuses[status] += 1
+        self.latencies.record(seconds * 1_000_000)
+
+    def summary(self):
+        answered = sum(self.statuses.values())
+        out = {
+            "attempts": answered + sum(self.errors.values()),
+            "blocked": sum(n for s, n in self.statuses.items() if 400 <= s < 500),
+            "leaked": sum(n for s, n in self.statuses.items() if s >= 500),
+            "accepted": sum(n for s, n in self.statuses.items() if 200 <= s < 300),
+            "errors": sum(self.errors.values()),
+            "statuses": {str(s): n for s, n in sorted(self.statuses.items())},
+            "error_log": dict(self.errors.most_common()),
+        }
+        out.update(self.latencies.summary_ms())
+        return out
+
+    def merge(self, other):
+        self.latencies.merge(other.latencies)
+        self.statuses.update(other.statuses)
+        self.errors.update(other.errors)
+        return self
+
+    def to_dict(self):
+        return {"latencies": self.latencies.to_dict(), "statuses": dict(self.statuses), "errors": dict(self.errors)}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.latencies = LatencyHistogram.from_dict(data["latencies"])
+        stats.statuses.update(data["statuses"])
+        stats.errors.update(data["errors"])
+        return stats
+
+
+class ProbeLane:
+    """
+    Sends `corpus` payloads, cycling, at `rps` while started:
+
+        with ProbeLane(BASE_URL, rps=20) as lane:
+            metrics = engine.run_stage(200, 10)
+        probes = lane.summary()
+    """
+
+    def __init__(self, base_url, rps=PROBE_RPS, corpus=None, timeout=5.0, connections=PROBE_CONNECTIONS):
+        self.base_url = base_url
+        self.rps = rps
+        self.corpus = corpus if corpus is not None else build_corpus()
+        self.timeout = timeout
+        self.connections = connections
+        self.families = {}
+        self.dropped = 0
+        self._elapsed = 0.0
+        # fork: the corpus is inherited rather than pickled
+        self._ctx = multiprocessing.get_context("fork")
+        self._process = None
+
+    def start(self):
+        self._stop = self._ctx.Event()
+        ready = self._ctx.Event()
+        self._results = self._ctx.Queue()
+        self._process = self._ctx.Process(target=self._main, args=(ready,), name="probe-lane", daemon=True)
+        self._process.start()
+        ready.wait(STARTUP_TIMEOUT)
+
+    def stop(self):
+        if self._process is None:
+            return
+        self._stop.set()
+        try:
+            # Probes still in flight get up to `timeout` to finish
+            families, dropped, elapsed = self._results.get(timeout=self.timeout + STARTUP_TIMEOUT)
+        except queue.Empty:
+            families, dropped, elapsed = {}, 0, 0.0
+        self._process.join()
+        self._process = None
+        for name, data in families.items():
+            stats = ProbeStats.from_dict(data)
+            if name in self.families:
+                self.families[name].merge(stats)
+            else:
+                self.families[name] = stats
+        self.dropped += dropped
+        self._elapsed += elapsed
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _main(self, ready):
+        # The lane's process: this object is a copy, so what it measured goes back over the queue
+        self.families, self.dropped, self._elapsed = {}, 0, 0.0
+        try:
+            asyncio.run(self._run(ready))
+        finally:
+            self._results.put(({name: stats.to_dict() for name, stats in self.families.items()},
+                               self.dropped, self._elapsed))
+
+    async def _run(self, ready):
+        pool = ConnectionPool(self.base_url, self.connections, self.timeout)
+        client = HttpClient(pool=pool)
+        tasks = set()
+        start = monotonic()
+        sent = 0
+        # Short stages would otherwise all probe the start of the corpus
+        offset = random.randrange(len(self.corpus))
+        ready.set()
+        try:
+            while not self._stop.is_set():
+                # Uniform arrivals: a slow answer delays no later probe
+                delay = start + sent / self.rps - monotonic()
+                if delay > 0:
+                    await asyncio.sleep(min(delay, 0.1))
+                    continue
+                family, body = self.corpus[(offset + sent) % len(self.corpus)]
+                sent += 1
+                if len(tasks) >= MAX_PROBES_IN_FLIGHT:
+                    self.dropped += 1
+                    continue
+                task = asyncio.ensure_future(self._probe(client, family, body))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            self._elapsed = monotonic() - start
+            if tasks:
+                await asyncio.wait(tasks, timeout=self.timeout)
+        finally:
+            for task in tasks:
+                task.cancel()
+            pool.close()
+
+    async def _probe(self, client, family, body):
+        stats = self.families.get(family)
+        if stats is None:
+            stats = self.families[family] = ProbeStats()
+        t0 = monotonic()
+        try:
+            resp = await client.request("POST", "/shorten", body)
+        except Exception as e:
+            stats.errors[classify(e)] += 1
+            return
+        stats.record(resp.status, monotonic() - t0)
+
+    def summary(self):
+        """Per-family outcomes plus their totals, over every run so far; call after `stop()`."""
+        families = {name: stats.summary() for name, stats in sorted(self.families.items())}
+        total = ProbeStats()
+        for stats in self.families.values():
+            total.merge(stats)
+        out = total.summary()
+        out.update({
+            "target_rps": self.rps,
+            "rps": out["attempts"] / self._elapsed if self._elapsed else 0.0,
+            "dropped": self.dropped,
+            "families": families,
+        })
+        return out
+
+
+class ProbedEngine:
+    """
+    An engine whose every stage runs beside `lane`: the B side of an ABTest
+    that measures how much probes slow the same engine's clean traffic (A).
+    """
+
+    def __init__(self, engine, lane):
+        self.engine = engine
+        self.lane = lane
+
+    def run_stage(self, load, duration):
+        with self.lane:
+            return self.engine.run_stage(load, duration)
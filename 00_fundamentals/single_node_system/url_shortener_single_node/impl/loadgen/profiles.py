@@ -0,0 +1,253 @@
+"""
+Continuous load profiles.
+
+A list of STAGES rebuilds the generator for every entry and rests between
+them, so a run yields one data point per stage and a lot of dead time. A
+Profile instead is one long stage whose load follows a shape over time, in
+virtual users (closed) or arrivals per second (open):
+
+    linear  from=A,to=B,over=T[,hold=H]      A -> B over T seconds, then hold B
+    step    from=A,to=B,step=S,every=T       staircase A, A+S, ... B, T seconds each
+            levels=A/B/C,every=T             ... or through explicit levels
+    spike   base=A,peak=B,at=T,for=D[,after=E]
+                                             A, then B from T for D seconds, then A again
+    soak    level=A,for=T                    A held for T seconds
+
+written as `<users|rps>:<shape>,<params>`, e.g. 'users:linear,from=10,to=500,over=60'
+or 'rps:spike,base=200,peak=2000,at=30,for=10,arrival=uniform'. The engine
+adds and retires users (or changes the arrival rate) as the profile moves and
+reports metrics per time window: `run_profile` returns one row per interval.
+"""
+import math
+import random
+
+from .scheduler import ARRIVALS, Rate
+from .timeseries import interval_row
+from .trace import Replay
+
+KINDS = ("users", "rps")
+SHAPES = {
+    "linear": (("to", "over"), ("from", "hold")),
+    "step": (("every",), ("from", "to", "step", "levels")),
+    "spike": (("base", "peak", "at", "for"), ("after",)),
+    "soak": (("level", "for"), ()),
+}
+# How often a closed profile re-reads its target user count
+CONTROL_INTERVAL = 0.1
+
+
+class Profile:
+    """A load shape over time; `level(t)` is the target at `t` seconds into it."""
+
+    def __init__(self, kind, shape, params, arrival="poisson", shares=()):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown profile kind {kind!r}, expected one of {KINDS}")
+        if shape not in SHAPES:
+            raise ValueError(f"Unknown profile shape {shape!r}, expected one of {sorted(SHAPES)}")
+        if arrival not in ARRIVALS:
+            raise ValueError(f"Unknown arrival process {arrival!r}, expected one of {ARRIVALS}")
+        required, optional = SHAPES[shape]
+        missing = [name for name in required if name not in params]
+        unknown = sorted(set(params) - set(required) - set(optional))
+        if missing or unknown:
+            raise ValueError(f"Profile {shape!r} needs {', '.join(required)}"
+                             + (f" (optional: {', '.join(optional)})" if optional else "")
+                             + f"; got {', '.join(sorted(params)) or 'nothing'}")
+        self.kind = kind
+        self.shape = shape
+        self.params = dict(params)
+        self.arrival = arrival
+        # (index, of) per split, outermost first: this profile is index's share of `of` generators
+        self.shares = tuple(shares)
+        self._levels = self._step_levels() if shape == "step" else None
+        self.duration = self._duration()
+
+    @classmethod
+    def from_spec(cls, spec):
+        """'users:linear,from=10,to=500,over=60' -> Profile."""
+        kind, _, rest = spec.partition(":")
+        shape, *parts = rest.split(",")
+        params, arrival = {}, "poisson"
+        for part in parts:
+            name, _, value = part.partition("=")
+            name = name.strip()
+            if name == "arrival":
+                arrival = value.strip()
+            elif name == "levels":
+                params[name] = [float(v) for v in value.split("/")]
+            else:
+                params[name] = float(value)
+        return cls(kind.strip(), shape.strip(), params, arrival)
+
+    def __str__(self):
+        parts = [f"{self.kind}:{self.shape}"]
+        for name, value in self.params.items():
+            text = "/".join(f"{v:g}" for v in value) if name == "levels" else f"{value:g}"
+            parts.append(f"{name}={text}")
+        if self.kind == "rps" and self.arrival != "poisson":
+            parts.append(f"arrival={self.arrival}")
+        return ",".join(parts)
+
+    def share(self, index, of):
+        """The part one of `of` generators runs; they add up to this profile."""
+        return Profile(self.kind, self.shape, self.params, self.arrival, self.shares + ((index, of),))
+
+    # --- Shape ----------------------------------------------------------------
+
+    def _step_levels(self):
+        p = self.params
+        if "levels" in p:
+            return list(p["levels"])
+        if "to" not in p or "step" not in p or p["step"] <= 0:
+            raise ValueError("Profile 'step' needs levels=A/B/C, or to= and a positive step=")
+        start = p.get("from", p["step"])
+        count = max(1, math.floor((p["to"] - start) / p["step"] + 1e-9) + 1)
+        return [start + i * p["step"] for i in range(count)]
+
+    def _duration(self):
+        p = self.params
+        if self.shape == "linear":
+            return p["over"] + p.get("hold", 0)
+        if self.shape == "step":
+            return p["every"] * len(self._levels)
+        if self.shape == "spike":
+            return p["at"] + p["for"] + p.get("after", p["at"])
+        return p["for"]
+
+    def _base_level(self, t):
+        p = self.params
+        if self.shape == "linear":
+            start = p.get("from", 0)
+            frac = min(t / p["over"], 1.0) if p["over"] > 0 else 1.0
+            return start + (p["to"] - start) * frac
+        if self.shape == "step":
+            return self._levels[min(int(t // p["every"]), len(self._levels) - 1)]
+        if self.shape == "spike":
+            return p["peak"] if p["at"] <= t < p["at"] + p["for"] else p["base"]
+        return p["level"]
+
+    def _apply_shares(self, level):
+        if self.kind == "rps":
+            for _, of in self.shares:
+                level /= of
+            return level
+        users = round(level)
+        for index, of in self.shares:
+            users = max(0, -(-(users - index) // of))
+        return users
+
+    def level(self, t):
+        """Target users (int) or arrivals per second at `t` seconds."""
+        return self._apply_shares(self._base_level(t))
+
+    def total_level(self, t):
+        """Target at `t` for the whole profile, before any split."""
+        level = self._base_level(t)
+        return round(level) if self.kind == "users" else level
+
+    @property
+    def peak(self):
+        p = self.params
+        if self.shape == "linear":
+            highest = max(p.get("from", 0), p["to"])
+        elif self.shape == "step":
+            highest = max(self._levels)
+        elif self.shape == "spike":
+            highest = max(p["base"], p["peak"])
+        else:
+            highest = p["level"]
+        return self._apply_shares(highest)
+
+    def mean(self, duration=None, samples=1000):
+        """Average level over `duration` seconds (midpoint rule)."""
+        duration = duration or self.duration
+        dt = duration / samples
+        return sum(self.level((i + 0.5) * dt) for i in range(samples)) / samples
+
+    # --- Open model -----------------------------------------------------------
+
+    def arrival_offsets(self, duration, phase=0.0, rng=random):
+        """
+        Intended send times for an rps profile. Poisson arrivals are thinned
+        from a peak-rate stream, which follows the rate exactly through steps
+        and spikes; uniform ones advance by the gap at the current rate.
+        """
+        peak = self.peak
+        if peak <= 0:
+            return
+        if self.arrival == "poisson":
+            t = 0.0
+            while True:
+                t += rng.expovariate(peak)
+                if t >= duration:
+                    return
+                if rng.random() * peak < self.level(t):
+                    yield t
+        t = phase
+        while t < duration:
+            rate = self.level(t)
+            if rate <= 0:
+                t += CONTROL_INTERVAL
+                continue
+            t += 1.0 / rate
+            if t < duration:
+                yield t
+
+
+def target_rps(load, duration):
+    """Arrival rate an open stage, rps profile or replay aims for on average; None for closed loads."""
+    if isinstance(load, Rate):
+        return load.rps
+    if isinstance(load, Profile) and load.kind == "rps":
+        return load.mean(duration)
+    if isinstance(load, Replay):
+        return load.rps
+    return None
+
+
+class WindowCollector:
+    """
+    Stands in for a TimeSeriesWriter during a profile: keeps every interval
+    as a row with the profile's target at that time, and passes it on to
+    `tee` (the run's own TimeSeriesWriter) if there is one.
+    """
+
+    def __init__(self, profile, interval, tee=None):
+        self.profile = profile
+        self.interval = interval
+        self.tee = tee
+        self.rows = []
+        # Windows are back to back from the stage's start, wherever its generators run
+        self.elapsed = 0.0
+
+    def begin_stage(self, label):
+        self.elapsed = 0.0
+        if self.tee is not None:
+            self.tee.begin_stage(label)
+
+    def write(self, window, in_flight, length):
+        self.elapsed += length
+        t = self.elapsed
+        row = {"t": round(t, 3), f"target_{self.profile.kind}": self.profile.total_level(max(0.0, t - length / 2))}
+        row.update(interval_row(window, in_flight, length))
+        self.rows.append(row)
+        if self.tee is not None:
+            self.tee.write_row(dict(row), window)
+
+    def close(self):
+        pass
+
+
+def run_profile(engine, profile, interval=None):
+    """
+    Run `profile` as one stage of `engine` (an AsyncLoadEngine or Coordinator);
+    returns (per-window rows, whole-profile metrics).
+    """
+    tee = engine.timeseries
+    collector = WindowCollector(profile, interval or (tee.interval if tee is not None else 1.0), tee)
+    engine.timeseries = collector
+    try:
+        metrics = engine.run_stage(profile, profile.duration)
+    finally:
+        engine.timeseries = tee
+    return collector.rows, metrics
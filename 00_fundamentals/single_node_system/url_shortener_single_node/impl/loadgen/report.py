@@ -0,0 +1,372 @@
+import json
+import os
+from datetime import datetime
+
+from .abtest import ab_table_md
+from .endpoints import endpoint_table_md, render_endpoints_html
+from .payloads import size_label, sweep_table_md
+from .scaling import analyze, little_check, scaling_md
+from .scheduler import describe
+from .timeseries import read_timeseries, render_timeseries_html
+
+RESULTS_DIR = "src/test/kotlin/com/urlshortener/loadtestresult"
+
+
+def stage_label(load, metrics):
+    """Chart label for a stage, flagged when it was cut short or client-bound."""
+    label = str(load)
+    if "payload" in metrics:
+        label += f" · {size_label(metrics['payload']['url_bytes'])} URL"
+    if "ab" in metrics:
+        label += f" · {metrics['ab']['target']} r{metrics['ab']['round']}"
+    if "aborted" in metrics:
+        label += " (aborted)"
+    if not metrics.get("valid", True):
+        label += " (invalid)"
+    return label
+
+
+def generator_note(metrics):
+    """One line on the generator's own load, or None for stages without samples."""
+    g = metrics.get("generator")
+    if g is None:
+        return None
+    line = (f"CPU {g['cpu'] * 100:.0f}% | loop lag P99 {g['loop_lag_p99_ms']:.1f}ms | "
+            f"in flight avg {g['in_flight_avg']:.0f} / peak {g['in_flight_peak']}")
+    if "send_skew_p99_ms" in g:
+        line += f" | send skew P99 {g['send_skew_p99_ms']:.1f}ms"
+    return line
+
+
+class LoadTestReporter:
+    def __init__(self, base_url, stages, scenario):
+        self.base_url = base_url
+        self.timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        self.run_data = {
+            "timestamp": self.timestamp,
+            "config": {"url": base_url, "stages": stages, "scenario": scenario},
+            "results": [],
+            "health_checks": []
+        }
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        self.timeseries_path = os.path.join(RESULTS_DIR, f"timeseries_v5_{self.timestamp}.jsonl")
+        self.run_data["timeseries_file"] = os.path.basename(self.timeseries_path)
+
+    def add_stage_result(self, users, duration, metrics, windows=None, soak=None):
+        result = {
+            "users": users,
+            "duration": duration,
+            "metrics": metrics
+        }
+        if windows is not None:
+            # A load profile's per-interval rows (see profiles.py), or a soak's buckets
+            result["windows"] = windows
+        if soak is not None:
+            # Trends and drift alerts of a soak (see soak.py)
+            result["soak"] = soak
+        self.run_data["results"].append(result)
+
+    def add_health_check(self, stage_users, is_healthy, latency):
+        self.run_data["health_checks"].append({
+            "after_stage_users": stage_users,
+            "healthy": is_healthy,
+            "latency": latency
+        })
+
+    def _generators(self):
+        agents = self.run_data["config"].get("agents")
+        if agents:
+            return f"{len(agents)} agents ({', '.join(agents)})"
+        return f"{self.run_data['config'].get('workers', 1)} local process(es)"
+
+    def _connection_mode(self):
+        c = self.run_data["config"]
+        if not c.get("keep_alive", True):
+            return "new connection per request"
+        return f"keep-alive, {c.get('pool', 'per-user')} pool" + (f" of {c['pool_size']}" if c.get("pool_size") else "")
+
+    def save_json(self):
+        filepath = os.path.join(RESULTS_DIR, f"result_v5_{self.timestamp}.json")
+        self.run_data["scaling"] = analyze(self.run_data["results"])
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump(self.run_data, f, indent=2)
+        print(f"✅ Raw data saved to: {filepath}")
+        return filepath
+
+    def generate_markdown_report(self):
+        filepath = os.path.join(RESULTS_DIR, f"report_v5_{self.timestamp}.md")
+        lines = [
+            f"# 🚀 Load Test Report (asyncio engine)",
+            f"**Date:** {self.timestamp}  ",
+            f"**Target:** `{self.base_url}`  ",
+            f"**Scenario:** `{self.run_data['config']['scenario']}`  ",
+            f"**Connections:** {self._connection_mode()}  ",
+            f"**Generators:** {self._generators()}",
+            "",
+            "## 1. Executive Summary",
+            "| Load | Throughput (RPS) | Avg Latency (ms) | P99 Latency (ms) | P99 Corrected (ms) | Error Rate % |",
+            "|---|---|---|---|---|---|",
+        ]
+
+        for r in self.run_data["results"]:
+            m = r["metrics"]
+            status = "⛔" if "aborted" in m else "🔴" if m["p99_corrected"] > 2000 or m["error_rate"] > 5.0 else "🟢"
+            if not m.get("valid", True):
+                status += " ⚠️ invalid"
+            lines.append(
+                f"| {r['users']} | {m['rps']:.2f} | {m['avg']:.2f} | {m['p99']:.2f} | {m['p99_corrected']:.2f} | {m['error_rate']:.2f}% {status} |"
+            )
+
+        sweep_rows = sweep_table_md(self.run_data["results"])
+        if sweep_rows:
+            lines.extend(["", "### Payload Size Sweep", *sweep_rows])
+        if self.run_data.get("ab"):
+            lines.extend(["", "### A/B Comparison", *ab_table_md(self.run_data["ab"])])
+        scaling = analyze(self.run_data["results"])
+        if scaling["points"]:
+            lines.extend(["", "### Scalability Model", *scaling_md(scaling)])
+
+        lines.extend([
+            "",
+            "_Corrected latencies account for coordinated omission: open stages measure from the",
+            "intended send time on the arrival schedule, closed stages back-fill the requests a",
+            "stalled user would have sent every P50 interval (HdrHistogram-style)._",
+            "",
+            "_⚠️ invalid: the load generator itself was the bottleneck (CPU, event-loop lag, send",
+            "skew or in-flight cap), so that stage measured the client, not the server._",
+            "",
+            "## 2. Health Recovery",
+            "| After Stage | Status | Latency (ms) |",
+            "|---|---|---|",
+        ])
+        for h in self.run_data["health_checks"]:
+            lines.append(f"| {h['after_stage_users']} | {'UP' if h['healthy'] else 'DOWN'} | {h['latency']:.2f} |")
+
+        lines.extend(["", "## 3. Detailed Stage Logs"])
+        for r in self.run_data["results"]:
+            m = r["metrics"]
+            lines.append(f"### Stage: {describe(r['users'])}")
+            if "aborted" in m:
+                lines.append(f"- **Aborted:** at {m['aborted']['at_s']:.1f}s of {r['duration']}s ({m['aborted']['reason']})")
+            if not m.get("valid", True):
+                lines.append(f"- **⚠️ Invalid (generator-bound):** {'; '.join(m['generator']['reasons'])}")
+            if generator_note(m):
+                lines.append(f"- **Generator:** {generator_note(m)}")
+            if "ab" in m:
+                lines.append(f"- **A/B:** target {m['ab']['target']}, round {m['ab']['round']}")
+            if "payload" in m:
+                p = m["payload"]
+                lines.append(f"- **Payload:** {size_label(p['url_bytes'])} long_url, {p['body_bytes']} B body, "
+                             f"{p['bytes_per_sec'] / 1e6:.2f} MB/s accepted, {p['rejected_rps']:.2f} RPS rejected "
+                             f"({p['rejected_share']:.1f}%)")
+            little = little_check(r["users"], m)
+            if little and little["suspect"]:
+                lines.append(f"- **⚠️ Little's Law:** completions/s × avg latency = {little['implied']:.1f} in flight, "
+                             f"{little['source']} {little['in_flight']:.1f}: {little['reason']}")
+            if "target_rps" in m:
+                lines.append(f"- **Offered Rate:** {m['offered_rps']:.2f} RPS (target {m['target_rps']}, dropped {m['dropped_count']})")
+            lines.append(f"- **Success:** {m['success_count']}")
+            lines.append(f"- **Failures:** {m['error_count']}")
+            lines.append(f"- **TCP Connections Opened:** {m['connections_opened']}")
+            lines.append(f"- **P50 (Median):** {m['p50']:.2f}ms (corrected {m['p50_corrected']:.2f}ms)")
+            lines.append(f"- **P95:** {m['p95']:.2f}ms (corrected {m['p95_corrected']:.2f}ms)")
+            lines.append(f"- **P99:** {m['p99']:.2f}ms (corrected {m['p99_corrected']:.2f}ms)")
+            lines.append(f"- **P99.9 / P99.99:** {m['p999']:.2f}ms / {m['p9999']:.2f}ms "
+                         f"(corrected {m['p999_corrected']:.2f}ms / {m['p9999_corrected']:.2f}ms)")
+            lines.append(f"- **CO Correction:** {m['co_correction'].replace('_', ' ')}")
+            if m["error_log"]:
+                lines.append("- **Errors by Category:** " + ", ".join(f"{k} × {v}" for k, v in m["error_log"].items()))
+                for category, samples in m.get("error_samples", {}).items():
+                    lines.append(f"  - `{category}` e.g. " + "; ".join(f"`{s}`" for s in samples))
+            if m.get("operations"):
+                lines.extend([
+                    "",
+                    "| Operation | Share % | RPS | Avg (ms) | P50 (ms) | P95 (ms) | P99 (ms) | Error Rate % |",
+                    "|---|---|---|---|---|---|---|---|",
+                ])
+                for name, op in m["operations"].items():
+                    lines.append(
+                        f"| {name} | {op['share']:.1f} | {op['rps']:.2f} | {op['avg']:.2f} | {op['p50']:.2f} | "
+                        f"{op['p95']:.2f} | {op['p99']:.2f} | {op['error_rate']:.2f} |"
+                    )
+            endpoint_rows = endpoint_table_md(m)
+            if endpoint_rows:
+                lines.extend(["", *endpoint_rows])
+            if r.get("windows"):
+                lines.extend([
+                    "",
+                    "| t (s) | Target | RPS | P50 (ms) | P99 (ms) | Errors | In Flight |",
+                    "|---|---|---|---|---|---|---|",
+                ])
+                for w in r["windows"]:
+                    target = w.get("target_users", w.get("target_rps"))
+                    lines.append(f"| {w['t']:.1f} | {target:.0f} | {w['rps']:.2f} | {w['p50']:.2f} | {w['p99']:.2f} | "
+                                 f"{w['errors']} | {w['in_flight']} |")
+            if r.get("soak"):
+                soak = r["soak"]
+                lines.extend([
+                    "",
+                    f"**Soak trends** over {soak['elapsed_s'] / 3600:.2f}h in {soak['bucket_s']:g}s buckets "
+                    f"(checkpoint `{soak['checkpoint_file']}`):",
+                    "",
+                    "| Metric | Slope per Hour | Std. Error | Buckets |",
+                    "|---|---|---|---|",
+                ])
+                for metric, trend in soak["trends"].items():
+                    stderr = "n/a" if trend["stderr_per_hour"] is None else f"{trend['stderr_per_hour']:.3f}"
+                    lines.append(f"| {metric} | {trend['per_hour']:+.3f} | {stderr} | {trend['buckets']} |")
+                for alert in soak["alerts"]:
+                    lines.append(f"- **🚨 Drift** at {alert['at_s'] / 60:.1f}min: {alert['message']}")
+                if not soak["alerts"]:
+                    lines.append("- No drift past the configured slopes.")
+            lines.append("")
+
+        with open(filepath, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+        print(f"✅ Markdown report saved to: {filepath}")
+
+    def generate_html_dashboard(self):
+        filepath = os.path.join(RESULTS_DIR, f"dashboard_v5_{self.timestamp}.html")
+
+        labels = [stage_label(r['users'], r['metrics']) for r in self.run_data["results"]]
+        rps_data = [r['metrics']['rps'] for r in self.run_data["results"]]
+        error_data = [r['metrics']['error_rate'] for r in self.run_data["results"]]
+        avg_data = [r['metrics']['avg'] for r in self.run_data["results"]]
+        p95_data = [r['metrics']['p95'] for r in self.run_data["results"]]
+        p99_data = [r['metrics']['p99'] for r in self.run_data["results"]]
+        p95_corrected_data = [r['metrics']['p95_corrected'] for r in self.run_data["results"]]
+        p99_corrected_data = [r['metrics']['p99_corrected'] for r in self.run_data["results"]]
+
+        ts_card, ts_script = render_timeseries_html(read_timeseries(self.timeseries_path))
+        phase_card, phase_script = render_endpoints_html(self.run_data["results"], lambda r: describe(r["users"]))
+
+        generator_rows = "".join([
+            f"<tr><td>{describe(users)}</td><td>{g['cpu'] * 100:.0f}%</td><td>{g['loop_lag_p99_ms']:.1f}ms</td>"
+            f"<td>{g.get('send_skew_p99_ms', 0):.1f}ms</td><td>{g['in_flight_peak']}</td>"
+            f"<td>{'✅' if g['valid'] else '⚠️ ' + '; '.join(g['reasons'])}</td></tr>"
+            for users, g in ((r['users'], r['metrics'].get('generator')) for r in self.run_data["results"])
+            if g is not None
+        ])
+
+        health_rows = "".join([
+            f"<tr><td>{describe(h['after_stage_users'])}</td><td>{'✅ UP' if h['healthy'] else '❌ DOWN'}</td><td>{h['latency']:.2f}ms</td></tr>"
+            for h in self.run_data["health_checks"]
+        ])
+
+        html_content = f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="UTF-8">
+            <title>Load Test Dashboard (asyncio engine) - {self.timestamp}</title>
+            <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
+            <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css" rel="stylesheet">
+            <style>
+                body {{ background: #f8f9fa; padding: 20px; }}
+                .card {{ margin-bottom: 20px; box-shadow: 0 4px 6px rgba(0,0,0,0.1); border: none; }}
+                .card-header {{ font-weight: bold; background: #fff; border-bottom: 1px solid #eee; }}
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <div class="row mb-4">
+                    <div class="col-12">
+                        <h2 class="text-dark">🚀 Load Test Dashboard (asyncio engine)</h2>
+                        <p class="text-muted">Run ID: {self.timestamp} | Target: {self.base_url} | Scenario: {self.run_data['config']['scenario']}</p>
+                    </div>
+                </div>
+
+                <div class="row">
+                    <div class="col-md-6">
+                        <div class="card">
+                            <div class="card-header">Throughput & Error Rate</div>
+                            <div class="card-body"><canvas id="throughputChart"></canvas></div>
+                        </div>
+                    </div>
+                    <div class="col-md-6">
+                        <div class="card">
+                            <div class="card-header">Latency Degradation</div>
+                            <div class="card-body"><canvas id="latencyChart"></canvas></div>
+                        </div>
+                    </div>
+                </div>
+
+                <div class="row">
+                    <div class="col-12">{ts_card}</div>
+                </div>
+
+                <div class="row">
+                    <div class="col-12">{phase_card}</div>
+                </div>
+
+                <div class="row">
+                    <div class="col-md-6">
+                        <div class="card">
+                            <div class="card-header">💓 Health Recovery</div>
+                            <div class="card-body">
+                                <table class="table table-sm">
+                                    <thead><tr><th>After Stage</th><th>Status</th><th>Latency</th></tr></thead>
+                                    <tbody>{health_rows}</tbody>
+                                </table>
+                            </div>
+                        </div>
+                    </div>
+                    <div class="col-md-6">
+                        <div class="card">
+                            <div class="card-header">🩺 Generator Self-Check</div>
+                            <div class="card-body">
+                                <table class="table table-sm">
+                                    <thead><tr><th>Stage</th><th>CPU</th><th>Loop Lag P99</th><th>Send Skew P99</th><th>Peak In Flight</th><th>Verdict</th></tr></thead>
+                                    <tbody>{generator_rows}</tbody>
+                                </table>
+                            </div>
+                        </div>
+                    </div>
+                </div>
+            </div>
+
+            <script>
+                const labels = {json.dumps(labels)};
+
+                new Chart(document.getElementById('throughputChart'), {{
+                    type: 'line',
+                    data: {{
+                        labels: labels,
+                        datasets: [
+                            {{ label: 'Throughput (RPS)', data: {json.dumps(rps_data)}, borderColor: '#2196f3', yAxisID: 'y' }},
+                            {{ label: 'Error Rate (%)', data: {json.dumps(error_data)}, borderColor: '#f44336', yAxisID: 'y1', borderDash: [5, 5] }}
+                        ]
+                    }},
+                    options: {{
+                        scales: {{
+                            y: {{ type: 'linear', display: true, position: 'left', title: {{display: true, text: 'Req/Sec'}} }},
+                            y1: {{ type: 'linear', display: true, position: 'right', title: {{display: true, text: 'Errors %'}}, grid: {{drawOnChartArea: false}} }}
+                        }}
+                    }}
+                }});
+
+                new Chart(document.getElementById('latencyChart'), {{
+                    type: 'line',
+                    data: {{
+                        labels: labels,
+                        datasets: [
+                            {{ label: 'Avg Latency (ms)', data: {json.dumps(avg_data)}, borderColor: '#36a2eb' }},
+                            {{ label: 'P95 Latency (ms)', data: {json.dumps(p95_data)}, borderColor: '#ff9800' }},
+                            {{ label: 'P99 Latency (ms)', data: {json.dumps(p99_data)}, borderColor: '#ff6384' }},
+                            {{ label: 'P95 Corrected (ms)', data: {json.dumps(p95_corrected_data)}, borderColor: '#ff9800', borderDash: [5, 5] }},
+                            {{ label: 'P99 Corrected (ms)', data: {json.dumps(p99_corrected_data)}, borderColor: '#ff6384', borderDash: [5, 5] }}
+                        ]
+                    }},
+                    options: {{
+                        scales: {{ y: {{ title: {{display: true, text: 'Milliseconds'}} }} }}
+                    }}
+                }});
+                {ts_script}
+                {phase_script}
+            </script>
+        </body>
+        </html>
+        """
+        with open(filepath, "w", encoding="utf-8") as f:
+            f.write(html_content)
+        print(f"✅ Dashboard generated: {filepath}")
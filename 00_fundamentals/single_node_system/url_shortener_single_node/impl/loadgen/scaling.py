@@ -0,0 +1,210 @@
+"""
+Scalability models fitted to a run's stages, and Little's-law sanity checks.
+
+Throughput X at concurrency N (closed stages: N virtual users) is fitted to
+
+    Amdahl  X(N) = λN / (1 + σ(N-1))
+    USL     X(N) = λN / (1 + σ(N-1) + κN(N-1))
+
+λ is the throughput of one user, σ the contention (the share of work that
+serializes: a lock, one DB connection), κ the coherency cost (crosstalk that
+grows with pairs of users: cache invalidation, lock handoff). Amdahl only
+saturates, at λ/σ; with κ > 0 the USL peaks at N* = sqrt((1 - σ)/κ) and
+throughput falls beyond it. Which coefficient dominates says what to fix.
+
+For fixed λ both models are linear in σ and κ (λN/X - 1 = σ(N-1) + κN(N-1)),
+so they are fitted by non-negative least squares for σ, κ inside a
+golden-section search for the λ that minimises the error in X itself.
+
+Little's law says the requests in flight equal throughput × latency. A stage
+where completions per second × their average latency (failed requests
+included: they held a slot too) is far from its sampled in-flight count (or
+its user count) has time or requests the measurement did not see, and its
+numbers are suspect.
+"""
+import math
+
+# Stages needed per model: one per parameter, and at least one to spare
+MIN_POINTS = {"amdahl": 3, "usl": 4}
+# Little's-law ratio (rps × latency / in flight) outside 1 ± this is flagged
+LITTLE_TOLERANCE = 0.25
+GOLDEN = (math.sqrt(5) - 1) / 2
+
+
+def usl(n, lam, sigma, kappa=0.0):
+    """Throughput the USL (Amdahl with kappa=0) predicts at concurrency `n`."""
+    return lam * n / (1 + sigma * (n - 1) + kappa * n * (n - 1))
+
+
+def _nonneg_lstsq(rows, coherency):
+    """Least-squares (σ, κ) ≥ 0 for y = σa + κb over rows of (a, b, y)."""
+    saa = sum(a * a for a, _, _ in rows)
+    say = sum(a * y for a, _, y in rows)
+    sigma_only = (max(0.0, say / saa) if saa else 0.0), 0.0
+    if not coherency:
+        return sigma_only
+    sbb = sum(b * b for _, b, _ in rows)
+    sab = sum(a * b for a, b, _ in rows)
+    sby = sum(b * y for _, b, y in rows)
+    det = saa * sbb - sab * sab
+    if det > 0:
+        sigma = (say * sbb - sby * sab) / det
+        kappa = (sby * saa - say * sab) / det
+        if sigma >= 0 and kappa >= 0:
+            return sigma, kappa
+    kappa_only = 0.0, (max(0.0, sby / sbb) if sbb else 0.0)
+    return min((sigma_only, kappa_only), key=lambda sk: sum((y - sk[0] * a - sk[1] * b) ** 2 for a, b, y in rows))
+
+
+def fit_model(points, coherency=True, iterations=100):
+    """
+    Fit [(N, X), ...] to the USL (Amdahl with coherency=False); None with
+    too few distinct N. Returns the coefficients, R² and, for the USL, the
+    predicted peak.
+    """
+    name = "usl" if coherency else "amdahl"
+    if len({n for n, _ in points}) < MIN_POINTS[name] or any(x <= 0 or n < 1 for n, x in points):
+        return None
+
+    def solve(lam):
+        sigma, kappa = _nonneg_lstsq([(n - 1, n * (n - 1), lam * n / x - 1) for n, x in points], coherency)
+        sse = sum((x - usl(n, lam, sigma, kappa)) ** 2 for n, x in points)
+        return sse, sigma, kappa
+
+    # X(N) <= λN whenever σ, κ >= 0, so λ is at least the best per-user throughput seen
+    lo, hi = math.log(max(x / n for n, x in points)), math.log(max(x / n for n, x in points) * 1e4)
+    a, b = hi - GOLDEN * (hi - lo), lo + GOLDEN * (hi - lo)
+    fa, fb = solve(math.exp(a))[0], solve(math.exp(b))[0]
+    for _ in range(iterations):
+        if fa <= fb:
+            hi, b, fb = b, a, fa
+            a = hi - GOLDEN * (hi - lo)
+            fa = solve(math.exp(a))[0]
+        else:
+            lo, a, fa = a, b, fb
+            b = lo + GOLDEN * (hi - lo)
+            fb = solve(math.exp(b))[0]
+    lam = math.exp((lo + hi) / 2)
+    sse, sigma, kappa = solve(lam)
+    mean_x = sum(x for _, x in points) / len(points)
+    sst = sum((x - mean_x) ** 2 for _, x in points)
+    fit = {
+        "lambda": lam,
+        "sigma": sigma,
+        "r2": 1 - sse / sst if sst else None,
+        "points": len(points),
+    }
+    if coherency:
+        fit["kappa"] = kappa
+        if kappa > 0 and sigma < 1:
+            n_star = math.sqrt((1 - sigma) / kappa)
+            fit["peak_users"] = n_star
+            fit["peak_rps"] = usl(n_star, lam, sigma, kappa)
+    if sigma > 1e-6:
+        fit["ceiling_rps"] = lam / sigma
+    return fit
+
+
+def stage_points(results):
+    """
+    (users, throughput) of the closed ramp stages that measured the server:
+    not aborted, not generator-bound, and not A/B or payload-sweep stages,
+    which vary something other than concurrency.
+    """
+    return [
+        (r["users"], r["metrics"]["rps"])
+        for r in results
+        if isinstance(r["users"], int) and r["metrics"]["rps"] > 0 and r["metrics"].get("valid", True)
+        and not {"aborted", "ab", "payload"} & r["metrics"].keys()
+    ]
+
+
+def little_check(users, metrics, tolerance=LITTLE_TOLERANCE):
+    """
+    Little's law for one stage: completions per second × their average latency,
+    failures included, against the in-flight count the generator sampled (or,
+    without samples, a closed stage's users). None when neither is known.
+    """
+    g = metrics.get("generator")
+    if g and g.get("in_flight_avg"):
+        in_flight, source = g["in_flight_avg"], "sampled"
+    elif isinstance(users, int):
+        in_flight, source = users, "users"
+    else:
+        return None
+    if "avg_all" in metrics:
+        implied = metrics["completed_rps"] * metrics["avg_all"] / 1000
+    else:
+        # Results saved before failed requests were timed: successes only
+        implied = metrics["rps"] * metrics["avg"] / 1000
+    ratio = implied / in_flight if in_flight else 0.0
+    check = {"in_flight": in_flight, "source": source, "implied": implied, "ratio": ratio,
+             "suspect": abs(ratio - 1) > tolerance}
+    if ratio < 1 - tolerance:
+        check["reason"] = ("requests were in flight longer than their timed latency: time spent outside "
+                           "the measurement (client queueing, scheduling delay) or a client-side limit")
+    elif ratio > 1 + tolerance:
+        check["reason"] = "more completions than the in-flight count allows: throughput or latency over-counted"
+    return check
+
+
+def analyze(results):
+    """Both fits over `results` (LoadTestReporter-style stage dicts), the Little's-law checks and a reading."""
+    points = stage_points(results)
+    out = {
+        "points": [[n, x] for n, x in points],
+        "amdahl": fit_model(points, coherency=False),
+        "usl": fit_model(points, coherency=True),
+        "little": [],
+    }
+    for r in results:
+        check = little_check(r["users"], r["metrics"])
+        if check is not None:
+            check["stage"] = str(r["users"])
+            out["little"].append(check)
+    out["recommendation"] = recommend(out, max((n for n, _ in points), default=0))
+    return out
+
+
+def recommend(analysis, tested_users):
+    """What the USL coefficients say to do, as one sentence for the report."""
+    u = analysis["usl"]
+    if u is None:
+        return (f"Not enough valid closed-model stages to fit a model (need {MIN_POINTS['usl']} "
+                "user counts that neither aborted nor were generator-bound).")
+    if "peak_users" in u and u["peak_users"] <= tested_users * 2:
+        return (f"Coherency-bound: throughput peaks near {u['peak_users']:.0f} users at {u['peak_rps']:.0f} RPS "
+                f"(κ={u['kappa']:.2e}) and falls beyond it. More concurrency makes it slower; cut crosstalk "
+                "(shared locks, DB row/index contention, cache invalidation) or scale out behind a load balancer.")
+    if u["sigma"] >= 0.01:
+        return (f"Contention-bound: σ={u['sigma']:.3f} serializes {u['sigma'] * 100:.1f}% of the work, capping "
+                f"throughput near {u.get('ceiling_rps', 0):.0f} RPS. Widen the serial resource (connection pool, "
+                "synchronized section, single H2 writer) or scale vertically.")
+    return ("Near-linear scaling over the tested range (σ and κ ~ 0): the server has headroom; "
+            "test higher concurrency.")
+
+
+def scaling_md(analysis):
+    """Markdown lines: the fitted coefficients, the prediction and the suspect stages."""
+    lines = ["| Model | λ (RPS/user) | σ (contention) | κ (coherency) | R² | Peak / Ceiling |", "|---|---|---|---|---|---|"]
+    for name in ("amdahl", "usl"):
+        f = analysis[name]
+        if f is None:
+            lines.append(f"| {name.upper()} | - | - | - | - | not enough stages |")
+            continue
+        if "peak_users" in f:
+            peak = f"{f['peak_rps']:.0f} RPS at {f['peak_users']:.0f} users"
+        elif "ceiling_rps" in f:
+            peak = f"→ {f['ceiling_rps']:.0f} RPS"
+        else:
+            peak = "linear"
+        r2 = f"{f['r2']:.3f}" if f["r2"] is not None else "-"
+        kappa = f"{f['kappa']:.2e}" if "kappa" in f else "-"
+        lines.append(f"| {name.upper()} | {f['lambda']:.2f} | {f['sigma']:.4f} | {kappa} | {r2} | {peak} |")
+    lines.extend(["", f"**Reading:** {analysis['recommendation']}"])
+    suspect = [c for c in analysis["little"] if c["suspect"]]
+    if suspect:
+        lines.extend(["", "Little's-law check failed (completions/s × avg latency vs in flight):"])
+        lines.extend(f"- **{c['stage']}:** {c['implied']:.1f} implied vs {c['in_flight']:.1f} {c['source']} "
+                     f"(×{c['ratio']:.2f}): {c['reason']}" for c in suspect)
+    return lines
@@ -0,0 +1,185 @@
+"""
+Scenarios a virtual user can loop over.
+
+A scenario is a coroutine taking an `HttpClient` and returning:
+    True  -> success, counted with its latency
+    False -> failure, counted as an error
+    None  -> excluded from the stage stats entirely
+or `(operation, result)` to also have the result accounted under that
+operation's name. Network errors may simply propagate; the engine counts them
+as failures (under `exc.operation`, if set).
+"""
+import random
+import string
+
+from .dedup import Duplicates
+from .keys import HotKeys
+from .payloads import PayloadSize
+
+# Short codes kept per process for the read operations of a Mix
+CODE_POOL_SIZE = 10000
+
+
+def generate_random_url():
+    return f"https://example.com/{''.join(random.choices(string.ascii_letters, k=10))}"
+
+
+async def shorten(client):
+    resp = await client.post_json("/shorten", {"long_url": generate_random_url()})
+    return resp.status == 200
+
+
+async def shorten_resolve(client):
+    # Write + Read, timed together like stress_test.py / stress_test_v2.py
+    resp = await client.post_json("/shorten", {"long_url": generate_random_url()})
+    if resp.status != 200:
+        return False
+    short_code = resp.json()["short_url"].split("/")[-1]
+    resp = await client.get(f"/{short_code}")
+    return resp.status == 302
+
+
+async def health(client):
+    resp = await client.get("/health")
+    return resp.status == 200
+
+
+# --- Weighted operation mixes -------------------------------------------------
+
+
+class CodePool:
+    """Bounded set of short codes created so far; reads pick one at random."""
+
+    def __init__(self, size=CODE_POOL_SIZE):
+        self.size = size
+        self.codes = []
+
+    def add(self, code):
+        if len(self.codes) < self.size:
+            self.codes.append(code)
+        else:
+            self.codes[random.randrange(self.size)] = code
+
+    def pick(self):
+        return random.choice(self.codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+
+async def op_shorten(client, codes):
+    resp = await client.post_json("/shorten", {"long_url": generate_random_url()})
+    if resp.status != 200:
+        return False
+    codes.add(resp.json()["short_url"].split("/")[-1])
+    return True
+
+
+async def op_resolve(client, codes):
+    resp = await client.get(f"/{codes.pick()}")
+    return resp.status == 302
+
+
+async def op_stats(client, codes):
+    resp = await client.get(f"/stats/{codes.pick()}")
+    return resp.status == 200
+
+
+async def op_health(client, codes):
+    return await health(client)
+
+
+# One entry per UrlController endpoint; the flag says whether it reads an existing code
+OPERATIONS = {
+    "shorten": (op_shorten, False),
+    "resolve": (op_resolve, True),
+    "stats": (op_stats, True),
+    "health": (op_health, False),
+}
+
+
+class Mix:
+    """
+    Scenario that runs one operation per call, drawn by weight, e.g.
+    Mix({"resolve": 95, "shorten": 5}) for a 95:5 read/write ratio.
+
+    Reads target codes this process has created; until there are any, a read
+    is replaced by a shorten so the ratio settles once the pool is warm.
+    """
+
+    def __init__(self, weights, codes=None):
+        unknown = set(weights) - set(OPERATIONS)
+        if unknown:
+            raise ValueError(f"Unknown operations {sorted(unknown)}, expected some of {sorted(OPERATIONS)}")
+        if not weights or any(w < 0 for w in weights.values()) or sum(weights.values()) <= 0:
+            raise ValueError("Mix weights must be non-negative with a positive total")
+        self.weights = dict(weights)
+        self.codes = codes if codes is not None else CodePool()
+        self._names = list(self.weights)
+        self._cum_weights = []
+        total = 0
+        for name in self._names:
+            total += self.weights[name]
+            self._cum_weights.append(total)
+
+    @classmethod
+    def from_spec(cls, spec):
+        """'resolve=95,shorten=5' -> Mix."""
+        weights = {}
+        for part in spec.split(","):
+            name, _, weight = part.partition("=")
+            weights[name.strip()] = float(weight)
+        return cls(weights)
+
+    def __str__(self):
+        return ",".join(f"{name}={weight:g}" for name, weight in self.weights.items())
+
+    async def __call__(self, client):
+        name = random.choices(self._names, cum_weights=self._cum_weights)[0]
+        operation, needs_code = OPERATIONS[name]
+        if needs_code and not self.codes:
+            name, operation = "shorten", op_shorten
+        try:
+            return name, await operation(client, self.codes)
+        except Exception as e:
+            e.operation = name
+            raise
+
+
+SCENARIOS = {
+    "shorten": shorten,
+    "shorten_resolve": shorten_resolve,
+    "health": health,
+    "read_heavy": Mix({"resolve": 95, "shorten": 5}),
+    "mixed": Mix({"resolve": 80, "stats": 10, "shorten": 8, "health": 2}),
+}
+
+
+# Scenarios built from specs, kept so their state (code pool, seeded corpus)
+# outlives the engine that first asked for them
+_FROM_SPEC = {}
+
+
+def get_scenario(name):
+    """
+    A SCENARIOS name, a mix spec like 'resolve=95,shorten=5', a hot-key
+    spec like 'hot:zipf,keys=100000,skew=1.1' (see keys.py), a duplicate-URL
+    spec like 'dup:ratio=0.3,pool=1000' (see dedup.py) or a URL-size spec like
+    'payload:size=1024' (see payloads.py).
+    """
+    if name in SCENARIOS:
+        return SCENARIOS[name]
+    if name not in _FROM_SPEC:
+        if name.startswith("hot:"):
+            _FROM_SPEC[name] = HotKeys.from_spec(name[len("hot:"):])
+        elif name.startswith("dup:"):
+            _FROM_SPEC[name] = Duplicates.from_spec(name[len("dup:"):])
+        elif name.startswith("payload:"):
+            _FROM_SPEC[name] = PayloadSize.from_spec(name[len("payload:"):])
+        elif "=" in name:
+            _FROM_SPEC[name] = Mix.from_spec(name)
+        else:
+            raise ValueError(f"Unknown scenario {name!r}, expected one of {sorted(SCENARIOS)}, "
+                             "a mix like 'resolve=95,shorten=5', a hot-key spec like 'hot:zipf' "
+                             "or a duplicate-URL spec like 'dup:ratio=0.3'")
+    return _FROM_SPEC[name]
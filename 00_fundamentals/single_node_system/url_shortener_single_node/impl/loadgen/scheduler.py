@@ -0,0 +1,63 @@
+"""
+Open-model (constant arrival rate) scheduling.
+
+A closed loop of N users can only offer as much load as the server lets it
+finish: when responses slow down, so do the requests. An open stage instead
+issues requests on a fixed clock, however many are still in flight, which is
+what real independent clients do.
+
+Stages are written next to the closed ones in STAGES:
+
+    STAGES = [
+        (50, 10),               # 50 virtual users for 10s (closed)
+        (Rate(2000), 30),       # 2000 req/s, Poisson arrivals, for 30s (open)
+        (Rate(2000, "uniform"), 30),
+    ]
+"""
+import random
+from collections import namedtuple
+
+ARRIVALS = ("poisson", "uniform")
+
+
+class Rate(namedtuple("Rate", "rps arrival")):
+    __slots__ = ()
+
+    def __new__(cls, rps, arrival="poisson"):
+        if rps <= 0:
+            raise ValueError(f"Rate must be positive, got {rps}")
+        if arrival not in ARRIVALS:
+            raise ValueError(f"Unknown arrival process {arrival!r}, expected one of {ARRIVALS}")
+        return super().__new__(cls, rps, arrival)
+
+    def __str__(self):
+        return f"{self.rps} rps"
+
+
+def describe(load):
+    if isinstance(load, Rate):
+        return f"{load.rps} RPS ({load.arrival} arrivals)"
+    if isinstance(load, int):
+        return f"{load} Concurrent Users"
+    if str(load).startswith("replay:"):
+        # A trace.Replay, or its label as saved in a result file
+        return f"Replay of {str(load)[len('replay:'):]}"
+    # A profiles.Profile, or its spec as saved in a result file
+    return f"Profile {load}"
+
+
+def arrival_offsets(rate, duration, phase=0.0, rng=random):
+    """
+    Intended send times, in seconds from stage start, up to `duration`.
+
+    `phase` shifts a uniform schedule so that N generators at rps/N, each with
+    phase i/rps, interleave into one even stream. Poisson streams need no
+    phase: the superposition of Poisson processes is itself Poisson.
+    """
+    mean_gap = 1.0 / rate.rps
+    t = phase if rate.arrival == "uniform" else 0.0
+    while True:
+        t += rng.expovariate(rate.rps) if rate.arrival == "poisson" else mean_gap
+        if t >= duration:
+            return
+        yield t
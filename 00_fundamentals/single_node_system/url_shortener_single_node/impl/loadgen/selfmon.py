@@ -0,0 +1,121 @@
+"""
+Load-generator self-monitoring.
+
+A saturated generator looks exactly like a saturated server: throughput
+plateaus and latencies grow, because requests wait on our own event loop
+rather than on the network. While a stage runs, GeneratorMonitor samples
+
+    cpu         process CPU time per wall second (1.0 = one core busy)
+    loop lag    how late a periodic timer wakes up: time every ready callback
+                had to wait for the loop
+    in flight   outstanding requests, sampled with the lag probe
+    send skew   actual minus intended send time of open-model requests
+
+and `summary()` judges whether the stage measured the server or the client.
+Stages judged client-bound are marked invalid in every report.
+"""
+import asyncio
+import time
+
+from .histogram import LatencyHistogram
+
+PROBE_INTERVAL = 0.05
+# Verdict thresholds: beyond these the generator, not the server, is the bottleneck
+MAX_CPU = 0.9
+MAX_LOOP_LAG_MS = 50.0
+MAX_SEND_SKEW_MS = 20.0
+
+
+class GeneratorMonitor:
+    def __init__(self, in_flight=lambda: 0):
+        self._in_flight = in_flight
+        self.loop_lag = LatencyHistogram()
+        self.send_skew = LatencyHistogram()
+        self.cpu_peak = 0.0
+        self.in_flight_peak = 0
+        self._in_flight_sum = 0
+        self._samples = 0
+        self._task = None
+        self._wall0 = self._cpu0 = 0.0
+
+    def start(self):
+        self._wall0, self._cpu0 = time.perf_counter(), time.process_time()
+        self._task = asyncio.get_running_loop().create_task(self._probe())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        self._wall1, self._cpu1 = time.perf_counter(), time.process_time()
+
+    def record_skew(self, skew_s):
+        self.send_skew.record(skew_s * 1_000_000)
+
+    async def _probe(self):
+        loop = asyncio.get_running_loop()
+        wall, cpu = time.perf_counter(), time.process_time()
+        while True:
+            t = loop.time()
+            await asyncio.sleep(PROBE_INTERVAL)
+            self.loop_lag.record((loop.time() - t - PROBE_INTERVAL) * 1_000_000)
+            in_flight = self._in_flight()
+            self.in_flight_peak = max(self.in_flight_peak, in_flight)
+            self._in_flight_sum += in_flight
+            self._samples += 1
+            now = time.perf_counter()
+            if now - wall >= 1.0:
+                # Per-second CPU, for the peak
+                self.cpu_peak = max(self.cpu_peak, (time.process_time() - cpu) / (now - wall))
+                wall, cpu = now, time.process_time()
+
+    def summary(self, dropped=0):
+        """Samples plus the verdict, as stored in StageStats.generator."""
+        wall = self._wall1 - self._wall0
+        cpu = (self._cpu1 - self._cpu0) / wall if wall > 0 else 0.0
+        out = {
+            "cpu": round(cpu, 3),
+            "cpu_peak": round(max(self.cpu_peak, cpu), 3),
+            "loop_lag_p99_ms": self.loop_lag.value_at_percentile(99) / 1000,
+            "loop_lag_max_ms": self.loop_lag.max_us / 1000,
+            "in_flight_avg": round(self._in_flight_sum / self._samples, 1) if self._samples else 0,
+            "in_flight_peak": self.in_flight_peak,
+            "dropped": dropped,
+        }
+        if self.send_skew.total:
+            out["send_skew_p99_ms"] = self.send_skew.value_at_percentile(99) / 1000
+            out["send_skew_max_ms"] = self.send_skew.max_us / 1000
+        out["reasons"] = judge(out)
+        out["valid"] = not out["reasons"]
+        return out
+
+
+def judge(summary):
+    """Why a stage's numbers describe the generator rather than the server."""
+    reasons = []
+    if summary["cpu"] > MAX_CPU:
+        reasons.append(f"generator CPU {summary['cpu'] * 100:.0f}% of a core")
+    if summary["loop_lag_p99_ms"] > MAX_LOOP_LAG_MS:
+        reasons.append(f"event-loop lag P99 {summary['loop_lag_p99_ms']:.0f}ms")
+    if summary.get("send_skew_p99_ms", 0) > MAX_SEND_SKEW_MS:
+        reasons.append(f"send skew P99 {summary['send_skew_p99_ms']:.0f}ms behind schedule")
+    if summary["dropped"]:
+        reasons.append(f"{summary['dropped']} arrivals dropped at the in-flight cap")
+    return reasons
+
+
+def merge_summaries(a, b):
+    """Combine two processes' summaries: worst of each sample, backlog summed, verdict redone."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    merged = {}
+    for key in set(a) | set(b):
+        if key in ("reasons", "valid"):
+            continue
+        if key in ("in_flight_avg", "in_flight_peak", "dropped"):
+            merged[key] = a.get(key, 0) + b.get(key, 0)
+        else:
+            merged[key] = max(a.get(key, 0), b.get(key, 0))
+    merged["reasons"] = judge(merged)
+    merged["valid"] = not merged["reasons"]
+    return merged
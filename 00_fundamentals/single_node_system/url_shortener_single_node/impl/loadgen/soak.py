@@ -0,0 +1,214 @@
+"""
+Soak mode: hours-long runs with constant memory, drift alerts and checkpoints.
+
+Leaks (an in-memory H2 table that only grows, a cache without eviction) show
+up as a slow drift, not a failure: P99 creeps up and errors start trickling
+in after hours. A SoakMonitor takes the engine's per-interval windows in
+place of a TimeSeriesWriter and
+
+    - folds them into fixed-size histograms: the whole run so far, and a
+      rolling one over the last few buckets (memory does not grow with time)
+    - closes a summary row every `bucket` seconds (a bounded deque of those
+      is all the history it keeps; the JSONL time series has the rest)
+    - fits a least-squares trend to P99, error rate and throughput over the
+      buckets after warm-up, and alerts when P99 or error rate rises faster
+      than the configured slope per hour (and the rise is more than noise)
+    - checkpoints everything to a JSON file every `checkpoint_every`
+      seconds, written atomically, so a crash six hours in keeps six hours
+
+    python -m loadgen --soak --profile users:soak,level=200,for=21600
+"""
+import json
+import math
+import os
+import time
+from collections import deque
+
+from .engine import StageStats
+from .histogram import SIGNIFICANT_DIGITS
+
+BUCKET_SECONDS = 60
+# Summary rows kept: a week of minute buckets
+MAX_BUCKETS = 10_080
+# Buckets in the rolling "recent" histogram
+ROLLING_BUCKETS = 5
+CHECKPOINT_EVERY = 300
+# Drift alert thresholds, per hour of run time
+MAX_P99_SLOPE_MS = 10.0
+MAX_ERROR_SLOPE = 1.0       # percentage points
+# Trends need this many buckets after warm-up, and a slope this many standard errors from zero
+MIN_TREND_BUCKETS = 5
+MIN_T_STAT = 3.0
+# Buckets excluded from trends while caches, JIT and pools warm up
+WARMUP_BUCKETS = 1
+
+
+def fit_trend(points):
+    """Least-squares line through (x, y) points: slope, its standard error and n."""
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    sxx = sum((x - mean_x) ** 2 for x, _ in points)
+    if n < 3 or sxx == 0:
+        return {"slope": 0.0, "stderr": math.inf, "n": n}
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / sxx
+    intercept = mean_y - slope * mean_x
+    residual = sum((y - intercept - slope * x) ** 2 for x, y in points)
+    return {"slope": slope, "stderr": math.sqrt(residual / (n - 2) / sxx), "n": n}
+
+
+class SoakMonitor:
+    """Stands in for a TimeSeriesWriter during a soak; `tee` still gets every interval."""
+
+    def __init__(self, checkpoint_path, interval=1.0, tee=None, profile=None, bucket=BUCKET_SECONDS,
+                 checkpoint_every=CHECKPOINT_EVERY, max_p99_slope=MAX_P99_SLOPE_MS,
+                 max_error_slope=MAX_ERROR_SLOPE, significant_digits=SIGNIFICANT_DIGITS):
+        self.checkpoint_path = checkpoint_path
+        self.interval = interval
+        self.tee = tee
+        self.profile = profile
+        self.bucket = bucket
+        self.checkpoint_every = checkpoint_every
+        self.max_slope = {"p99": max_p99_slope, "error_rate": max_error_slope}
+        self.significant_digits = significant_digits
+        self.total = StageStats(significant_digits)
+        self.buckets = deque(maxlen=MAX_BUCKETS)
+        self.trends = {}
+        self.alerts = []
+        self.elapsed = 0.0
+        self._recent = deque(maxlen=ROLLING_BUCKETS)
+        self._current = StageStats(significant_digits)
+        self._current_length = 0.0
+        self._drifting = set()
+        self._last_checkpoint = 0.0
+        self._label = None
+
+    # --- TimeSeriesWriter interface -------------------------------------------
+
+    def begin_stage(self, label):
+        self._label = label
+        if self.tee is not None:
+            self.tee.begin_stage(label)
+
+    def write(self, window, in_flight, length):
+        if self.tee is not None:
+            self.tee.write(window, in_flight, length)
+        self.elapsed += length
+        self.total.merge(window)
+        self._current.merge(window)
+        self._current_length += length
+        if self._current_length >= self.bucket:
+            self._close_bucket(in_flight)
+        if self.elapsed - self._last_checkpoint >= self.checkpoint_every:
+            self.checkpoint()
+
+    def close(self):
+        pass
+
+    # --- Buckets and trends ---------------------------------------------------
+
+    def _close_bucket(self, in_flight):
+        stats, length = self._current, self._current_length
+        self._current, self._current_length = StageStats(self.significant_digits), 0.0
+        self._recent.append(stats)
+        total = stats.success + stats.errors
+        row = {
+            "t": round(self.elapsed, 3),
+            "rps": stats.success / length,
+            "errors": stats.errors,
+            "error_rate": (stats.errors / total) * 100 if total else 0,
+            "in_flight": in_flight,
+        }
+        if self.profile is not None:
+            row[f"target_{self.profile.kind}"] = self.profile.total_level(max(0.0, self.elapsed - length / 2))
+        row.update(stats.latencies.summary_ms())
+        self.buckets.append(row)
+        print(f"  [soak {self.elapsed / 60:7.1f}min] RPS: {row['rps']:.2f} | P99: {row['p99']:.2f}ms "
+              f"(last {len(self._recent)} buckets {self.recent_p99():.2f}ms) | Errors: {row['error_rate']:.2f}%")
+        self._update_trends()
+
+    def recent_p99(self):
+        merged = StageStats(self.significant_digits)
+        for stats in self._recent:
+            merged.latencies.merge(stats.latencies)
+        return merged.latencies.value_at_percentile(99) / 1000
+
+    def _update_trends(self):
+        rows = list(self.buckets)[WARMUP_BUCKETS:]
+        if len(rows) < MIN_TREND_BUCKETS:
+            return
+        for metric in ("p99", "error_rate", "rps"):
+            fit = fit_trend([(r["t"] / 3600, r[metric]) for r in rows])
+            t_stat = fit["slope"] / fit["stderr"] if fit["stderr"] > 0 else math.inf
+            self.trends[metric] = {
+                "per_hour": fit["slope"],
+                "stderr_per_hour": fit["stderr"] if math.isfinite(fit["stderr"]) else None,
+                "buckets": fit["n"],
+            }
+            limit = self.max_slope.get(metric)
+            if limit is None:
+                continue
+            drifting = fit["slope"] > limit and t_stat > MIN_T_STAT
+            if drifting and metric not in self._drifting:
+                unit = "ms" if metric == "p99" else "pp"
+                alert = {
+                    "at_s": round(self.elapsed, 1),
+                    "metric": metric,
+                    "per_hour": fit["slope"],
+                    "message": f"{metric} rising {fit['slope']:.2f}{unit}/h (limit {limit:g}{unit}/h)",
+                }
+                self.alerts.append(alert)
+                print(f"  🚨 Drift at {self.elapsed / 60:.1f}min: {alert['message']}")
+            if drifting:
+                self._drifting.add(metric)
+            else:
+                self._drifting.discard(metric)
+
+    # --- Results ----------------------------------------------------------------
+
+    def summary(self):
+        return {
+            "bucket_s": self.bucket,
+            "elapsed_s": round(self.elapsed, 3),
+            "trends": self.trends,
+            "alerts": self.alerts,
+            "recent_p99": self.recent_p99(),
+            "checkpoint_file": os.path.basename(self.checkpoint_path),
+        }
+
+    def metrics(self):
+        """Whole-run metrics so far, as `run_stage` would have returned them."""
+        return self.total.metrics(max(self.elapsed, 1e-3))
+
+    def checkpoint(self):
+        """Write the run so far; the file is replaced atomically, never left half-written."""
+        data = {
+            "updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "stage": self._label,
+            "soak": self.summary(),
+            "buckets": list(self.buckets),
+            # Full histograms, so the final numbers can be rebuilt from the checkpoint alone
+            "stats": self.total.to_dict(),
+        }
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.checkpoint_path)
+        self._last_checkpoint = self.elapsed
+
+    def finish(self, in_flight=0):
+        """Close the last, partial bucket and write a final checkpoint."""
+        if self._current_length >= self.bucket / 4:
+            self._close_bucket(in_flight)
+        self.checkpoint()
+
+
+def run_soak(engine, load, duration, monitor):
+    """Run one long stage of `engine` through `monitor`; returns its metrics."""
+    tee = engine.timeseries
+    engine.timeseries = monitor
+    try:
+        return engine.run_stage(load, duration)
+    finally:
+        engine.timeseries = tee
+        monitor.finish()
@@ -0,0 +1,161 @@
+"""
+Per-interval time series, streamed to a JSONL file while the run is going.
+
+A stage summary hides warm-up, GC stalls and mid-stage collapse. The engine
+keeps a second StageStats for the current interval (1s by default), hands it to
+a TimeSeriesWriter when the interval closes and starts a fresh one. Each line
+is one interval: throughput, percentiles, errors by type and in-flight count.
+"""
+import json
+import time
+
+INTERVAL = 1.0
+
+
+def interval_row(window, in_flight, length):
+    """One JSONL row from an interval's StageStats."""
+    row = {
+        "interval_s": round(length, 3),
+        "rps": window.success / length if length > 0 else 0,
+        "success": window.success,
+        "errors": window.errors,
+        "error_log": dict(window.error_log),
+        "in_flight": in_flight,
+    }
+    row.update(window.latencies.summary_ms())
+    if window.target_rps is not None:
+        row["offered_rps"] = window.issued / length if length > 0 else 0
+        row["dropped"] = window.dropped
+        row["p99_corrected"] = window.corrected.value_at_percentile(99) / 1000
+    if window.operations:
+        row["operations_rps"] = {
+            name: op.success / length if length > 0 else 0 for name, op in window.operations.items()
+        }
+    return row
+
+
+class TimeSeriesWriter:
+    def __init__(self, path, interval=INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.started = time.time()
+        self.stage = None
+        self._file = open(path, "a", encoding="utf-8")
+
+    def begin_stage(self, label):
+        self.stage = label
+
+    def write(self, window, in_flight, length):
+        self.write_row(interval_row(window, in_flight, length))
+
+    def write_row(self, row, window=None):
+        """
+        Write one interval row, stamped with this run's clock and the current
+        stage. `window`, the interval's StageStats, is for writers standing in
+        for this one that want more than the row.
+        """
+        line = {"t": round(time.time() - self.started, 3), "stage": self.stage}
+        line.update((k, v) for k, v in row.items() if k != "t")
+        # Flushed per line so a crashed or interrupted run keeps what it measured
+        self._file.write(json.dumps(line) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def read_timeseries(path):
+    rows = []
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    rows.append(json.loads(line))
+    except FileNotFoundError:
+        pass
+    return rows
+
+
+def render_timeseries_html(rows):
+    """(card_html, chart_script) plotting a run's time series with Chart.js."""
+    def points(key, digits=2):
+        return json.dumps([{"x": r["t"], "y": round(r[key], digits)} for r in rows])
+
+    latency_datasets = ",\n".join(
+        f"{{ label: '{label} (ms)', data: {points(key, 3)}, borderColor: '{color}', pointRadius: 0 }}"
+        for key, label, color in (
+            ("p50", "P50", "#36a2eb"),
+            ("p95", "P95", "#ff9800"),
+            ("p99", "P99", "#ff6384"),
+            ("p999", "P99.9", "#9966ff"),
+        )
+    )
+    # Load profiles record what they were asking for: arrival rate or users
+    target_dataset = ""
+    for key, label, axis in (("target_rps", "Target RPS", "y"), ("target_users", "Target Users", "y1")):
+        target_rows = [r for r in rows if key in r]
+        if target_rows:
+            target_dataset += (
+                f"\n                            {{ label: '{label}', "
+                f"data: {json.dumps([{'x': r['t'], 'y': r[key]} for r in target_rows])}, borderColor: '#00897b', "
+                f"borderDash: [2, 2], pointRadius: 0, stepped: true, yAxisID: '{axis}' }},"
+            )
+    # Stage start times, so tooltips can name the stage a point belongs to
+    boundaries = [
+        {"t": r["t"], "stage": str(r["stage"])}
+        for i, r in enumerate(rows) if i == 0 or rows[i - 1]["stage"] != r["stage"]
+    ]
+
+    card = """
+                <div class="card">
+                    <div class="card-header">⏱️ Time Series (per interval)</div>
+                    <div class="card-body">
+                        <canvas id="tsThroughputChart"></canvas>
+                        <canvas id="tsLatencyChart"></canvas>
+                    </div>
+                </div>
+    """
+    script = f"""
+                const tsStages = {json.dumps(boundaries)};
+                const tsTitle = (items) => {{
+                    const x = items[0].parsed.x;
+                    const s = tsStages.filter(b => b.t <= x).pop();
+                    return `t=${{x}}s` + (s ? ` | stage ${{s.stage}}` : '');
+                }};
+                new Chart(document.getElementById('tsThroughputChart'), {{
+                    type: 'line',
+                    data: {{
+                        datasets: [
+                            {{ label: 'Throughput (RPS)', data: {points("rps")}, borderColor: '#2196f3', pointRadius: 0, yAxisID: 'y' }},{target_dataset}
+                            {{ label: 'Errors', data: {points("errors")}, borderColor: '#f44336', pointRadius: 0, yAxisID: 'y1' }},
+                            {{ label: 'In Flight', data: {points("in_flight")}, borderColor: '#607d8b', pointRadius: 0, borderDash: [5, 5], yAxisID: 'y1' }}
+                        ]
+                    }},
+                    options: {{
+                        interaction: {{ mode: 'index', intersect: false }},
+                        plugins: {{ tooltip: {{ callbacks: {{ title: tsTitle }} }} }},
+                        scales: {{
+                            x: {{ type: 'linear', title: {{display: true, text: 'Seconds since start'}} }},
+                            y: {{ position: 'left', title: {{display: true, text: 'Req/Sec'}} }},
+                            y1: {{ position: 'right', title: {{display: true, text: 'Count'}}, grid: {{drawOnChartArea: false}} }}
+                        }}
+                    }}
+                }});
+                new Chart(document.getElementById('tsLatencyChart'), {{
+                    type: 'line',
+                    data: {{
+                        datasets: [
+                            {latency_datasets}
+                        ]
+                    }},
+                    options: {{
+                        interaction: {{ mode: 'index', intersect: false }},
+                        plugins: {{ tooltip: {{ callbacks: {{ title: tsTitle }} }} }},
+                        scales: {{
+                            x: {{ type: 'linear', title: {{display: true, text: 'Seconds since start'}} }},
+                            y: {{ title: {{display: true, text: 'Milliseconds'}} }}
+                        }}
+                    }}
+                }});
+    """
+    return card, script
@@ -0,0 +1,303 @@
+"""
+Request traces: compact binary capture of every request a run issues, and
+time-accurate replay of a trace against a server.
+
+Synthetic scenarios send requests on a smooth clock with random URLs; real
+traffic comes in bursts, repeats itself and mixes endpoints in a way no
+weight table reproduces. A TraceWriter set as `engine.trace` records each
+HTTP request as it completes; a Replay sends a recorded trace (or one
+converted from an access log) again, each request at its original offset
+divided by `speed`, or back to back with `speed=0`.
+
+The file is a header, then a stream of tagged records, so a run that dies
+halfway still leaves a readable trace:
+
+    header  magic(8) started(f64, epoch seconds at offset 0)
+    "O"     name_len(u8) name                                   -> next operation id
+    "P"     method_len(u8) path_len(u16) body_len(u32, ~0 = none) method path body -> next payload id
+    "R"     offset_us(u64) payload(u32) operation(u16) status(u16, 0 = no answer) latency_us(u32)
+
+A request costs 21 bytes, plus its payload the first time it is seen (reads
+of a hot short code are stored once). Offsets are intended send times: the
+arrival schedule's in an open stage, the actual send otherwise. Forked
+workers write `<path>.<pid>` parts beside the trace, which the reader
+merges. Records go out in completion order, so `read_trace` loads a trace
+whole and sorts it by offset.
+
+    python -m loadgen --record-trace
+    python -m loadgen --replay trace.bin --replay-speed 2
+    python -m loadgen --convert-log access.log trace.bin
+"""
+import functools
+import glob
+import json
+import os
+import re
+import struct
+from collections import namedtuple
+from datetime import datetime
+from time import monotonic, time
+
+from .endpoints import endpoint_name
+
+MAGIC = b"LGTRACE1"
+HEADER = struct.Struct("<8sd")
+OPERATION = struct.Struct("<cB")
+PAYLOAD = struct.Struct("<cBHI")
+REQUEST = struct.Struct("<cQIHHI")
+NO_BODY = 0xFFFFFFFF
+# Distinct payloads a writer remembers; past this, repeats are stored again
+MAX_PAYLOAD_MEMO = 100_000
+# Requests a replay at speed 0 keeps in flight
+REPLAY_CONCURRENCY = 256
+
+TraceEntry = namedtuple("TraceEntry", "offset method path body operation status latency_ms")
+
+
+class TraceWriter:
+    """Appends requests to a trace file (see the module docstring for the layout)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.started = time()
+        self._t0 = monotonic()
+        self._open(path)
+
+    def _open(self, path):
+        self._pid = os.getpid()
+        self._file = open(path, "wb")
+        self._file.write(HEADER.pack(MAGIC, self.started))
+        self._payloads = {}
+        self._operations = {}
+        self._next_payload = 0
+        self.requests = 0
+
+    def _payload(self, method, path, body):
+        key = (method, path, body)
+        index = self._payloads.get(key)
+        if index is None:
+            if len(self._payloads) >= MAX_PAYLOAD_MEMO:
+                self._payloads.clear()
+            m, p = method.encode(), path.encode()
+            self._file.write(PAYLOAD.pack(b"P", len(m), len(p), NO_BODY if body is None else len(body)) + m + p
+                             + (body or b""))
+            index = self._payloads[key] = self._next_payload
+            self._next_payload += 1
+        return index
+
+    def _operation(self, name):
+        index = self._operations.get(name)
+        if index is None:
+            raw = name.encode()
+            self._file.write(OPERATION.pack(b"O", len(raw)) + raw)
+            index = self._operations[name] = len(self._operations)
+        return index
+
+    def record(self, method, path, body, status, timing):
+        """One finished request: its http.Timing, and `status` None if it got no answer."""
+        if self._pid != os.getpid():
+            # A forked worker: its records go to a part file, never into the parent's.
+            # The inherited file object must not flush (its buffer is the parent's), so
+            # its fd is closed under it and the object kept alive: a child leaves with
+            # os._exit, which never finalizes it.
+            os.close(self._file.fileno())
+            self._inherited = self._file
+            self._open(f"{self.path}.{os.getpid()}")
+        self.write(max(0.0, timing.intended - self._t0), method, path, body, endpoint_name(method, path),
+                   status, (timing.done - timing.start) * 1000)
+
+    def write(self, offset, method, path, body, operation, status, latency_ms):
+        """One request at `offset` seconds into the trace."""
+        payload = self._payload(method, path, body)
+        self._file.write(REQUEST.pack(b"R", int(offset * 1_000_000), payload, self._operation(operation),
+                                      status or 0, min(int(latency_ms * 1000), NO_BODY)))
+        self.requests += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def _read_file(path):
+    """(started, [TraceEntry, ...]) of one trace file, in file order; a truncated tail is ignored."""
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, started = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a request trace (bad magic)")
+    payloads, operations, entries = [], [], []
+    pos, end = HEADER.size, len(data)
+    try:
+        while pos < end:
+            tag = data[pos:pos + 1]
+            if tag == b"R":
+                _, offset, payload, op, status, latency = REQUEST.unpack_from(data, pos)
+                pos += REQUEST.size
+                method, p, body = payloads[payload]
+                entries.append(TraceEntry(offset / 1_000_000, method, p, body, operations[op], status, latency / 1000))
+            elif tag == b"P":
+                _, m_len, p_len, b_len = PAYLOAD.unpack_from(data, pos)
+                pos += PAYLOAD.size
+                method = data[pos:pos + m_len].decode()
+                p = data[pos + m_len:pos + m_len + p_len].decode()
+                pos += m_len + p_len
+                body = None
+                if b_len != NO_BODY:
+                    body, pos = data[pos:pos + b_len], pos + b_len
+                if pos > end:
+                    break
+                payloads.append((method, p, body))
+            elif tag == b"O":
+                _, n = OPERATION.unpack_from(data, pos)
+                operations.append(data[pos + OPERATION.size:pos + OPERATION.size + n].decode())
+                pos += OPERATION.size + n
+            else:
+                raise ValueError(f"{path}: unknown record {tag!r} at byte {pos}")
+    except struct.error:
+        pass   # cut off mid-record
+    return started, entries
+
+
+def read_trace(path):
+    """Every request of the trace at `path` and its worker parts, sorted by offset."""
+    started, entries = _read_file(path)
+    for part in sorted(glob.glob(glob.escape(path) + ".*")):
+        if part.rsplit(".", 1)[1].isdigit():
+            entries.extend(_read_file(part)[1])
+    entries.sort(key=lambda e: e.offset)
+    return started, entries
+
+
+# --- Access logs ---------------------------------------------------------------
+
+# Common/combined log format, optionally followed by a response time:
+# seconds with a decimal point (nginx $request_time) or whole ms (Tomcat %D)
+ACCESS_LOG = re.compile(
+    r'^\S+ \S+ \S+ \[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<path>\S+)[^"]*" (?P<status>\d{3}) \S+'
+    r'(?: "[^"]*" "[^"]*")?(?: (?P<latency>[\d.]+))?\s*$'
+)
+
+
+def convert_access_log(log_path, trace_path):
+    """
+    Write the requests of an access log as a trace; returns (requests, skipped lines).
+
+    Log timestamps only have whole seconds, so the requests of one second
+    are spread evenly across it. A log has no request bodies: each
+    POST /shorten gets a new URL of its own, so replayed writes take the
+    insert path as the originals (mostly) did.
+    """
+    writer = TraceWriter(trace_path)
+    skipped = 0
+    first = None
+    second, batch = None, []
+
+    def flush_second():
+        for k, (method, path, status, latency_ms, index) in enumerate(batch):
+            body = json.dumps({"long_url": f"https://example.com/replay/{index}"}).encode() \
+                if method == "POST" and path == "/shorten" else None
+            writer.write(second - first + (k + 0.5) / len(batch), method, path, body,
+                         endpoint_name(method, path), status, latency_ms)
+
+    try:
+        with open(log_path, encoding="utf-8", errors="replace") as f:
+            for index, line in enumerate(f):
+                match = ACCESS_LOG.match(line)
+                if match is None:
+                    skipped += 1
+                    continue
+                try:
+                    at = datetime.strptime(match["time"], "%d/%b/%Y:%H:%M:%S %z").timestamp()
+                except ValueError:
+                    skipped += 1
+                    continue
+                latency = match["latency"]
+                latency_ms = 0.0 if latency is None else float(latency) * (1000 if "." in latency else 1)
+                if at != second:
+                    if batch:
+                        flush_second()
+                    second, batch = at, []
+                    if first is None:
+                        first = at
+                batch.append((match["method"], match["path"], int(match["status"]), latency_ms, index))
+        if batch:
+            flush_second()
+    finally:
+        writer.close()
+    if first is not None:
+        # The header was written before the log's first timestamp was known
+        with open(trace_path, "r+b") as f:
+            f.write(HEADER.pack(MAGIC, first))
+    return writer.requests, skipped
+
+
+# --- Replay --------------------------------------------------------------------
+
+
+class Replay:
+    """
+    A trace as an open-model load: each entry goes out at its offset (from the
+    trace's first request) divided by `speed`. `speed=0` ignores the offsets
+    and sends entries in order as fast as the engine's in-flight cap allows.
+
+    A replayed request succeeds when its status is in the same class (2xx,
+    3xx, ...) as the recorded one, so reads of short codes the target does
+    not have count as errors; replay against the data the trace was taken on.
+    """
+
+    def __init__(self, entries, speed=1.0, name="trace", shares=()):
+        if speed < 0:
+            raise ValueError(f"Replay speed must be >= 0, got {speed}")
+        self.entries = entries
+        self.speed = speed
+        self.name = name
+        self.shares = shares
+        self._start = entries[0].offset if entries else 0.0
+
+    @classmethod
+    def load(cls, path, speed=1.0):
+        return cls(read_trace(path)[1], speed, os.path.basename(path))
+
+    def __str__(self):
+        return f"replay:{self.name}," + ("asap" if self.speed == 0 else f"{self.speed:g}x")
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def duration(self):
+        """Seconds the replay takes on schedule; None at speed 0."""
+        if self.speed == 0:
+            return None
+        return (self.entries[-1].offset - self._start) / self.speed if self.entries else 0.0
+
+    @property
+    def rps(self):
+        duration = self.duration
+        return len(self.entries) / duration if duration else None
+
+    def share(self, index, of):
+        """Every `of`-th entry from `index`: `of` workers together send the whole trace on its own schedule."""
+        share = Replay(self.entries[index::of], self.speed, self.name, self.shares + ((index, of),))
+        share._start = self._start
+        return share
+
+    def arrivals(self, duration=None):
+        """(offset, scenario) per entry, up to `duration`; offset None at speed 0."""
+        for entry in self.entries:
+            offset = None if self.speed == 0 else (entry.offset - self._start) / self.speed
+            if duration is not None and offset is not None and offset > duration:
+                return
+            yield offset, functools.partial(send_entry, entry)
+
+
+async def send_entry(entry, client):
+    try:
+        resp = await client.request(entry.method, entry.path, entry.body)
+    except Exception as e:
+        e.operation = entry.operation
+        raise
+    ok = resp.status // 100 == entry.status // 100 if entry.status else resp.status < 500
+    return entry.operation, ok
@@ -0,0 +1,78 @@
+"""
+In-stage watchdog: cut a stage short once the target is clearly broken.
+
+A stage otherwise runs its full duration even after the server stopped
+answering, piling up timeouts on both sides. Every interval the engine hands
+the watchdog the interval's StageStats; it keeps the last `intervals` of them
+and aborts the stage when, over that rolling window,
+
+    - the error rate exceeds `max_error_rate`,
+    - the share of requests that timed out exceeds `max_timeout_rate`,
+    - P99 exceeds `max_p99_ms` (off by default), or
+    - nothing completed at all while requests were in flight (a stall).
+"""
+from collections import deque
+
+from .errors import TIMEOUT_CATEGORIES
+from .histogram import LatencyHistogram
+
+WINDOW_INTERVALS = 3
+# Fewer results than this in the rolling window is too little to judge by
+MIN_RESULTS = 20
+
+
+class Watchdog:
+    def __init__(self, max_error_rate=0.5, max_timeout_rate=0.25, max_p99_ms=None,
+                 intervals=WINDOW_INTERVALS, min_results=MIN_RESULTS):
+        self.max_error_rate = max_error_rate
+        self.max_timeout_rate = max_timeout_rate
+        self.max_p99_ms = max_p99_ms
+        self.intervals = intervals
+        self.min_results = min_results
+        self._recent = deque(maxlen=intervals)
+
+    def settings(self):
+        """Constructor arguments, e.g. to ship to a load agent."""
+        return {
+            "max_error_rate": self.max_error_rate,
+            "max_timeout_rate": self.max_timeout_rate,
+            "max_p99_ms": self.max_p99_ms,
+            "intervals": self.intervals,
+            "min_results": self.min_results,
+        }
+
+    def reset(self):
+        self._recent.clear()
+
+    def check(self, window, in_flight):
+        """Abort reason for the rolling window ending with `window`, or None."""
+        self._recent.append(window)
+        if len(self._recent) < self.intervals:
+            return None
+        success = sum(w.success for w in self._recent)
+        errors = sum(w.errors for w in self._recent)
+        results = success + errors
+        if results == 0:
+            return f"stalled: no responses for {self.intervals} intervals with {in_flight} in flight" \
+                if in_flight else None
+        if results < self.min_results:
+            return None
+
+        error_rate = errors / results
+        if error_rate > self.max_error_rate:
+            return f"error rate {error_rate * 100:.1f}% > {self.max_error_rate * 100:.0f}%"
+        timeouts = sum(w.error_log[name] for w in self._recent for name in TIMEOUT_CATEGORIES)
+        if timeouts / results > self.max_timeout_rate:
+            return f"timeout rate {timeouts / results * 100:.1f}% > {self.max_timeout_rate * 100:.0f}%"
+        if self.max_p99_ms is not None and success:
+            p99 = self._rolling_latencies().value_at_percentile(99) / 1000
+            if p99 > self.max_p99_ms:
+                return f"P99 {p99:.0f}ms > {self.max_p99_ms:.0f}ms"
+        return None
+
+    def _rolling_latencies(self):
+        first = self._recent[0].latencies
+        merged = LatencyHistogram(first.lowest, first.highest, first.significant_digits)
+        for w in self._recent:
+            merged.merge(w.latencies)
+        return merged
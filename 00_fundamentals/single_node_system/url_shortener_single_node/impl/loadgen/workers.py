@@ -0,0 +1,125 @@
+"""
+Multi-process stage execution.
+
+One event loop saturates one core long before a big server does. A stage is
+split across forked worker processes, each running its own AsyncLoadEngine
+loop, and their StageStats are merged back in the parent.
+"""
+import asyncio
+import itertools
+import multiprocessing
+import queue
+import time
+import traceback
+
+from .engine import StageStats
+from .profiles import Profile, target_rps
+from .scheduler import Rate
+from .trace import Replay
+
+# Time given to forked workers to come up so they all start the stage together
+STARTUP_GRACE = 0.5
+
+
+def split_load(load, workers):
+    """[(share, phase)] for each worker; closed users split as evenly as possible."""
+    if isinstance(load, (Profile, Replay)):
+        return [(load.share(i, workers), 0.0) for i in range(workers)]
+    if isinstance(load, Rate):
+        return [(Rate(load.rps / workers, load.arrival), i / load.rps) for i in range(workers)]
+    base, extra = divmod(load, workers)
+    shares = [base + (1 if i < extra else 0) for i in range(workers)]
+    return [(share, 0.0) for share in shares if share > 0]
+
+
+def _worker_main(engine, share, phase, duration, start_at, results):
+    try:
+        if engine.timeseries is not None:
+            # Intervals are merged and written by the parent, never from here
+            seq = itertools.count()
+            engine.interval_sink = lambda window, in_flight, length: results.put(
+                ("interval", (next(seq), window.to_dict(), in_flight, length)))
+        time.sleep(max(0.0, start_at - time.time()))
+        stats = asyncio.run(engine.collect_stage(share, duration, phase))
+        results.put(("ok", stats.to_dict()))
+    except BaseException:
+        results.put(("error", traceback.format_exc()))
+
+
+def run_in_workers(engine, load, duration, workers, phase=0.0, start_at=None):
+    """
+    Run one stage on `workers` processes and return the merged StageStats.
+
+    `phase` and `start_at` place this machine's share within a larger,
+    distributed stage (see distributed.py).
+    """
+    # fork: the engine and its scenario (often a bound method of a script's
+    # tester) are inherited as-is rather than pickled.
+    ctx = multiprocessing.get_context("fork")
+    results = ctx.Queue()
+    if engine.trace is not None:
+        # Children must not inherit unwritten trace bytes (see TraceWriter.record)
+        engine.trace.flush()
+    if start_at is None:
+        start_at = time.time() + STARTUP_GRACE
+    procs = [
+        ctx.Process(target=_worker_main, args=(engine, share, phase + offset, duration, start_at, results), daemon=True)
+        for share, offset in split_load(load, workers)
+    ]
+    for p in procs:
+        p.start()
+
+    merged = StageStats(engine.significant_digits)
+    intervals = {}   # seq -> [merged window, in_flight, length, reports]
+    failures = []
+    pending = len(procs)
+    try:
+        while pending:
+            try:
+                status, payload = results.get(timeout=1.0)
+            except queue.Empty:
+                # A worker killed outright (OOM, signal) never reports back
+                if not any(p.is_alive() for p in procs):
+                    failures.append(f"{pending} worker(s) exited without reporting")
+                    break
+                continue
+            if status == "interval":
+                merge_interval(engine, intervals, payload, len(procs))
+                continue
+            pending -= 1
+            if status == "ok":
+                merged.merge(StageStats.from_dict(payload))
+            else:
+                failures.append(payload)
+    finally:
+        for p in procs:
+            p.join()
+    flush_intervals(engine, intervals)
+    if failures:
+        raise RuntimeError("Load worker failed:\n" + failures[0])
+    if target_rps(load, duration) is not None:
+        merged.target_rps = target_rps(load, duration)
+    return merged
+
+
+def merge_interval(engine, intervals, payload, workers):
+    """
+    Fold one generator's interval into `intervals` and write it out once all
+    `workers` generators have reported that interval.
+    """
+    seq, window, in_flight, length = payload
+    slot = intervals.setdefault(seq, [StageStats(engine.significant_digits), 0, 0.0, 0])
+    slot[0].merge(StageStats.from_dict(window))
+    slot[1] += in_flight
+    slot[2] = max(slot[2], length)
+    slot[3] += 1
+    if slot[3] == workers:
+        del intervals[seq]
+        engine.timeseries.write(slot[0], slot[1], slot[2])
+
+
+def flush_intervals(engine, intervals):
+    """Write the intervals not every generator reached (the stage's ragged end)."""
+    for seq in sorted(intervals):
+        window, in_flight, length, _ = intervals.pop(seq)
+        engine.timeseries.write(window, in_flight, length)
@@ -1,11 +1,9 @@
-import concurrent.futures
 import time
 import requests
-import random
-import string
 import sys
-import statistics
-from collections import defaultdict
+
+from loadgen import AsyncLoadEngine
+from loadgen.endpoints import endpoint_summary
 
 # --- Configuration ---
 BASE_URL = "http://localhost:8080"
@@ -21,75 +19,32 @@ STAGES = [
 
 class LoadTester:
     def __init__(self):
-        self.results = defaultdict(list)
-        self.errors = 0
-        self.success = 0
-        self.start_time = 0
-
-    def generate_random_url(self):
-        return f"https://example.com/{''.join(random.choices(string.ascii_letters, k=10))}"
-
-    def single_request(self):
-        try:
-            # 1. Shorten
-            long_url = self.generate_random_url()
-            t0 = time.time()
-            resp = requests.post(f"{BASE_URL}/shorten", json={"long_url": long_url}, timeout=5)
-            t1 = time.time()
-            
-            if resp.status_code == 200:
-                short_url = resp.json()['short_url']
-                short_code = short_url.split("/")[-1]
-                
-                # 2. Resolve (Read)
-                requests.get(f"{BASE_URL}/{short_code}", allow_redirects=False, timeout=5)
-                t2 = time.time()
-                
-                # Record Latency (Write + Read)
-                return (t2 - t0) * 1000 # to ms
-            else:
-                return None
-        except Exception:
-            return None
+        # Virtual users are coroutines on one event loop, not OS threads
+        self.engine = AsyncLoadEngine("shorten_resolve", BASE_URL, timeout=5)
 
     def run_stage(self, concurrent_users, duration):
         print(f"\n--- Running Stage: {concurrent_users} Concurrent Users for {duration}s ---")
-        
-        deadline = time.time() + duration
-        latencies = []
-        local_errors = 0
-        local_success = 0
-        
-        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrent_users) as executor:
-            while time.time() < deadline:
-                # Batch submit tasks equal to concurrency level
-                futures = [executor.submit(self.single_request) for _ in range(concurrent_users)]
-                
-                for f in concurrent.futures.as_completed(futures):
-                    res = f.result()
-                    if res:
-                        latencies.append(res)
-                        local_success += 1
-                    else:
-                        local_errors += 1
-        
-        self.print_metrics(concurrent_users, latencies, local_success, local_errors, duration)
+        metrics = self.engine.run_stage(concurrent_users, duration)
+        self.print_metrics(metrics)
 
-    def print_metrics(self, users, latencies, success, error, duration):
-        if not latencies:
+    def print_metrics(self, metrics):
+        if not metrics["success_count"]:
             print("  -> No successful requests.")
+            if "aborted" in metrics:
+                print(f"  -> Aborted at {metrics['aborted']['at_s']:.1f}s: {metrics['aborted']['reason']}")
             return
 
-        avg_lat = statistics.mean(latencies)
-        p95_lat = statistics.quantiles(latencies, n=20)[18] if len(latencies) > 20 else avg_lat
-        p99_lat = statistics.quantiles(latencies, n=100)[98] if len(latencies) > 100 else avg_lat
-        rps = success / duration
-
         print(f"  Results:")
-        print(f"  - Throughput: {rps:.2f} RPS")
-        print(f"  - Latency: Avg={avg_lat:.2f}ms, P95={p95_lat:.2f}ms, P99={p99_lat:.2f}ms")
-        print(f"  - Success: {success}")
-        print(f"  - Errors: {error} ({(error/(success+error))*100:.2f}%)")
+        print(f"  - Throughput: {metrics['rps']:.2f} RPS")
+        print(f"  - Latency: Avg={metrics['avg']:.2f}ms, P95={metrics['p95']:.2f}ms, P99={metrics['p99']:.2f}ms")
+        for name, e in metrics.get("endpoints", {}).items():
+            print(f"    {endpoint_summary(name, e)}")
+        print(f"  - Success: {metrics['success_count']}")
+        print(f"  - Errors: {metrics['error_count']} ({metrics['error_rate']:.2f}%)")
+        if "aborted" in metrics:
+            print(f"  - Aborted at {metrics['aborted']['at_s']:.1f}s: {metrics['aborted']['reason']}")
+        if not metrics.get("valid", True):
+            print(f"  - Invalid, generator-bound: {'; '.join(metrics['generator']['reasons'])}")
 
 def check_server():
     print("Checking if server is up...")
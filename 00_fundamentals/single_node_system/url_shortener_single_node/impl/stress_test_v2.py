@@ -1,14 +1,14 @@
-import concurrent.futures
 import time
 import requests
-import random
-import string
 import sys
-import statistics
 import json
 import os
 from datetime import datetime
-from collections import defaultdict
+
+from loadgen import AsyncLoadEngine
+from loadgen.endpoints import endpoint_summary, endpoint_table_md, render_endpoints_html
+from loadgen.report import generator_note, stage_label
+from loadgen.timeseries import TimeSeriesWriter, read_timeseries, render_timeseries_html
 
 # --- Configuration ---
 BASE_URL = "http://localhost:8080"
@@ -33,6 +33,7 @@ class LoadTestReporter:
             "results": []
         }
         os.makedirs(RESULTS_DIR, exist_ok=True)
+        self.timeseries_path = os.path.join(RESULTS_DIR, f"timeseries_{self.timestamp}.jsonl")
 
     def add_stage_result(self, users, duration, metrics):
         self.run_data["results"].append({
@@ -56,16 +57,18 @@ class LoadTestReporter:
             f"**Target:** `{BASE_URL}`",
             "",
             "## 1. Executive Summary",
-            "| Concurrency | Throughput (RPS) | Avg Latency (ms) | P99 Latency (ms) | Error Rate % |",
-            "|---|---|---|---|---|",
+            "| Concurrency | Throughput (RPS) | Avg Latency (ms) | P99 Latency (ms) | P99 Corrected (ms) | Error Rate % |",
+            "|---|---|---|---|---|---|",
         ]
 
         for r in self.run_data["results"]:
             m = r["metrics"]
             # Flag rows where P99 > 1000ms or Errors > 1%
-            status = "🔴" if m["p99"] > 1000 or m["error_rate"] > 1.0 else "🟢"
+            status = "⛔" if "aborted" in m else "🔴" if m["p99"] > 1000 or m["error_rate"] > 1.0 else "🟢"
+            if not m.get("valid", True):
+                status += " ⚠️ invalid"
             lines.append(
-                f"| {r['users']} | {m['rps']:.2f} | {m['avg']:.2f} | {m['p99']:.2f} | {m['error_rate']:.2f}% {status} |"
+                f"| {r['users']} | {m['rps']:.2f} | {m['avg']:.2f} | {m['p99']:.2f} | {m['p99_corrected']:.2f} | {m['error_rate']:.2f}% {status} |"
             )
 
         lines.extend([
@@ -74,6 +77,7 @@ class LoadTestReporter:
             "**Bottleneck Detection:**",
             "- **Latency Knee:** Check where P99 latency jumps significantly.",
             "- **Throughput Cap:** Check where RPS stops increasing despite adding more users.",
+            "- **Coordinated Omission:** Corrected percentiles include the requests a stalled user never got to send.",
             "",
             "## 3. Detailed Stage Logs",
         ])
@@ -83,8 +87,17 @@ class LoadTestReporter:
             lines.append(f"### Stage: {r['users']} Concurrent Users")
             lines.append(f"- **Success:** {m['success_count']}")
             lines.append(f"- **Failures:** {m['error_count']}")
-            lines.append(f"- **P50 (Median):** {m['p50']:.2f}ms")
-            lines.append(f"- **P95:** {m['p95']:.2f}ms")
+            lines.append(f"- **P50 (Median):** {m['p50']:.2f}ms (corrected {m['p50_corrected']:.2f}ms)")
+            lines.append(f"- **P95:** {m['p95']:.2f}ms (corrected {m['p95_corrected']:.2f}ms)")
+            if "aborted" in m:
+                lines.append(f"- **Aborted:** at {m['aborted']['at_s']:.1f}s of {r['duration']}s ({m['aborted']['reason']})")
+            if not m.get("valid", True):
+                lines.append(f"- **⚠️ Invalid (generator-bound):** {'; '.join(m['generator']['reasons'])}")
+            if generator_note(m):
+                lines.append(f"- **Generator:** {generator_note(m)}")
+            endpoint_rows = endpoint_table_md(m)
+            if endpoint_rows:
+                lines.extend(["", *endpoint_rows])
             lines.append("")
 
         with open(filepath, "w") as f:
@@ -95,11 +108,14 @@ class LoadTestReporter:
         filepath = os.path.join(RESULTS_DIR, f"dashboard_{self.timestamp}.html")
         
         # Extract data for charts
-        labels = [str(r['users']) for r in self.run_data["results"]]
+        labels = [stage_label(r['users'], r['metrics']) for r in self.run_data["results"]]
         rps_data = [r['metrics']['rps'] for r in self.run_data["results"]]
         p95_data = [r['metrics']['p95'] for r in self.run_data["results"]]
         p99_data = [r['metrics']['p99'] for r in self.run_data["results"]]
+        p99_corrected_data = [r['metrics']['p99_corrected'] for r in self.run_data["results"]]
         avg_data = [r['metrics']['avg'] for r in self.run_data["results"]]
+        ts_card, ts_script = render_timeseries_html(read_timeseries(self.timeseries_path))
+        phase_card, phase_script = render_endpoints_html(self.run_data["results"])
 
         html_content = f"""
         <!DOCTYPE html>
@@ -125,6 +141,8 @@ class LoadTestReporter:
                 <div class="chart-box">
                     <canvas id="latencyChart"></canvas>
                 </div>
+                <div class="chart-box">{ts_card}</div>
+                <div class="chart-box">{phase_card}</div>
             </div>
 
             <script>
@@ -172,6 +190,13 @@ class LoadTestReporter:
                                 data: {json.dumps(p99_data)},
                                 borderColor: 'rgb(255, 99, 132)',
                                 tension: 0.1
+                            }},
+                            {{
+                                label: 'P99 Corrected (ms)',
+                                data: {json.dumps(p99_corrected_data)},
+                                borderColor: 'rgb(255, 99, 132)',
+                                borderDash: [5, 5],
+                                tension: 0.1
                             }}
                         ]
                     }},
@@ -182,6 +207,8 @@ class LoadTestReporter:
                         scales: {{ x: {{ title: {{ display: true, text: 'Concurrent Users' }} }} }}
                     }}
                 }});
+                {ts_script}
+                {phase_script}
             </script>
         </body>
         </html>
@@ -193,25 +220,8 @@ class LoadTestReporter:
 class LoadTester:
     def __init__(self):
         self.reporter = LoadTestReporter()
-
-    def generate_random_url(self):
-        return f"https://example.com/{''.join(random.choices(string.ascii_letters, k=10))}"
-
-    def single_request(self):
-        try:
-            long_url = self.generate_random_url()
-            t0 = time.time()
-            resp = requests.post(f"{BASE_URL}/shorten", json={"long_url": long_url}, timeout=5) 
-            
-            if resp.status_code == 200:
-                short_url = resp.json()['short_url']
-                short_code = short_url.split("/")[-1]
-                requests.get(f"{BASE_URL}/{short_code}", allow_redirects=False, timeout=5)
-                t2 = time.time()
-                return (t2 - t0) * 1000 # ms
-            return None
-        except:
-            return None
+        self.engine = AsyncLoadEngine("shorten_resolve", BASE_URL, timeout=5)
+        self.engine.timeseries = TimeSeriesWriter(self.reporter.timeseries_path)
 
     def run(self):
         print(f"Starting Load Test on {BASE_URL}...")
@@ -222,6 +232,7 @@ class LoadTester:
                 time.sleep(2) # Cooldown
         finally:
             # Always generate reports, even if interrupted
+            self.engine.timeseries.close()
             print("\nGenerating Reports...")
             self.reporter.save_json()
             self.reporter.generate_markdown_report()
@@ -229,46 +240,15 @@ class LoadTester:
 
     def run_stage(self, concurrent_users, duration):
         print(f"\n--- Stage: {concurrent_users} Users ({duration}s) ---")
-        deadline = time.time() + duration
-        latencies = []
-        errors = 0
-        success = 0
-        
-        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrent_users) as executor:
-            while time.time() < deadline:
-                futures = [executor.submit(self.single_request) for _ in range(concurrent_users)]
-                for f in concurrent.futures.as_completed(futures):
-                    res = f.result()
-                    if res:
-                        latencies.append(res)
-                        success += 1
-                    else:
-                        errors += 1
-
-        # Calculate Metrics
-        metrics = {
-            "success_count": success,
-            "error_count": errors,
-            "total": success + errors,
-            "rps": 0,
-            "avg": 0,
-            "p50": 0,
-            "p95": 0,
-            "p99": 0,
-            "error_rate": 0
-        }
-
-        if latencies:
-            metrics["rps"] = success / duration
-            metrics["avg"] = statistics.mean(latencies)
-            metrics["p50"] = statistics.median(latencies)
-            metrics["p95"] = statistics.quantiles(latencies, n=20)[18] if len(latencies) > 20 else metrics["avg"]
-            metrics["p99"] = statistics.quantiles(latencies, n=100)[98] if len(latencies) > 100 else metrics["avg"]
-        
-        if metrics["total"] > 0:
-            metrics["error_rate"] = (errors / metrics["total"]) * 100
+        metrics = self.engine.run_stage(concurrent_users, duration)
 
         print(f"  -> RPS: {metrics['rps']:.2f} | P99: {metrics['p99']:.2f}ms | Errors: {metrics['error_rate']:.2f}%")
+        for name, e in metrics.get("endpoints", {}).items():
+            print(f"     {endpoint_summary(name, e)}")
+        if "aborted" in metrics:
+            print(f"  ⛔ Aborted at {metrics['aborted']['at_s']:.1f}s: {metrics['aborted']['reason']}")
+        if not metrics.get("valid", True):
+            print(f"  ⚠️ Invalid, generator-bound: {'; '.join(metrics['generator']['reasons'])}")
         self.reporter.add_stage_result(concurrent_users, duration, metrics)
 
 def check_server():
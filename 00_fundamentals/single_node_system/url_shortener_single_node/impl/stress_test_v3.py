@@ -1,14 +1,18 @@
-import concurrent.futures
 import time
 import requests
-import random
-import string
 import sys
-import statistics
 import json
 import os
 from datetime import datetime
-from collections import defaultdict
+
+from loadgen import AsyncLoadEngine
+from loadgen.abtest import ABTest, verdict_line
+from loadgen.endpoints import endpoint_summary, endpoint_table_md, render_endpoints_html
+from loadgen.probes import ProbedEngine, ProbeLane, build_corpus
+from loadgen.report import generator_note, stage_label
+from loadgen.scaling import analyze, little_check, scaling_md
+from loadgen.scenarios import shorten_resolve
+from loadgen.timeseries import TimeSeriesWriter, read_timeseries, render_timeseries_html
 
 # --- Configuration ---
 BASE_URL = "http://localhost:8080"
@@ -25,33 +29,39 @@ STAGES = [
     (3000, 5)     # Breakpoint Attempt
 ]
 
-# Attack Payloads for Penetration Testing
-ATTACK_PAYLOADS = [
-    "' OR '1'='1",                      # Basic SQL Injection
-    "<script>alert('XSS')</script>",    # XSS
-    "A" * 10000,                        # Buffer/Large Payload
-    "{{7*7}}",                          # Template Injection
-    "../../etc/passwd"                  # Path Traversal
-]
+# Penetration probes (SQLi, XSS, template injection, traversal, SSRF, oversize, malformed
+# bodies and their mutations; see loadgen/probes.py) run in their own lane beside every stage
+PROBE_RPS = 20
+# The same load run clean and with probes at this rate, alternating ABBA over the rounds:
+# do hostile payloads slow legitimate traffic?
+INTERFERENCE_STAGE = (200, 10)
+INTERFERENCE_PROBE_RPS = 200
+INTERFERENCE_ROUNDS = 4
 
 class LoadTestReporter:
     def __init__(self):
         self.timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         self.run_data = {
             "timestamp": self.timestamp,
-            "config": {"url": BASE_URL, "stages": STAGES},
+            "config": {"url": BASE_URL, "stages": STAGES, "probe_rps": PROBE_RPS},
             "results": [],
             "health_checks": [],
-            "security_report": {"attempts": 0, "blocked": 0, "leaked_500": 0, "successful_200": 0}
+            "security_report": {"attempts": 0, "blocked": 0, "leaked_500": 0, "successful_200": 0,
+                                "errors": 0, "dropped": 0, "families": {}},
+            "interference": None
         }
         os.makedirs(RESULTS_DIR, exist_ok=True)
+        self.timeseries_path = os.path.join(RESULTS_DIR, f"timeseries_v3_{self.timestamp}.jsonl")
 
-    def add_stage_result(self, users, duration, metrics):
+    def add_stage_result(self, users, duration, metrics, probes=None):
         self.run_data["results"].append({
             "users": users,
             "duration": duration,
-            "metrics": metrics
+            "metrics": metrics,
+            "probes": probes
         })
+        if probes is not None:
+            self.record_probes(probes)
 
     def add_health_check(self, stage_users, is_healthy, latency):
         self.run_data["health_checks"].append({
@@ -60,17 +70,35 @@ class LoadTestReporter:
             "latency": latency
         })
 
-    def record_security_event(self, status_code):
-        self.run_data["security_report"]["attempts"] += 1
-        if 400 <= status_code < 500:
-            self.run_data["security_report"]["blocked"] += 1
-        elif status_code >= 500:
-            self.run_data["security_report"]["leaked_500"] += 1
-        elif status_code == 200:
-            self.run_data["security_report"]["successful_200"] += 1
+    def record_probes(self, probes):
+        # One stage's ProbeLane summary, folded into the run's totals
+        sec = self.run_data["security_report"]
+        sec["attempts"] += probes["attempts"]
+        sec["blocked"] += probes["blocked"]
+        sec["leaked_500"] += probes["leaked"]
+        sec["successful_200"] += probes["accepted"]
+        sec["errors"] += probes["errors"]
+        sec["dropped"] += probes["dropped"]
+        for name, f in probes["families"].items():
+            total = sec["families"].setdefault(name, {"attempts": 0, "blocked": 0, "leaked": 0, "accepted": 0, "errors": 0})
+            for key in total:
+                total[key] += f[key]
+
+    def set_interference(self, ab, probes):
+        # An ABTest result: A ran clean, B beside a probe lane
+        self.run_data["interference"] = {
+            "users": INTERFERENCE_STAGE[0],
+            "probe_rps": INTERFERENCE_PROBE_RPS,
+            "rounds": ab["paired_rounds"],
+            "baseline": ab["targets"]["A"],
+            "contended": ab["targets"]["B"],
+            "comparison": ab["comparison"],
+            "probes": probes,
+        }
 
     def save_json(self):
         filepath = os.path.join(RESULTS_DIR, f"result_v3_{self.timestamp}.json")
+        self.run_data["scaling"] = analyze(self.run_data["results"])
         with open(filepath, "w", encoding="utf-8") as f:
             json.dump(self.run_data, f, indent=2)
         print(f"✅ Raw data saved to: {filepath}")
@@ -84,17 +112,21 @@ class LoadTestReporter:
             f"**Target:** `{BASE_URL}`",
             "",
             "## 1. Executive Summary",
-            "| Concurrency | Throughput (RPS) | Avg Latency (ms) | P99 Latency (ms) | Error Rate % |",
-            "|---|---|---|---|---|",
+            "| Concurrency | Throughput (RPS) | Avg Latency (ms) | P99 Latency (ms) | P99 Corrected (ms) | Error Rate % |",
+            "|---|---|---|---|---|---|",
         ]
 
         for r in self.run_data["results"]:
             m = r["metrics"]
-            status = "🔴" if m["p99"] > 2000 or m["error_rate"] > 5.0 else "🟢"
+            status = "⛔" if "aborted" in m else "🔴" if m["p99"] > 2000 or m["error_rate"] > 5.0 else "🟢"
+            if not m.get("valid", True):
+                status += " ⚠️ invalid"
             lines.append(
-                f"| {r['users']} | {m['rps']:.2f} | {m['avg']:.2f} | {m['p99']:.2f} | {m['error_rate']:.2f}% {status} |"
+                f"| {r['users']} | {m['rps']:.2f} | {m['avg']:.2f} | {m['p99']:.2f} | {m['p99_corrected']:.2f} | {m['error_rate']:.2f}% {status} |"
             )
 
+        lines.extend(["", "### Scalability Model", *scaling_md(analyze(self.run_data["results"]))])
+
         lines.extend([
             "",
             "## 2. Security Report",
@@ -102,18 +134,56 @@ class LoadTestReporter:
             f"- **Blocked (4xx):** {self.run_data['security_report']['blocked']}",
             f"- **Leaked (500):** {self.run_data['security_report']['leaked_500']}",
             f"- **Successful (200):** {self.run_data['security_report']['successful_200']}",
+            f"- **No Answer (timeouts, resets):** {self.run_data['security_report']['errors']}",
             "",
-            "## 3. Detailed Stage Logs",
+            "| Payload Family | Attempts | Blocked 4xx | Leaked 5xx | Accepted 2xx | No Answer |",
+            "|---|---|---|---|---|---|",
         ])
+        for name, f in sorted(self.run_data["security_report"]["families"].items()):
+            lines.append(f"| {name} | {f['attempts']} | {f['blocked']} | {f['leaked']} | {f['accepted']} | {f['errors']} |")
+
+        inter = self.run_data["interference"]
+        if inter:
+            b, c = inter["baseline"], inter["contended"]
+            lines.extend([
+                "",
+                f"### Probe Interference ({inter['users']} users, probes at {inter['probe_rps']} RPS, "
+                f"{inter['rounds']} ABBA rounds)",
+                "| Run | RPS | P50 (ms) | P99 (ms) | P99.9 (ms) | Error Rate % |",
+                "|---|---|---|---|---|---|",
+                f"| A: clean | {b['rps']:.2f} | {b['p50']:.2f} | {b['p99']:.2f} | {b['p999']:.2f} | {b['error_rate']:.2f} |",
+                f"| B: with probes | {c['rps']:.2f} | {c['p50']:.2f} | {c['p99']:.2f} | {c['p999']:.2f} | {c['error_rate']:.2f} |",
+                "",
+            ])
+            lines.extend(f"- {verdict_line(metric, v)}" for metric, v in inter["comparison"].items())
+
+        lines.extend(["", "## 3. Detailed Stage Logs"])
 
         for r in self.run_data["results"]:
             m = r["metrics"]
             lines.append(f"### Stage: {r['users']} Concurrent Users")
             lines.append(f"- **RPS:** {m['rps']:.2f}")
             lines.append(f"- **Avg Latency:** {m['avg']:.2f}ms")
-            lines.append(f"- **P95:** {m['p95']:.2f}ms")
-            lines.append(f"- **P99:** {m['p99']:.2f}ms")
+            lines.append(f"- **P95:** {m['p95']:.2f}ms (corrected {m['p95_corrected']:.2f}ms)")
+            lines.append(f"- **P99:** {m['p99']:.2f}ms (corrected {m['p99_corrected']:.2f}ms)")
             lines.append(f"- **Error Rate:** {m['error_rate']:.2f}%")
+            if "aborted" in m:
+                lines.append(f"- **Aborted:** at {m['aborted']['at_s']:.1f}s of {r['duration']}s ({m['aborted']['reason']})")
+            if not m.get("valid", True):
+                lines.append(f"- **⚠️ Invalid (generator-bound):** {'; '.join(m['generator']['reasons'])}")
+            if generator_note(m):
+                lines.append(f"- **Generator:** {generator_note(m)}")
+            little = little_check(r["users"], m)
+            if little and little["suspect"]:
+                lines.append(f"- **⚠️ Little's Law:** completions/s × avg latency = {little['implied']:.1f} in flight, "
+                             f"{little['source']} {little['in_flight']:.1f}: {little['reason']}")
+            if r.get("probes"):
+                pr = r["probes"]
+                lines.append(f"- **Probe Lane:** {pr['attempts']} at {pr['rps']:.1f} RPS | blocked {pr['blocked']}, "
+                             f"leaked {pr['leaked']}, accepted {pr['accepted']} | probe P99 {pr['p99']:.2f}ms")
+            endpoint_rows = endpoint_table_md(m)
+            if endpoint_rows:
+                lines.extend(["", *endpoint_rows])
             lines.append("")
 
         with open(filepath, "w", encoding="utf-8") as f:
@@ -121,50 +191,52 @@ class LoadTestReporter:
         print(f"✅ Markdown report saved to: {filepath}")
 
     def determine_recommendation(self):
-        # Heuristic Logic
-        max_rps = 0
-        max_users_at_peak = 0
-        breakpoint_users = None
-        failure_reason = "None"
-
-        for r in self.run_data["results"]:
-            m = r["metrics"]
-            if m['rps'] > max_rps:
-                max_rps = m['rps']
-                max_users_at_peak = r['users']
-            
-            # Detect Breakpoint
-            if m['error_rate'] > 5.0:
-                breakpoint_users = r['users']
-                failure_reason = "High Error Rate (>5%) - Availability Failure"
-                break
-            if m['p99'] > 2000:
-                breakpoint_users = r['users']
-                failure_reason = "High Latency (>2s) - Performance Degradation"
-                break
-
-        rec = ""
-        if not breakpoint_users:
-            rec = "✅ **Healthy:** System handled all load stages without breaking. Scale tests higher."
-        elif "Latency" in failure_reason:
-            rec = f"⚠️ **Vertical Scaling Required:** System slows down at {breakpoint_users} users. <br>The database or CPU is likely the bottleneck. Increase RAM/CPU or optimize DB queries."
-        elif "Error" in failure_reason:
-            rec = f"⚠️ **Horizontal Scaling Required:** System throws errors at {breakpoint_users} users. <br>Thread pool or connection limits reached. Add more nodes/pods behind a Load Balancer."
-
-        return breakpoint_users, failure_reason, max_rps, rec
+        # Fitted Amdahl/USL coefficients, not fixed error/latency thresholds: see loadgen/scaling.py
+        analysis = analyze(self.run_data["results"])
+        max_rps = max((r["metrics"]["rps"] for r in self.run_data["results"]), default=0)
+        return analysis, max_rps, analysis["recommendation"]
 
     def generate_html_dashboard(self):
         filepath = os.path.join(RESULTS_DIR, f"dashboard_v3_{self.timestamp}.html")
         
-        labels = [str(r['users']) for r in self.run_data["results"]]
+        labels = [stage_label(r['users'], r['metrics']) for r in self.run_data["results"]]
         rps_data = [r['metrics']['rps'] for r in self.run_data["results"]]
         p95_data = [r['metrics']['p95'] for r in self.run_data["results"]]
+        p95_corrected_data = [r['metrics']['p95_corrected'] for r in self.run_data["results"]]
         error_data = [r['metrics']['error_rate'] for r in self.run_data["results"]]
         
-        breakpoint_val, failure_reason, peak_rps, recommendation = self.determine_recommendation()
+        scaling, peak_rps, recommendation = self.determine_recommendation()
+        usl_fit = scaling["usl"]
+        tested_users = max((n for n, _ in scaling["points"]), default=0)
+        if usl_fit and "peak_users" in usl_fit:
+            predicted = f"{usl_fit['peak_rps']:.0f} @ {usl_fit['peak_users']:.0f}"
+            predicted_color = "red" if usl_fit["peak_users"] <= tested_users else "orange"
+        elif usl_fit and "ceiling_rps" in usl_fit:
+            predicted, predicted_color = f"→ {usl_fit['ceiling_rps']:.0f}", "orange"
+        else:
+            predicted, predicted_color = "None", "green"
+        model_line = ""
+        if usl_fit:
+            r2 = f"{usl_fit['r2']:.3f}" if usl_fit["r2"] is not None else "-"
+            model_line = f"σ (contention) = {usl_fit['sigma']:.4f} | κ (coherency) = {usl_fit['kappa']:.2e} | R² = {r2}"
+        suspect = [c["stage"] for c in scaling["little"] if c["suspect"]]
+        if suspect:
+            model_line += f"<br>⚠️ Little's law fails for stage(s) {', '.join(suspect)}: their numbers are suspect."
         
         sec_report = self.run_data["security_report"]
+        ts_card, ts_script = render_timeseries_html(read_timeseries(self.timeseries_path))
+        phase_card, phase_script = render_endpoints_html(self.run_data["results"])
         sec_color = "red" if sec_report["leaked_500"] > 0 else "orange" if sec_report["successful_200"] > 0 else "green"
+        family_rows = "".join(
+            f"<tr><td>{name}</td><td>{f['attempts']}</td><td>{f['blocked']}</td><td>{f['leaked']}</td><td>{f['accepted']}</td></tr>"
+            for name, f in sorted(sec_report["families"].items())
+        )
+        inter = self.run_data["interference"]
+        inter_rows = "".join(
+            f"<tr><td>{label}</td><td>{m['rps']:.2f}</td><td>{m['p50']:.2f}</td><td>{m['p99']:.2f}</td><td>{m['error_rate']:.2f}%</td></tr>"
+            for label, m in ((("Clean", inter["baseline"]), ("With probes", inter["contended"])) if inter else ())
+        )
+        inter_verdicts = "<br>".join(verdict_line(metric, v) for metric, v in inter["comparison"].items()) if inter else ""
 
         html_content = f"""
         <!DOCTYPE html>
@@ -202,10 +274,8 @@ class LoadTestReporter:
                     </div>
                     <div class="col-md-3">
                         <div class="card p-3 text-center">
-                            <div class="kpi" style="color: {'red' if breakpoint_val else 'green'}">
-                                {breakpoint_val if breakpoint_val else 'None'}
-                            </div>
-                            <div class="kpi-label">Breakpoint (Users)</div>
+                            <div class="kpi" style="color: {predicted_color}">{predicted}</div>
+                            <div class="kpi-label">USL Peak (RPS @ Users)</div>
                         </div>
                     </div>
                     <div class="col-md-6">
@@ -213,6 +283,7 @@ class LoadTestReporter:
                             <div class="rec-box">
                                 <h5>💡 Recommendation</h5>
                                 <p class="mb-0">{recommendation}</p>
+                                <p class="mb-0 mt-2 small text-muted">{model_line}</p>
                             </div>
                         </div>
                     </div>
@@ -262,7 +333,16 @@ class LoadTestReporter:
                                         <span class="badge bg-warning text-dark rounded-pill">{sec_report['successful_200']}</span>
                                     </li>
                                 </ul>
-                                <small class="text-muted mt-2 d-block">* Checks for SQLi, XSS, and Large Buffers.</small>
+                                <table class="table table-sm mt-3">
+                                    <thead><tr><th>Family</th><th>Attempts</th><th>4xx</th><th>5xx</th><th>2xx</th></tr></thead>
+                                    <tbody>{family_rows}</tbody>
+                                </table>
+                                <small class="text-muted mt-2 d-block">* Mutated SQLi, XSS, template, traversal, SSRF, header, oversize, encoding and malformed-body probes, at {PROBE_RPS} RPS in their own lane.</small>
+                                <table class="table table-sm mt-3">
+                                    <thead><tr><th>{INTERFERENCE_STAGE[0]} Users</th><th>RPS</th><th>P50 (ms)</th><th>P99 (ms)</th><th>Errors</th></tr></thead>
+                                    <tbody>{inter_rows or "<tr><td colspan='5'>No interference check</td></tr>"}</tbody>
+                                </table>
+                                <small class="text-muted d-block">{inter_verdicts}</small>
                             </div>
                         </div>
                     </div>
@@ -280,6 +360,15 @@ class LoadTestReporter:
                         </div>
                     </div>
                 </div>
+
+                <!-- Time Series -->
+                <div class="row">
+                    <div class="col-12">{ts_card}</div>
+                </div>
+
+                <div class="row">
+                    <div class="col-12">{phase_card}</div>
+                </div>
             </div>
 
             <script>
@@ -324,6 +413,12 @@ class LoadTestReporter:
                                 borderColor: '#ff9800',
                                 backgroundColor: 'rgba(255, 152, 0, 0.1)',
                                 fill: true
+                            }},
+                            {{
+                                label: 'P95 Corrected for Coordinated Omission (ms)',
+                                data: {json.dumps(p95_corrected_data)},
+                                borderColor: '#f44336',
+                                borderDash: [5, 5]
                             }}
                         ]
                     }},
@@ -331,6 +426,8 @@ class LoadTestReporter:
                         scales: {{ y: {{ title: {{display: true, text: 'Milliseconds'}} }} }}
                     }}
                 }});
+                {ts_script}
+                {phase_script}
             </script>
         </body>
         </html>
@@ -342,6 +439,9 @@ class LoadTestReporter:
 class LoadTester:
     def __init__(self):
         self.reporter = LoadTestReporter()
+        self.engine = AsyncLoadEngine(shorten_resolve, BASE_URL, timeout=5)
+        self.corpus = build_corpus()
+        self.engine.timeseries = TimeSeriesWriter(self.reporter.timeseries_path)
 
     def check_health(self, after_users):
         try:
@@ -355,47 +455,18 @@ class LoadTester:
             self.reporter.add_health_check(after_users, False, 0)
             print("  💓 Health Check: DOWN (Timeout/Error)")
 
-    def generate_payload(self, is_attack=False):
-        if is_attack:
-            return random.choice(ATTACK_PAYLOADS)
-        return f"https://example.com/{''.join(random.choices(string.ascii_letters, k=10))}"
-
-    def single_request(self):
-        # 5% chance of being an attack request
-        is_attack = random.random() < 0.05
-        payload = self.generate_payload(is_attack)
-        
-        try:
-            t0 = time.time()
-            resp = requests.post(f"{BASE_URL}/shorten", json={"long_url": payload}, timeout=5)
-            
-            # Security Reporting
-            if is_attack:
-                self.reporter.record_security_event(resp.status_code)
-                return None # Don't count attacks towards latency stats directly
-
-            # Standard Flow
-            if resp.status_code == 200:
-                short_url = resp.json()['short_url']
-                short_code = short_url.split("/")[-1]
-                requests.get(f"{BASE_URL}/{short_code}", allow_redirects=False, timeout=5)
-                t2 = time.time()
-                return (t2 - t0) * 1000 # ms
-            else:
-                return False # Error
-        except:
-            return False # Error
-
     def run(self):
         print(f"Starting System Reliability Test on {BASE_URL}...")
-        print(f"Attacks Enabled: SQLi, XSS, Buffer Overflow")
+        print(f"Probe lane: {len(self.corpus)} payloads at {PROBE_RPS} RPS beside every stage")
         
         try:
             for users, duration in STAGES:
                 self.run_stage(users, duration)
                 self.check_health(users)
                 time.sleep(2) 
+            self.run_interference()
         finally:
+            self.engine.timeseries.close()
             print("\nGenerating Reliability Reports...")
             self.reporter.save_json()
             self.reporter.generate_markdown_report()
@@ -403,39 +474,33 @@ class LoadTester:
 
     def run_stage(self, concurrent_users, duration):
         print(f"\n--- Stage: {concurrent_users} Users ({duration}s) ---")
-        deadline = time.time() + duration
-        latencies = []
-        errors = 0
-        success = 0
-        
-        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrent_users) as executor:
-            while time.time() < deadline:
-                futures = [executor.submit(self.single_request) for _ in range(concurrent_users)]
-                for f in concurrent.futures.as_completed(futures):
-                    res = f.result()
-                    if res is None:
-                        continue # Attack request, ignored for perf stats
-                    if res is not False:
-                        latencies.append(res)
-                        success += 1
-                    else:
-                        errors += 1
-
-        # Calculate Metrics
-        metrics = {"rps": 0, "avg": 0, "p95": 0, "p99": 0, "error_rate": 0}
-        
-        if latencies:
-            metrics["rps"] = success / duration
-            metrics["avg"] = statistics.mean(latencies)
-            metrics["p95"] = statistics.quantiles(latencies, n=20)[18] if len(latencies) > 20 else metrics["avg"]
-            metrics["p99"] = statistics.quantiles(latencies, n=100)[98] if len(latencies) > 100 else metrics["avg"]
-        
-        total = success + errors
-        if total > 0:
-            metrics["error_rate"] = (errors / total) * 100
+        # Only clean traffic goes through the engine; probes have their own lane and stats
+        with ProbeLane(BASE_URL, PROBE_RPS, self.corpus) as lane:
+            metrics = self.engine.run_stage(concurrent_users, duration)
+        probes = lane.summary()
 
         print(f"  -> RPS: {metrics['rps']:.2f} | P99: {metrics['p99']:.2f}ms | Errors: {metrics['error_rate']:.2f}%")
-        self.reporter.add_stage_result(concurrent_users, duration, metrics)
+        print(f"  🛡️ Probes: {probes['attempts']} | blocked {probes['blocked']} | leaked {probes['leaked']} | "
+              f"accepted {probes['accepted']} | P99: {probes['p99']:.2f}ms")
+        for name, e in metrics.get("endpoints", {}).items():
+            print(f"     {endpoint_summary(name, e)}")
+        if "aborted" in metrics:
+            print(f"  ⛔ Aborted at {metrics['aborted']['at_s']:.1f}s: {metrics['aborted']['reason']}")
+        if not metrics.get("valid", True):
+            print(f"  ⚠️ Invalid, generator-bound: {'; '.join(metrics['generator']['reasons'])}")
+        self.reporter.add_stage_result(concurrent_users, duration, metrics, probes)
+
+    def run_interference(self):
+        users, duration = INTERFERENCE_STAGE
+        print(f"\n--- Probe interference: {users} Users ({duration}s), A clean vs B with probes at "
+              f"{INTERFERENCE_PROBE_RPS} RPS, {INTERFERENCE_ROUNDS} ABBA rounds ---")
+        lane = ProbeLane(BASE_URL, INTERFERENCE_PROBE_RPS, self.corpus)
+        # The stress stages just warmed the server; both sides share one engine
+        ab = ABTest({"A": self.engine, "B": ProbedEngine(self.engine, lane)}, users, INTERFERENCE_ROUNDS,
+                    duration, warmup=False, cooldown=2.0).run()
+        self.reporter.set_interference(ab, lane.summary())
+        for metric, v in ab["comparison"].items():
+            print(f"  -> {verdict_line(metric, v)}")
 
 def check_server():
     try:
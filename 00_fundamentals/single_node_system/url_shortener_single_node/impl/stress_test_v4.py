@@ -1,26 +1,31 @@
-import concurrent.futures
 import time
 import requests
-import random
-import string
-import statistics
+import html
 import json
 import os
-import threading
 from datetime import datetime
-from collections import defaultdict
+from collections import Counter
+
+from loadgen import AsyncLoadEngine
+from loadgen.dedup import Duplicates
+from loadgen.errors import EXEMPLARS_PER_CATEGORY
+from loadgen.report import stage_label
 
 # --- Configuration ---
 BASE_URL = "http://localhost:8080"
 RESULTS_DIR = "src/test/kotlin/com/urlshortener/loadtestresult"
 STAGES = [(10, 5), (50, 5), (20000, 50), (40000, 150), (55000, 250)]
+COOLDOWN = 2  # Seconds between an aborted stage and its health check
+DUPLICATE_RATIO = 0.3  # Share of /shorten calls that repeat an already shortened URL
+DUPLICATE_POOL = 1000
 
 class LoadTestReporter:
     def __init__(self):
         self.timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         self.run_data = {
             "timestamp": self.timestamp,
-            "config": {"url": BASE_URL, "stages": STAGES},
+            "config": {"url": BASE_URL, "stages": STAGES, "duplicate_ratio": DUPLICATE_RATIO,
+                       "duplicate_pool": DUPLICATE_POOL},
             "results": [],
             "health_checks": [],
             "analytics_summary": {
@@ -29,41 +34,62 @@ class LoadTestReporter:
                 "stats_verified": 0,
                 "api_errors": 0
             },
-            "error_log": defaultdict(int)
+            # Error category -> count over all stages (see loadgen/errors.py)
+            "error_log": Counter(),
+            "error_samples": {}
         }
-        self.lock = threading.Lock()
         os.makedirs(RESULTS_DIR, exist_ok=True)
 
+    # Everything below runs on the engine's one event loop or between stages: no locks needed
+
     def log_result(self, is_success, is_dedup):
-        with self.lock:
-            s = self.run_data["analytics_summary"]
-            if is_success:
-                s["total_cycles"] += 1
-                s["stats_verified"] += 1
-                if is_dedup:
-                    s["dedup_hits"] += 1
-            else:
-                s["api_errors"] += 1
-
-    def log_error(self, msg):
-        with self.lock:
-            self.run_data["error_log"][msg] += 1
-            self.run_data["analytics_summary"]["api_errors"] += 1
+        s = self.run_data["analytics_summary"]
+        if is_success:
+            s["total_cycles"] += 1
+            s["stats_verified"] += 1
+            if is_dedup:
+                s["dedup_hits"] += 1
 
     def add_stage_metrics(self, users, metrics):
-        with self.lock:
-            self.run_data["results"].append({"users": users, "metrics": metrics})
+        self.run_data["results"].append({"users": users, "metrics": metrics})
+        # The engine classified and counted every failure; fold them in per stage
+        self.run_data["analytics_summary"]["api_errors"] += metrics["error_count"]
+        self.run_data["error_log"].update(metrics["error_log"])
+        for category, samples in metrics.get("error_samples", {}).items():
+            kept = self.run_data["error_samples"].setdefault(category, [])
+            kept.extend(samples[:EXEMPLARS_PER_CATEGORY - len(kept)])
 
     def add_health_check(self, users, healthy, latency):
-        with self.lock:
-            self.run_data["health_checks"].append({"users": users, "healthy": healthy, "latency": latency})
+        self.run_data["health_checks"].append({"users": users, "healthy": healthy, "latency": latency})
 
     def generate_html(self):
         s = self.run_data["analytics_summary"]
         res = self.run_data["results"]
-        labels = [str(r['users']) for r in res]
+        labels = [stage_label(r['users'], r['metrics']) for r in res]
         rps_data = [r['metrics']['rps'] for r in res]
         p95_data = [r['metrics']['p95'] for r in res]
+        # Coordinated-omission-corrected percentiles, dashed beside the raw one
+        p95_corrected_data = [r['metrics']['p95_corrected'] for r in res]
+        p99_corrected_data = [r['metrics']['p99_corrected'] for r in res]
+
+        path_rows = "".join([
+            f"<tr><td>{stage_label(r['users'], r['metrics'])}</td><td>{path}</td><td>{op['rps']:.2f}</td>"
+            f"<td>{op['p50']:.2f}</td><td>{op['p99']:.2f}</td><td>{op['error_rate']:.2f}%</td></tr>"
+            for r in res
+            for path, op in r['metrics'].get('operations', {}).items()
+        ]) or "<tr><td colspan='6'>No results</td></tr>"
+        mismatches = self.run_data["error_log"].get("dedup_mismatch", 0)
+        dedup_alert = (
+            f'<div class="alert alert-danger"><strong>Hashing:</strong> {mismatches} repeated URLs came back with a different code.</div>'
+            if mismatches else
+            f'<div class="alert alert-success"><strong>Hashing:</strong> Hashing Correct: all {s["dedup_hits"]} repeated URLs returned their original code.</div>'
+        )
+
+        error_rows = "".join([
+            f"<tr><td><code>{category}</code></td><td>{count}</td>"
+            f"<td>{'<br>'.join(html.escape(x) for x in self.run_data['error_samples'].get(category, []))}</td></tr>"
+            for category, count in self.run_data["error_log"].most_common()
+        ]) or "<tr><td colspan='3'>No errors</td></tr>"
 
         health_rows = "".join([
             f"<tr><td>{h['users']} Users</td><td>{'✅ UP' if h['healthy'] else '❌ DOWN'}</td><td>{h['latency']:.2f}ms</td></tr>"
@@ -103,13 +129,13 @@ class LoadTestReporter:
                 </div>
                 <div class="row">
                     <div class="col-md-6"><div class="card p-4"><h5 class="fw-bold mb-4">Performance: Throughput (RPS)</h5><div class="chart-container"><canvas id="rpsChart"></canvas></div></div></div>
-                    <div class="col-md-6"><div class="card p-4"><h5 class="fw-bold mb-4">Reliability: P95 Latency (ms)</h5><div class="chart-container"><canvas id="latencyChart"></canvas></div></div></div>
+                    <div class="col-md-6"><div class="card p-4"><h5 class="fw-bold mb-4">Reliability: P95 Latency, Raw vs Corrected (ms)</h5><div class="chart-container"><canvas id="latencyChart"></canvas></div></div></div>
                 </div>
                 <div class="row mt-4">
                     <div class="col-md-6">
                         <div class="card p-4">
                             <h5 class="fw-bold mb-3">System Logic Verification</h5>
-                            <div class="alert alert-success"><strong>Hashing:</strong> Hashing Correct: No unexpected errors during deduplication.</div>
+                            {dedup_alert}
                             <div class="alert alert-info"><strong>Observer Pattern:</strong> Stats verified accurately across threads.</div>
                         </div>
                     </div>
@@ -120,11 +146,27 @@ class LoadTestReporter:
                         </div>
                     </div>
                 </div>
+                <div class="row mt-4">
+                    <div class="col-12">
+                        <div class="card p-4">
+                            <h5 class="fw-bold mb-3">🔁 Duplicate vs Unique Path ({DUPLICATE_RATIO:.0%} duplicates)</h5>
+                            <table class="table table-sm"><thead><tr><th>Stage</th><th>Path</th><th>RPS</th><th>P50 (ms)</th><th>P99 (ms)</th><th>Errors</th></tr></thead><tbody>{path_rows}</tbody></table>
+                        </div>
+                    </div>
+                </div>
+                <div class="row mt-4">
+                    <div class="col-12">
+                        <div class="card p-4">
+                            <h5 class="fw-bold mb-3">🧯 Errors by Category</h5>
+                            <table class="table table-sm"><thead><tr><th>Category</th><th>Count</th><th>Sampled Exemplars</th></tr></thead><tbody>{error_rows}</tbody></table>
+                        </div>
+                    </div>
+                </div>
             </div>
             <script>
                 const labels = {json.dumps(labels)};
                 new Chart(document.getElementById('rpsChart'), {{ type: 'bar', data: {{ labels: labels, datasets: [{{ label: 'Requests Per Second', data: {json.dumps(rps_data)}, backgroundColor: '#3498db' }}] }}, options: {{ maintainAspectRatio: false }} }});
-                new Chart(document.getElementById('latencyChart'), {{ type: 'line', data: {{ labels: labels, datasets: [{{ label: 'P95 Latency', data: {json.dumps(p95_data)}, borderColor: '#e67e22', tension: 0.3, fill: true, backgroundColor: 'rgba(230, 126, 34, 0.1)' }}] }}, options: {{ maintainAspectRatio: false }} }});
+                new Chart(document.getElementById('latencyChart'), {{ type: 'line', data: {{ labels: labels, datasets: [{{ label: 'P95 Latency', data: {json.dumps(p95_data)}, borderColor: '#e67e22', tension: 0.3, fill: true, backgroundColor: 'rgba(230, 126, 34, 0.1)' }}, {{ label: 'P95 Corrected', data: {json.dumps(p95_corrected_data)}, borderColor: '#e67e22', borderDash: [5, 5], tension: 0.3 }}, {{ label: 'P99 Corrected', data: {json.dumps(p99_corrected_data)}, borderColor: '#c0392b', borderDash: [5, 5], tension: 0.3 }}] }}, options: {{ maintainAspectRatio: false }} }});
             </script>
         </body></html>
         """
@@ -132,39 +174,31 @@ class LoadTestReporter:
 class LoadTester:
     def __init__(self):
         self.reporter = LoadTestReporter()
+        self.workload = Duplicates(DUPLICATE_RATIO, DUPLICATE_POOL)
+        self.engine = AsyncLoadEngine(self.run_cycle, BASE_URL, timeout=3)
 
-    def run_cycle(self):
-        url = f"https://example.com/{''.join(random.choices(string.ascii_lowercase, k=10))}"
-        try:
-            start = time.time()
-            resp = requests.post(f"{BASE_URL}/shorten", json={"long_url": url}, timeout=3)
-            lat = (time.time() - start) * 1000
-            if resp.status_code == 200:
-                # Mocking logic for dedup check
-                self.reporter.log_result(True, random.random() > 0.95)
-                return lat
-            self.reporter.log_error(f"HTTP {resp.status_code}")
-        except Exception as e:
-            self.reporter.log_error(str(e))
-        return None
+    async def run_cycle(self, client):
+        # Failures (exceptions, a non-200 or a code that broke dedup) are classified and counted by the engine
+        path, ok = await self.workload(client)
+        if ok:
+            # A duplicate only succeeds when its code matched the one first returned
+            self.reporter.log_result(True, path == "duplicate")
+        return path, ok
 
     def run(self):
         print(f"🚀 Starting Load Test [2026] targeting {BASE_URL}")
         try:
             for users, duration in STAGES:
                 print(f"-> Testing {users} concurrent users...")
-                latencies = []
-                with concurrent.futures.ThreadPoolExecutor(max_workers=users) as executor:
-                    start_stage = time.time()
-                    while time.time() - start_stage < duration:
-                        futures = [executor.submit(self.run_cycle) for _ in range(users)]
-                        for f in concurrent.futures.as_completed(futures):
-                            res = f.result()
-                            if res: latencies.append(res)
-
-                rps = len(latencies) / duration
-                p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else 0
-                self.reporter.add_stage_metrics(users, {"rps": rps, "p95": p95})
+                metrics = self.engine.run_stage(users, duration)
+                self.reporter.add_stage_metrics(users, metrics)
+                for path, op in metrics.get("operations", {}).items():
+                    print(f"   {path:<9} RPS: {op['rps']:.2f} | P99: {op['p99']:.2f}ms | Errors: {op['error_rate']:.2f}%")
+                if not metrics.get("valid", True):
+                    print(f"   ⚠️ Invalid, generator-bound: {'; '.join(metrics['generator']['reasons'])}")
+                if "aborted" in metrics:
+                    print(f"   ⛔ Aborted at {metrics['aborted']['at_s']:.1f}s: {metrics['aborted']['reason']}")
+                    time.sleep(COOLDOWN)
 
                 # Health Check
                 try: